@@ -0,0 +1,240 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from mongoengine import signals
+
+# document class -> DocumentCache
+_document_caches = {}
+
+
+def is_unrestricted(queryset):
+    """ Check if queryset selects whole documents of its class, without any conditions.
+
+    Only such querysets may be served from cache.
+    """
+    return (
+        queryset._query_obj.empty and
+        queryset._where_clause is None and
+        queryset._search_text is None and
+        queryset._collation is None and
+        not queryset._none and
+        not queryset._scalar and
+        not queryset._as_pymongo and
+        not queryset._loaded_fields
+    )
+
+
+class DocumentCache(object):
+    """ In-process read-through cache of documents by primary key.
+
+    Keeps raw data of up to ``max_size`` recently used documents for ``timeout`` seconds,
+    and constructs a fresh document instance on each hit.
+
+    Counts ``hits`` and ``misses``.
+    """
+
+    def __init__(self, model, timeout=60, max_size=1000):
+        self.model = model
+        self.timeout = timeout
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def to_key(self, pk):
+        """ normalize primary key value, as it may come from urls or payloads """
+        return self.model._fields[self.model._meta['id_field']].to_python(pk)
+
+    def peek(self, pk):
+        """ Get document by primary key if it is cached, or None, without loading it """
+        key = self.to_key(pk)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                data = entry[1]
+            else:
+                self.misses += 1
+                data = None
+
+        if data is None:
+            return None
+        return self.model._from_son(copy.deepcopy(data))
+
+    def get(self, pk, loader):
+        """ Get document by primary key.
+
+        On miss, the document is retrieved with ``loader(pk)``, which may raise ``DoesNotExist``.
+        """
+        document = self.peek(pk)
+        if document is None:
+            document = loader(self.to_key(pk))
+            self.set(document)
+        return document
+
+    def set(self, document):
+        data = document.to_mongo()
+        with self._lock:
+            self._entries[document.pk] = (time.monotonic() + self.timeout, data)
+            self._entries.move_to_end(document.pk)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, pk):
+        with self._lock:
+            self._entries.pop(pk, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class MissingDocuments(object):
+    """ Short-term memory of primary keys, found missing.
+
+    Keeps up to ``max_size`` recent keys, each for its own timeout.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def to_key(self, model, pk):
+        return (model, model._fields[model._meta['id_field']].to_python(pk))
+
+    def add(self, model, pk, timeout):
+        connect_signals()
+        key = self.to_key(model, pk)
+        with self._lock:
+            self._entries[key] = time.monotonic() + timeout
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def contains(self, model, pk):
+        key = self.to_key(model, pk)
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is None:
+                return False
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return False
+            return True
+
+    def discard(self, model, pk):
+        with self._lock:
+            self._entries.pop((model, pk), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+missing_documents = MissingDocuments()
+
+
+class DerivedValues(object):
+    """ Cache of values computed from documents (i.e. simplified geometries).
+
+    Keeps up to ``max_size`` values (of recently used documents), each value for its own timeout.
+    Values of a document are dropped when it is saved or deleted.
+    """
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, document, key, compute, timeout):
+        """ Get value of the document by key, computing it with ``compute()`` if missing or expired """
+        doc_key = (type(document), document.pk)
+        with self._lock:
+            values = self._entries.get(doc_key)
+            entry = values.get(key) if values is not None else None
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(doc_key)
+                return entry[1]
+
+        value = compute()
+        connect_signals()
+        with self._lock:
+            values = self._entries.setdefault(doc_key, {})
+            if key not in values:
+                self._size += 1
+            values[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(doc_key)
+            while self._size > self.max_size:
+                self._size -= len(self._entries.popitem(last=False)[1])
+        return value
+
+    def discard(self, model, pk):
+        with self._lock:
+            self._size -= len(self._entries.pop((model, pk), ()))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+derived_values = DerivedValues()
+
+
+def invalidate_documents(sender, document, **kwargs):
+    """ Drop saved or deleted document from caches of its class and base classes """
+    for cls in type(document).__mro__:
+        cache = _document_caches.get(cls)
+        if cache is not None:
+            cache.invalidate(document.pk)
+        missing_documents.discard(cls, document.pk)
+        derived_values.discard(cls, document.pk)
+
+
+_signals_connected = []
+
+
+def connect_signals():
+    if not _signals_connected:
+        signals.post_save.connect(invalidate_documents)
+        signals.post_delete.connect(invalidate_documents)
+        _signals_connected.append(True)
+
+
+def cache_documents(model, timeout=60, max_size=1000):
+    """ Enable caching of documents of given class.
+
+    Returns :class:`DocumentCache`, used by ``GenericAPIView.get_object`` (for views with ``use_document_cache``)
+    and by ``ReferenceField``/``GenericReferenceField`` validation.
+    Documents are dropped from cache on ``post_save`` and ``post_delete`` signals (requires blinker).
+    Changes made with ``QuerySet.update()`` are visible only after the timeout.
+    """
+    connect_signals()
+    cache = DocumentCache(model, timeout, max_size)
+    _document_caches[model] = cache
+    return cache
+
+
+def get_document_cache(model):
+    """ Returns registered cache of documents of given class, or None """
+    return _document_caches.get(model)
+
+
+def get_cached_document(queryset, pk):
+    """ Get document by primary key through registered cache.
+
+    Returns None if there is no cache for the document class, or the queryset is restricted.
+    Raises ``DoesNotExist`` for missing documents.
+    """
+    cache = get_document_cache(queryset._document)
+    if cache is None or not is_unrestricted(queryset):
+        return None
+    return cache.get(pk, lambda key: queryset.get(pk=key))
@@ -0,0 +1,53 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.utils import timezone, translation
+
+" maximum number of threads, running validation concurrently "
+MAX_WORKERS = 8
+
+_executor = None
+_executor_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_executor():
+    """ Returns thread pool, shared by all serializers in the process """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='drfm-validation')
+        return _executor
+
+
+def _call_in_worker(func, language, tzinfo):
+    _local.in_worker = True
+    try:
+        with translation.override(language), timezone.override(tzinfo):
+            return func()
+    finally:
+        _local.in_worker = False
+
+
+def _call_now(func):
+    future = Future()
+    try:
+        future.set_result(func())
+    except Exception as exc:
+        future.set_exception(exc)
+    return future
+
+
+def submit(funcs):
+    """ Start calling functions concurrently.
+
+    Returns list of futures, in order of functions. Active language and time zone of calling thread are activated in workers.
+    A single function, or functions submitted from worker threads (i.e. by nested serializers) are called immediately,
+    so the pool cannot be exhausted by tasks waiting for each other.
+    """
+    if len(funcs) < 2 or getattr(_local, 'in_worker', False):
+        return [_call_now(func) for func in funcs]
+    executor = get_executor()
+    language = translation.get_language()
+    tzinfo = timezone.get_current_timezone()
+    return [executor.submit(_call_in_worker, func, language, tzinfo) for func in funcs]
@@ -1,4 +1,7 @@
+import math
+import re
 from collections import OrderedDict
+from functools import lru_cache, partial
 
 from bson import DBRef, ObjectId
 from bson.errors import InvalidId
@@ -6,8 +9,7 @@ from django.utils.encoding import smart_str
 from django.utils.translation import gettext_lazy as _
 from mongoengine import Document, EmbeddedDocument
 from mongoengine import fields as me_fields
-from mongoengine.base import get_document
-from mongoengine.base.common import _document_registry
+from mongoengine.base import BaseDocument
 from mongoengine.errors import DoesNotExist, NotRegistered
 from mongoengine.errors import ValidationError as MongoValidationError
 from mongoengine.queryset import QuerySet, QuerySetManager
@@ -17,17 +19,69 @@ from rest_framework.fields import empty
 from rest_framework.utils import html
 from rest_framework.settings import api_settings
 
+from rest_framework_mongoengine import geo
+from rest_framework_mongoengine.cache import (
+    derived_values, get_cached_document, get_document_cache
+)
+from rest_framework_mongoengine.registry import (
+    get_collection_document, get_document_class
+)
+
+
+OBJECT_ID_RE = re.compile(r'[0-9a-fA-F]{24}\Z')
+
+
+@lru_cache(maxsize=1024)
+def _parse_object_id(value):
+    return ObjectId(value)
+
+
+def to_object_id(value):
+    """ Convert value to ObjectId, raising ``InvalidId`` or ``TypeError`` if it is not valid.
+
+    Hex strings, the most common input, are checked with a regex and parsed through a small cache of recently seen ids.
+    """
+    if value.__class__ is str and OBJECT_ID_RE.match(value):
+        return _parse_object_id(value)
+    if isinstance(value, ObjectId):
+        return value
+    return ObjectId(smart_str(value))
+
+
+def to_object_ids(values):
+    """ Convert list of values to ObjectIds, raising ``InvalidId`` or ``TypeError`` at first invalid value """
+    match = OBJECT_ID_RE.match
+    return [
+        _parse_object_id(value) if value.__class__ is str and match(value) else to_object_id(value)
+        for value in values
+    ]
+
+
+def get_stored_value(field, instance):
+    """ Value of the field source, as stored in the document, without mongoengine dereferencing it.
+
+    Returns ``empty`` if the source is not a field of the document.
+    """
+    if len(field.source_attrs) != 1 or not isinstance(instance, BaseDocument):
+        return empty
+    name = field.source_attrs[0]
+    if name not in instance._fields:
+        return empty
+    return instance._data.get(name)
+
 
 class ObjectIdField(serializers.Field):
     """ Field for ObjectId values """
 
     def to_internal_value(self, value):
         try:
-            return ObjectId(smart_str(value))
-        except InvalidId:
+            return to_object_id(value)
+        except (InvalidId, TypeError):
             raise serializers.ValidationError("'%s' is not a valid ObjectId" % value)
 
     def to_representation(self, value):
+        if value.__class__ is ObjectId:
+            return str(value)
         return smart_str(value)
 
 
@@ -97,7 +151,7 @@ class GenericEmbeddedField(serializers.Field):
             self.fail('not_a_dict', input_type=type(data).__name__)
         try:
             doc_name = data['_cls']
-            doc_cls = get_document(doc_name)
+            doc_cls = get_document_class(doc_name)
         except KeyError:
             self.fail('missing_class')
         except NotRegistered:
@@ -122,20 +176,23 @@ class GenericField(serializers.Field):
 
     Recursively traverses lists and dicts.
     Primitive values are serialized using ``django.utils.encoding.smart_str`` (keeping json-safe intact).
-    Embedded documents handled using temporary GenericEmbeddedField.
+    Embedded documents handled using GenericEmbeddedField.
 
     No validation performed.
 
     Note: it will not work properly if a value contains some complex elements.
     """
 
+    def __init__(self, *args, **kwargs):
+        super(GenericField, self).__init__(*args, **kwargs)
+        self.embedded_field = GenericEmbeddedField()
+
     def to_representation(self, value):
         return self.represent_data(value)
 
     def represent_data(self, data):
         if isinstance(data, EmbeddedDocument):
-            field = GenericEmbeddedField()
-            return field.to_representation(data)
+            return self.embedded_field.to_representation(data)
         elif isinstance(data, dict):
             return dict([(key, self.represent_data(val)) for key, val in data.items()])
         elif isinstance(data, list):
@@ -151,8 +208,7 @@ class GenericField(serializers.Field):
     def parse_data(self, data):
         if isinstance(data, dict):
             if '_cls' in data:
-                field = GenericEmbeddedField()
-                return field.to_internal_value(data)
+                return self.embedded_field.to_internal_value(data)
             else:
                 return dict([(key, self.parse_data(val)) for key, val in data.items()])
         elif isinstance(data, list):
@@ -195,8 +251,9 @@ class ReferenceField(serializers.Field):
 
     Formatting and parsing the id_value is handled by ``.pk_field_class``. By default it is ObjectIdField, it inputs ``ObjectId`` type, and outputs ``str``.
 
-    Validation checks existance of referenced object.
+    Validation checks existance of referenced object, through document cache if registered for the model (see :mod:`cache`).
 
+    Representation is made of the reference, as stored in the document, without dereferencing it.
     """
     default_error_messages = {
         'invalid_input': _('Invalid input. Expected `id_value` or `{ _id: id_value }`.'),
@@ -279,12 +336,23 @@ class ReferenceField(serializers.Field):
             doc_id = self.parse_id(value)
 
         try:
-            # Use the 'pk' attribute instead of 'id' as the second does not
-            # exist when the model has a custom primary key
-            return self.get_queryset().only('pk').get(pk=doc_id).to_dbref()
+            queryset = self.get_queryset()
+            doc = get_cached_document(queryset, doc_id)
+            if doc is None:
+                # Use the 'pk' attribute instead of 'id' as the second does not
+                # exist when the model has a custom primary key
+                doc = queryset.only('pk').get(pk=doc_id)
+            return doc.to_dbref()
         except DoesNotExist:
             self.fail('not_found', pk_value=doc_id)
 
+    def get_attribute(self, instance):
+        # only id is represented, stored DBRef has it without dereferencing
+        value = get_stored_value(self, instance)
+        if value is empty:
+            return super(ReferenceField, self).get_attribute(instance)
+        return value
+
     def to_representation(self, value):
         assert isinstance(value, (Document, DBRef))
         doc_id = value.id
@@ -296,6 +364,8 @@ class ComboReferenceField(ReferenceField):
 
     Can parse either reference or nested document data.
 
+    Nested representation depends on ``depth`` of the parent serializer, found on first use.
+    Within :class:`serializers.DocumentListSerializer`, referenced documents are retrieved for all items at once.
     """
 
     default_error_messages = {
@@ -307,8 +377,26 @@ class ComboReferenceField(ReferenceField):
         self.model = serializer.Meta.model
         if 'model' not in kwargs:
             kwargs['model'] = self.model
+        self._depth = None
+        # id of nested data -> document or errors, set by validate_inline
+        self.inline_documents = None
         super(ComboReferenceField, self).__init__(**kwargs)
 
+    def bind(self, field_name, parent):
+        super(ComboReferenceField, self).bind(field_name, parent)
+        self._depth = None
+
+    @property
+    def depth(self):
+        # not computed at bind time: list fields bind their child before being bound themselves
+        if self._depth is None:
+            self._depth = self.get_depth(self)
+        return self._depth
+
+    def is_inline(self, value):
+        """ Check if the value is nested document data (rather than a reference) """
+        return isinstance(value, dict) and '_id' not in value and 'id' not in value
+
     def to_internal_value(self, value):
         if not isinstance(value, dict) or list(value.keys()) == ['_id']:
             return super(ComboReferenceField, self).to_internal_value(value)
@@ -317,12 +405,37 @@ class ComboReferenceField(ReferenceField):
         if 'id' in value:
             return super(ComboReferenceField, self).to_internal_value(value['id'])
 
+        inline = self.inline_documents.get(id(value)) if self.inline_documents is not None else None
+        if inline is not None:
+            if isinstance(inline, Document):
+                return inline
+            raise ValidationError(inline)
+
         ser = self.serializer(data=value)
         ser.is_valid(raise_exception=True)
         obj = self.model(**ser.validated_data)
 
         return obj
 
+    def validate_inline(self, values):
+        """ Validate nested data of many references at once, with list serializer of ``self.serializer``.
+
+        Until :meth:`clear_inline` is called, ``to_internal_value`` of the given values takes the documents (or errors) from the results.
+        """
+        ser = self.serializer(data=values, many=True)
+        self.inline_documents = {}
+        if ser.is_valid():
+            for value, data in zip(values, ser.validated_data):
+                self.inline_documents[id(value)] = self.model(**data)
+        else:
+            # valid items get validated again, as the list serializer drops their data
+            for value, errors in zip(values, ser.errors):
+                if errors:
+                    self.inline_documents[id(value)] = errors
+
+    def clear_inline(self):
+        self.inline_documents = None
+
     @classmethod
     def get_depth(cls, obj):
         if obj.parent is None:
@@ -331,8 +444,13 @@ class ComboReferenceField(ReferenceField):
             return getattr(obj.parent.Meta, 'depth', 0)
         return cls.get_depth(obj.parent)
 
+    def get_attribute(self, instance):
+        if self.depth == 0:
+            return super(ComboReferenceField, self).get_attribute(instance)
+        return serializers.Field.get_attribute(self, instance)
+
     def to_representation(self, value):
-        if self.get_depth(self) == 0:
+        if self.depth == 0:
             return super(ComboReferenceField, self).to_representation(value)
 
         assert isinstance(value, (Document, DBRef))
@@ -350,7 +468,10 @@ class GenericReferenceField(serializers.Field):
 
     Representation: ``{ _cls: str, _id: str }``.
 
-    Validation checks existance of given class and existance of referenced model.
+    Validation checks existance of given class and existance of referenced model (through document cache, if registered).
+    In lists, referenced models are checked with one query per class (see :meth:`run_list_validation`).
+
+    Representation is made of the reference, as stored in the document, without dereferencing it.
     """
 
     pk_field_class = ObjectIdField
@@ -361,7 +482,7 @@ class GenericReferenceField(serializers.Field):
         'missing_items': _('Expected a dict with `_cls` and `_id` items.'),
         'invalid_id': _('Cannot parse "{pk_value}" as {pk_type}.'),
         'undefined_model': _('Document `{doc_cls}` has not been defined.'),
-        'undefined_collecion': _('No document defined for collection `{collection}`.'),
+        'unmapped_collection': _('No document defined for collection `{collection}`.'),
         'not_found': _('Document with id={pk_value} does not exist.'),
     }
 
@@ -375,7 +496,8 @@ class GenericReferenceField(serializers.Field):
         except:
             self.fail('invalid_id', pk_value=repr(value), pk_type=self.pk_field_class.__name__)
 
-    def to_internal_value(self, value):
+    def parse_value(self, value):
+        """ Returns document class and parsed id of the value """
         if not isinstance(value, dict):
             self.fail('not_a_dict', input_type=type(value).__name__)
         try:
@@ -384,7 +506,7 @@ class GenericReferenceField(serializers.Field):
         except KeyError:
             self.fail('missing_items')
         try:
-            doc_cls = get_document(doc_name)
+            doc_cls = get_document_class(doc_name)
         except NotRegistered:
             self.fail('undefined_model', doc_cls=doc_name)
 
@@ -392,34 +514,114 @@ class GenericReferenceField(serializers.Field):
             doc_id = self.pk_field.to_internal_value(doc_id)
         except:
             self.fail('invalid_id', pk_value=repr(doc_id), pk_type=self.pk_field_class.__name__)
+        return doc_cls, doc_id
 
+    def to_internal_value(self, value):
+        doc_cls, doc_id = self.parse_value(value)
         try:
-            return doc_cls.objects.only('id').get(id=doc_id)
+            doc = get_cached_document(doc_cls.objects, doc_id)
+            if doc is None:
+                doc = doc_cls.objects.only('id').get(id=doc_id)
+            return doc
         except DoesNotExist:
             self.fail('not_found', pk_value=doc_id)
 
+    def run_list_validation(self, data):
+        """ Validate list of values, as child of :class:`ListField`.
+
+        Documents are retrieved with one ``$in`` query per class, skipping the ones found in document cache.
+        Documents of cached classes are retrieved whole, and put into the cache.
+        Raises ValidationError with errors by index.
+        """
+        result = [None] * len(data)
+        errors = {}
+        # document class -> id -> indexes of items
+        pending = OrderedDict()
+        for index, item in enumerate(data):
+            try:
+                is_empty, value = self.validate_empty_values(item)
+                if is_empty:
+                    result[index] = value
+                    continue
+                doc_cls, doc_id = self.parse_value(value)
+            except ValidationError as exc:
+                errors[index] = exc.detail
+                continue
+            cache = get_document_cache(doc_cls)
+            doc = cache.peek(doc_id) if cache is not None else None
+            if doc is not None:
+                result[index] = doc
+            else:
+                pending.setdefault(doc_cls, OrderedDict()).setdefault(doc_id, []).append(index)
+
+        for doc_cls, indexes_by_id in pending.items():
+            cache = get_document_cache(doc_cls)
+            if cache is None:
+                found = doc_cls.objects.only('id').in_bulk(list(indexes_by_id))
+            else:
+                found = doc_cls.objects.in_bulk(list(indexes_by_id))
+                for doc in found.values():
+                    cache.set(doc)
+            for doc_id, indexes in indexes_by_id.items():
+                doc = found.get(doc_id)
+                for index in indexes:
+                    if doc is not None:
+                        result[index] = doc
+                        continue
+                    try:
+                        self.fail('not_found', pk_value=doc_id)
+                    except ValidationError as exc:
+                        errors[index] = exc.detail
+
+        if errors:
+            raise ValidationError(errors)
+        return result
+
+    def get_attribute(self, instance):
+        value = get_stored_value(self, instance)
+        if value is empty:
+            return super(GenericReferenceField, self).get_attribute(instance)
+        return value
+
     def to_representation(self, value):
-        assert isinstance(value, (Document, DBRef))
+        assert isinstance(value, (Document, DBRef, dict))
+        if isinstance(value, dict):  # as stored, not dereferenced
+            doc_id = value['_ref'].id
+            doc_cls = value['_cls'].split('.')[-1]
         if isinstance(value, Document):
             doc_id = value.id
             doc_cls = value.__class__.__name__
         if isinstance(value, DBRef):  # hard case
             doc_id = value.id
             doc_collection = value.collection
-            class_match = [k for k, v in _document_registry.items() if v._get_collection_name() == doc_collection]
-            if len(class_match) != 1:
+            doc_cls = get_collection_document(doc_collection)
+            if doc_cls is None:
                 self.fail('unmapped_collection', collection=doc_collection)
-            doc_cls = class_match[0]
         return {'_cls': doc_cls, '_id': self.pk_field.to_representation(doc_id)}
 
 
+# mongoengine field class -> instance used to validate values
+_mongo_validators = {}
+
+
+def get_mongo_validator(field_class):
+    """ Returns shared instance of mongoengine field class (they hold no state, used in validation) """
+    validator = _mongo_validators.get(field_class)
+    if validator is None:
+        validator = _mongo_validators.setdefault(field_class, field_class())
+    return validator
+
+
 class MongoValidatingField(object):
     mongo_field = me_fields.BaseField
     "mongoengine field class used to validate value"
 
+    def validate_mongo(self, value):
+        get_mongo_validator(self.mongo_field).validate(value)
+
     def run_validators(self, value):
         try:
-            self.mongo_field().validate(value)
+            self.validate_mongo(value)
         except MongoValidationError as e:
             raise ValidationError(e.message)
         super(MongoValidatingField, self).run_validators(value)
@@ -465,12 +667,25 @@ class GeoJSONField(MongoValidatingField, serializers.Field):
 
     Representation: ``{ 'type': str, 'coordinates': [ coords ] }`` (GeoJSON geometry format).
 
-    Validation: delegated to corresponding mongoengine field.
+    Validation: structure of coordinates is checked in one pass (see :mod:`geo`), invalid values are delegated
+    to corresponding mongoengine field to report its errors.
+    With ``check_bounds=True``, points should also be within longitude/latitude bounds.
+    Coordinates may contain NumPy arrays of points, which are checked in bulk and converted to lists.
+
+    Output may be reduced by query parameters of the request, enabled by giving their names as arguments
+    (i.e. with ``Meta.extra_kwargs`` of the serializer):
+
+        * ``simplify_param``: tolerance to simplify lines and rings with, in coordinate units, rounded down to a power of 2.
+        * ``precision_param``: number of decimal digits to round coordinates to.
+
+    Both are None (disabled) by default. Reduced coordinates of saved documents are cached per document and parameters
+    for ``output_cache_timeout`` seconds (see :mod:`cache`).
     """
 
     default_error_messages = {
         'invalid_type': _("Geometry must be a geojson geometry or a geojson coordinates, got {input_value}."),
         'invalid_geotype': _("Geometry expected to be '{exp_type}', got {geo_type}."),
+        'out_of_bounds': _("Point {point} is out of longitude/latitude bounds."),
     }
     valid_geo_types = {
         'Point': me_fields.PointField,
@@ -481,19 +696,97 @@ class GeoJSONField(MongoValidatingField, serializers.Field):
         'MultiPolygon': me_fields.MultiPolygonField
     }
 
+    simplify_param = None
+    precision_param = None
+    max_precision = 15
+    output_cache_timeout = 300
+
     def __init__(self, geo_type, *args, **kwargs):
         assert geo_type in self.valid_geo_types
         self.mongo_field = self.valid_geo_types[geo_type]
+        self.check_bounds = kwargs.pop('check_bounds', False)
+        self.simplify_param = kwargs.pop('simplify_param', self.simplify_param)
+        self.precision_param = kwargs.pop('precision_param', self.precision_param)
+        self.output_cache_timeout = kwargs.pop('output_cache_timeout', self.output_cache_timeout)
         super(GeoJSONField, self).__init__(*args, **kwargs)
 
+    def validate_mongo(self, value):
+        # coordinates are validated by to_internal_value
+        pass
+
+    def validate_coordinates(self, value):
+        geo_type = self.mongo_field._type
+        try:
+            coordinates = geo.check_geometry(geo_type, value, self.check_bounds)
+            if coordinates is None:
+                coordinates = geo.to_lists(value)
+                try:
+                    get_mongo_validator(self.mongo_field).validate(coordinates)
+                except MongoValidationError as e:
+                    raise ValidationError(e.message)
+                if self.check_bounds:
+                    geo.check_bounds(geo_type, coordinates)
+        except geo.OutOfBounds as e:
+            self.fail('out_of_bounds', point=list(e.point))
+        return coordinates
+
     def to_internal_value(self, value):
-        if isinstance(value, list):
-            return value
-        if not isinstance(value, dict) or 'coordinates' not in value or 'type' not in value:
+        if isinstance(value, dict):
+            if 'coordinates' not in value or 'type' not in value:
+                self.fail('invalid_type', input_value=repr(value))
+            if value['type'] != self.mongo_field._type:
+                self.fail('invalid_geotype', geo_type=repr(value['type']), exp_type=self.mongo_field._type)
+            value = value['coordinates']
+        elif not isinstance(value, list) and not geo.is_array(value):
             self.fail('invalid_type', input_value=repr(value))
-        if value['type'] != self.mongo_field._type:
-            self.fail('invalid_geotype', geo_type=repr(value['type']), exp_type=self.mongo_field._type)
-        return value['coordinates']
+        return self.validate_coordinates(value)
+
+    def get_output_options(self):
+        """ Returns tolerance and precision, requested by query parameters (or None) """
+        query_params = getattr(self.context.get('request'), 'query_params', None)
+        tolerance = precision = None
+        if not query_params:
+            return tolerance, precision
+
+        if self.simplify_param and self.simplify_param in query_params:
+            try:
+                tolerance = float(query_params[self.simplify_param])
+            except ValueError:
+                pass
+            else:
+                if not (math.isfinite(tolerance) and tolerance > 0):
+                    tolerance = None
+                else:
+                    # rounded down to power of 2 (as of zoom levels), to limit variants of cached output
+                    tolerance = 2.0 ** math.floor(math.log2(tolerance))
+        if self.precision_param and self.precision_param in query_params:
+            try:
+                precision = min(max(int(query_params[self.precision_param]), 0), self.max_precision)
+            except ValueError:
+                pass
+        return tolerance, precision
+
+    def reduce_coordinates(self, coordinates, tolerance, precision):
+        geo_type = self.mongo_field._type
+        if tolerance is not None:
+            coordinates = geo.simplify_geometry(geo_type, coordinates, tolerance)
+        if precision is not None:
+            coordinates = geo.round_geometry(geo_type, coordinates, precision)
+        return coordinates
+
+    def get_attribute(self, instance):
+        value = super(GeoJSONField, self).get_attribute(instance)
+        tolerance, precision = self.get_output_options()
+        if value is None or (tolerance is None and precision is None):
+            return value
+
+        if isinstance(value, dict):
+            value = value['coordinates']
+        compute = partial(self.reduce_coordinates, value, tolerance, precision)
+        if isinstance(instance, Document) and instance.pk is not None:
+            key = (self.source, tolerance, precision)
+            return derived_values.get(instance, key, compute, self.output_cache_timeout)
+        return compute()
 
     def to_representation(self, value):
         if isinstance(value, dict):
@@ -504,6 +797,50 @@ class GeoJSONField(MongoValidatingField, serializers.Field):
         return {'type': self.mongo_field._type, 'coordinates': val}
 
 
+class ListField(serializers.ListField):
+    """ Replacement of DRF ListField.
+
+    Lists of object ids (child is plain :class:`ObjectIdField`) are converted all at once,
+    falling back to item by item validation to report invalid items.
+    Lists of generic references are validated with one query per referenced class.
+    Lists of references, represented by ids, are taken as stored in the document, without dereferencing.
+    """
+
+    def has_plain_ids(self):
+        return type(self.child) is ObjectIdField and not self.child.validators
+
+    def run_child_validation(self, data):
+        if self.has_plain_ids():
+            try:
+                return to_object_ids(data)
+            except (InvalidId, TypeError):
+                pass
+        if isinstance(self.child, GenericReferenceField) and not self.child.validators:
+            return self.child.run_list_validation(data)
+        return super(ListField, self).run_child_validation(data)
+
+    def has_flat_references(self):
+        if isinstance(self.child, ComboReferenceField):
+            return self.child.depth == 0
+        return isinstance(self.child, (ReferenceField, GenericReferenceField))
+
+    def get_attribute(self, instance):
+        if self.has_flat_references():
+            value = get_stored_value(self, instance)
+            if value is not empty:
+                return value
+        return super(ListField, self).get_attribute(instance)
+
+    def to_representation(self, data):
+        if self.has_plain_ids():
+            return [
+                str(item) if item.__class__ is ObjectId else
+                self.child.to_representation(item) if item is not None else None
+                for item in data
+            ]
+        return super(ListField, self).to_representation(data)
+
+
 class DictField(serializers.DictField):
     default_error_messages = {
         'not_a_dict': _('Expected a dictionary of items but got type "{input_type}".'),
@@ -0,0 +1,187 @@
+import json
+
+import pymongo
+from django.core.exceptions import ImproperlyConfigured
+from mongoengine.queryset.base import BaseQuerySet
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.permissions import SAFE_METHODS
+
+from rest_framework_mongoengine.fields import GeoJSONField
+from rest_framework_mongoengine.lookups import LookupQuerySet, get_lookups
+
+" mean earth radius in meters, as used by MongoDB for spherical distances, to convert distances to radians for 2d indexes "
+EARTH_RADIUS = 6371000.0
+
+GEO_INDEX_TYPES = (pymongo.GEO2D, pymongo.GEOSPHERE)
+
+
+def get_geo_index(model, field_name):
+    """ Returns type of geo index (``2d`` or ``2dsphere``) on the field, or None if the field is not geo-indexed """
+    db_field = model._fields[field_name].db_field
+    for spec in model._meta.get('index_specs', []):
+        for key, direction in spec['fields']:
+            if key == db_field and direction in GEO_INDEX_TYPES:
+                return direction
+    return None
+
+
+class GeoFilterBackend(BaseFilterBackend):
+    """ Filter by location of documents.
+
+    Filters by model field, named by ``geo_field`` attribute of the view, with query parameters:
+
+        * ``in_bbox``: bounding box as ``min_lon,min_lat,max_lon,max_lat``.
+        * ``near``: point as ``lon,lat``, results are sorted by distance from it.
+        * ``radius``: max distance from ``near`` point, in meters.
+        * ``polygon``: GeoJSON polygon (or its coordinates) to find documents within.
+        * ``intersects``: GeoJSON geometry to find documents intersecting with (requires ``2dsphere`` index).
+
+    Parameters are validated with :class:`GeoJSONField` (including longitude/latitude bounds), invalid get 400.
+
+    The field should have a geo index, otherwise the queries would scan the collection (or fail), and ``ImproperlyConfigured`` is raised.
+    Mongoengine indexes ``GeoPointField`` (``2d``), ``PointField``, ``LineStringField`` and ``PolygonField`` (``2dsphere``) automatically;
+    other fields need an index in model meta.
+
+    With ``near``, ordering of the queryset is cleared, so the results come sorted by the geo operator, using the index.
+    The backend should go after ordering backends in ``filter_backends``.
+    """
+    bbox_param = 'in_bbox'
+    near_param = 'near'
+    radius_param = 'radius'
+    polygon_param = 'polygon'
+    intersects_param = 'intersects'
+
+    def get_geo_field(self, view):
+        return getattr(view, 'geo_field', None)
+
+    def parse_numbers(self, param, value, count):
+        try:
+            numbers = [float(item) for item in value.split(',')]
+        except ValueError:
+            numbers = []
+        if len(numbers) != count:
+            raise ValidationError({param: ["Expected %d comma-separated numbers." % count]})
+        return numbers
+
+    def parse_geometry(self, param, value, geo_type=None):
+        """ Validate GeoJSON geometry (or just coordinates if geo_type is given), returns geometry dict """
+        try:
+            value = json.loads(value)
+        except ValueError:
+            raise ValidationError({param: ["Invalid JSON."]})
+        if geo_type is None:
+            geo_type = value.get('type') if isinstance(value, dict) else None
+            if geo_type not in GeoJSONField.valid_geo_types:
+                raise ValidationError({param: ["Expected a GeoJSON geometry."]})
+        try:
+            coordinates = GeoJSONField(geo_type, check_bounds=True).run_validation(value)
+        except ValidationError as exc:
+            raise ValidationError({param: exc.detail})
+        return {'type': geo_type, 'coordinates': coordinates}
+
+    def get_bbox(self, param, value):
+        bbox = self.parse_numbers(param, value, 4)
+        try:
+            GeoJSONField('MultiPoint', check_bounds=True).run_validation([bbox[:2], bbox[2:]])
+        except ValidationError as exc:
+            raise ValidationError({param: exc.detail})
+        return bbox
+
+    def get_point(self, param, value):
+        try:
+            return GeoJSONField('Point', check_bounds=True).run_validation(self.parse_numbers(param, value, 2))
+        except ValidationError as exc:
+            raise ValidationError({param: exc.detail})
+
+    def get_radius(self, param, value):
+        try:
+            return serializers.FloatField(min_value=0).run_validation(value)
+        except ValidationError as exc:
+            raise ValidationError({param: exc.detail})
+
+    def get_bbox_query(self, field_name, index, bbox):
+        min_lon, min_lat, max_lon, max_lat = bbox
+        if index == pymongo.GEO2D:
+            return {field_name + '__within_box': [(min_lon, min_lat), (max_lon, max_lat)]}
+        # $box is not supported by 2dsphere indexes
+        ring = [[min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat], [min_lon, max_lat], [min_lon, min_lat]]
+        return {field_name + '__geo_within': {'type': 'Polygon', 'coordinates': [ring]}}
+
+    def get_near_query(self, field_name, index, point, radius):
+        if index == pymongo.GEO2D:
+            # legacy points: spherical distance in radians
+            query = {field_name + '__near_sphere': point}
+            if radius is not None:
+                query[field_name + '__max_distance'] = radius / EARTH_RADIUS
+        else:
+            query = {field_name + '__near': point}
+            if radius is not None:
+                query[field_name + '__max_distance'] = radius
+        return query
+
+    def get_polygon_query(self, field_name, index, polygon):
+        if index == pymongo.GEO2D:
+            return {field_name + '__within_polygon': polygon['coordinates'][0]}
+        return {field_name + '__geo_within': polygon}
+
+    def filter_queryset(self, request, queryset, view):
+        field_name = self.get_geo_field(view)
+        if field_name is None:
+            return queryset
+
+        params = request.query_params
+        if self.radius_param in params and self.near_param not in params:
+            raise ValidationError({self.radius_param: ["Requires '%s' parameter." % self.near_param]})
+        if not any(param in params for param in (self.bbox_param, self.near_param, self.polygon_param, self.intersects_param)):
+            return queryset
+
+        model = queryset._document
+        index = get_geo_index(model, field_name)
+        if index is None:
+            raise ImproperlyConfigured(
+                "Field '%s' of %s has no geo index, required by %s."
+                % (field_name, model.__name__, self.__class__.__name__)
+            )
+
+        if self.bbox_param in params:
+            bbox = self.get_bbox(self.bbox_param, params[self.bbox_param])
+            queryset = queryset.filter(**self.get_bbox_query(field_name, index, bbox))
+        if self.polygon_param in params:
+            polygon = self.parse_geometry(self.polygon_param, params[self.polygon_param], 'Polygon')
+            queryset = queryset.filter(**self.get_polygon_query(field_name, index, polygon))
+        if self.intersects_param in params:
+            if index == pymongo.GEO2D:
+                raise ValidationError({self.intersects_param: ["Not supported for this field."]})
+            geometry = self.parse_geometry(self.intersects_param, params[self.intersects_param])
+            queryset = queryset.filter(**{field_name + '__geo_intersects': geometry})
+        if self.near_param in params:
+            point = self.get_point(self.near_param, params[self.near_param])
+            radius = self.get_radius(self.radius_param, params[self.radius_param]) if self.radius_param in params else None
+            # $near sorts by distance itself, any explicit sort would override it
+            queryset = queryset.filter(**self.get_near_query(field_name, index, point, radius)).order_by()
+
+        return queryset
+
+
+class LookupFilterBackend(BaseFilterBackend):
+    """ Retrieve documents together with references, rendered by nested serializers (i.e. built for ``Meta.depth``).
+
+    The queryset is wrapped into :class:`lookups.LookupQuerySet`, which joins referenced documents with ``$lookup`` stages,
+    projected to fields of nested serializers, so a page of documents with all levels of references takes one aggregation.
+
+    Applies to list and retrieve (safe methods), and should go last in ``filter_backends``, since the wrapped queryset only chains
+    ``filter()``, ``order_by()`` and ``collation()``.
+    """
+
+    def get_lookups(self, view, model):
+        return get_lookups(view.get_serializer(), model)
+
+    def filter_queryset(self, request, queryset, view):
+        if request.method not in SAFE_METHODS or not isinstance(queryset, BaseQuerySet):
+            return queryset
+        lookups = self.get_lookups(view, queryset._document)
+        if not lookups:
+            return queryset
+        return LookupQuerySet(queryset, lookups)
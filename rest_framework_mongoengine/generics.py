@@ -1,8 +1,26 @@
+import calendar
+import hashlib
+from collections import namedtuple
+from datetime import datetime
+
+from bson import json_util
 from django.http import Http404
 from mongoengine import DoesNotExist, ValidationError
+from mongoengine import fields as me_fields
 from mongoengine.queryset.base import BaseQuerySet
 from rest_framework import generics as drf_generics
-from rest_framework import mixins
+from rest_framework.permissions import SAFE_METHODS
+
+from rest_framework_mongoengine import mixins
+from rest_framework_mongoengine.cache import (
+    get_cached_document, is_unrestricted, missing_documents
+)
+from rest_framework_mongoengine.utils import get_field_info
+
+Stamp = namedtuple('Stamp', [
+    'etag',  # quoted ETag value
+    'last_modified'  # timestamp or None
+])
 
 
 def get_object_or_404(queryset, *args, **kwargs):
@@ -13,24 +31,103 @@ def get_object_or_404(queryset, *args, **kwargs):
         raise Http404()
 
 
+def format_stamp(value):
+    """ Representation of stamp value, allowed in ETag: timestamps as epoch milliseconds, the precision MongoDB stores """
+    if isinstance(value, datetime):
+        return str(calendar.timegm(value.utctimetuple()) * 1000 + value.microsecond // 1000)
+    return str(value)
+
+
+def make_etag(values, hashed=False):
+    """ Quoted ETag of stamp values, or of hash of their canonical encoding (values should be in stored form, see ``to_mongo``) """
+    if hashed:
+        return '"%s"' % hashlib.sha1(json_util.dumps(values, sort_keys=True).encode()).hexdigest()
+    return '"%s"' % '-'.join(format_stamp(value) for value in values)
+
+
+def make_timestamp(value):
+    if isinstance(value, datetime):
+        return calendar.timegm(value.utctimetuple())
+    return None
+
+
 class GenericAPIView(drf_generics.GenericAPIView):
-    """ Adaptation of DRF GenericAPIView """
+    """ Adaptation of DRF GenericAPIView
+
+    Conditional requests are supported with either of attributes:
+
+        * ``stamp_field``: name of field, containing version counter or timestamp of last update.
+          The value makes ``ETag``, timestamps make ``Last-Modified`` as well. Documents without the value get no stamp.
+          For list views, collection ``ETag`` is made of max timestamp and count of filtered documents.
+        * ``etag_fields``: names of fields, which values are hashed to make ``ETag`` of a document.
+
+    With ``use_document_cache`` enabled, lookups by primary key of safe methods are served from document cache, if any is registered
+    for the model (see :func:`cache.cache_documents`) and the filtered queryset has no restrictions.
+    Updates and deletes always retrieve the document.
+
+    Lookup values are validated against the model field before querying, invalid values get 404 without a query.
+    With ``lookup_collation`` set, objects are looked up with that collation (i.e. ``{'locale': 'en', 'strength': 2}``
+    for case-insensitive lookups, using an index with the same collation).
+    With ``negative_cache_timeout`` set, primary keys found missing are remembered for that many seconds
+    and get 404 without a query as well, unless the filtered queryset has restrictions.
+
+    If the request selects fields to render (``fields`` or ``omit`` query parameters of :class:`serializers.DocumentSerializer`),
+    the queryset retrieves only model fields they need, and lists limited by serializer's ``Meta.list_limits`` are sliced
+    (see :meth:`project_queryset`).
+    """
     lookup_field = 'id'
+    lookup_collation = None
+    stamp_field = None
+    etag_fields = None
+    use_document_cache = False
+    negative_cache_timeout = None
 
     def get_queryset(self):
         ""
         queryset = super(GenericAPIView, self).get_queryset()
 
         if isinstance(queryset, BaseQuerySet):
-            queryset = queryset.all()
+            queryset = self.project_queryset(queryset.all())
 
         return queryset
 
-    def get_object(self):
-        ""
+    def project_queryset(self, queryset):
+        """ Restrict retrieved fields to ones rendered by the serializer, for requests selecting fields,
+        and slice limited lists.
+
+        Applies to safe methods. Stamp fields are always retrieved.
+        """
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in SAFE_METHODS:
+            return queryset
+        serializer = self.get_serializer()
+        if not hasattr(serializer, 'get_projection'):
+            return queryset
+
+        only, exclude = serializer.get_projection()
+        stamp_fields = self.get_stamp_fields() or []
+        if only is not None:
+            queryset = queryset.only(*(only + [name for name in stamp_fields if name not in only]))
+        elif exclude:
+            queryset = queryset.exclude(*[path for path in exclude if path not in stamp_fields])
+
+        limits = serializer.get_list_limits()
+        if limits:
+            queryset = queryset.fields(**{'slice__' + name: limit for name, limit in limits.items()})
+        return queryset
+
+    def get_lookup_queryset(self):
+        """ filtered queryset to lookup the object in """
         queryset = self.filter_queryset(self.get_queryset())
+        if self.lookup_collation is not None:
+            queryset = queryset.collation(self.lookup_collation)
+        return queryset
 
-        # Perform the lookup filtering.
+    def get_lookup_kwargs(self, queryset):
+        """ filter kwargs to lookup the object.
+
+        Raises Http404 if lookup value is not valid for the model field.
+        """
         lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
 
         assert lookup_url_kwarg in self.kwargs, (
@@ -40,14 +137,114 @@ class GenericAPIView(drf_generics.GenericAPIView):
             (self.__class__.__name__, lookup_url_kwarg)
         )
 
-        filter_kwargs = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        value = self.kwargs[lookup_url_kwarg]
+        model_field = get_field_info(queryset._document).fields_and_pk.get(self.lookup_field)
+        if model_field is not None:
+            try:
+                model_field.validate(model_field.to_python(value))
+            except (ValueError, TypeError, ValidationError):
+                raise Http404()
+
+        return {self.lookup_field: value}
+
+    def is_pk_lookup(self, queryset):
+        return self.lookup_field in ('pk', queryset._document._meta['id_field'])
+
+    def get_object(self):
+        ""
+        queryset = self.get_lookup_queryset()
+
+        # Perform the lookup filtering.
+        filter_kwargs = self.get_lookup_kwargs(queryset)
+
+        model = queryset._document
+        pk = filter_kwargs[self.lookup_field] if self.is_pk_lookup(queryset) else None
+        negative_caching = (
+            self.negative_cache_timeout is not None and pk is not None and is_unrestricted(queryset)
+        )
+
+        if negative_caching and missing_documents.contains(model, pk):
+            raise Http404()
 
-        obj = get_object_or_404(queryset, **filter_kwargs)
+        try:
+            obj = None
+            if self.use_document_cache and pk is not None and self.request.method in SAFE_METHODS:
+                try:
+                    obj = get_cached_document(queryset, pk)
+                except (ValueError, TypeError, DoesNotExist, ValidationError):
+                    raise Http404()
+
+            if obj is None:
+                obj = get_object_or_404(queryset, **filter_kwargs)
+        except Http404:
+            if negative_caching:
+                missing_documents.add(model, pk, self.negative_cache_timeout)
+            raise
 
         self.check_object_permissions(self.request, obj)
 
         return obj
 
+    def get_stamp_fields(self):
+        if self.stamp_field is not None:
+            return [self.stamp_field]
+        if self.etag_fields is not None:
+            return list(self.etag_fields)
+        return None
+
+    def get_stamp_object(self):
+        """ Requested object, holding only values of stamp fields, with object permissions checked on it """
+        queryset = self.get_lookup_queryset()
+        obj = get_object_or_404(queryset.only(*self.get_stamp_fields()), **self.get_lookup_kwargs(queryset))
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def get_object_stamp(self, obj=None):
+        """ Stamp of requested object, or None if the view defines no stamp or the object has no ``stamp_field`` value.
+
+        Unless the object is given, retrieves it by :meth:`get_stamp_object`.
+        Values of ``etag_fields`` are hashed in stored form, so the same for retrieved and given objects.
+        """
+        fields = self.get_stamp_fields()
+        if fields is None:
+            return None
+        if obj is None:
+            obj = self.get_stamp_object()
+
+        if self.stamp_field is None:
+            son = obj.to_mongo(fields=fields)
+            return Stamp(make_etag([son.get(obj._fields[name].db_field) for name in fields], hashed=True), None)
+
+        value = getattr(obj, self.stamp_field)
+        if value is None:
+            return None
+        return Stamp(make_etag([value]), make_timestamp(value))
+
+    def get_list_stamp(self):
+        """ Stamp of filtered collection, or None if the view has no timestamp field.
+
+        Calculated by aggregation over filtered queryset, without retrieving documents.
+        Only ``ETag`` is given, since deleting a document changes the count but not the max timestamp.
+        """
+        if self.stamp_field is None:
+            return None
+        queryset = self.filter_queryset(self.get_queryset())
+        model_field = queryset._document._fields[self.stamp_field]
+        if not isinstance(model_field, me_fields.DateTimeField):
+            return None
+
+        pipeline = [{'$group': {
+            '_id': None,
+            'stamp': {'$max': '$' + model_field.db_field},
+            'count': {'$sum': 1}
+        }}]
+        result = list(queryset.order_by().aggregate(pipeline))
+        if not result:
+            return Stamp(make_etag((0,)), None)
+        if result[0]['stamp'] is None:
+            return None
+        return Stamp(make_etag((result[0]['count'], result[0]['stamp'])), None)
+
 
 class CreateAPIView(mixins.CreateModelMixin,
                     GenericAPIView):
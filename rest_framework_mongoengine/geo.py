@@ -0,0 +1,234 @@
+""" Fast structural validation and simplification of GeoJSON coordinates.
+
+Each check walks the coordinates once and returns them as nested lists, if they are valid for mongoengine's field of the geometry type,
+or None otherwise. Checks are stricter than mongoengine (i.e. they only accept plain ``list``, ``tuple``, ``float`` and ``int``),
+so anything they reject should be validated again by the mongoengine field, to get its error message.
+
+Optionally, checks ensure points are within longitude/latitude bounds, raising :class:`OutOfBounds`.
+
+If NumPy is installed, lists of points may also be given as arrays of shape ``(n, 2)`` (i.e. coordinates built with geo libraries).
+Those are checked in bulk and converted to lists. NumPy is not used for lists, since building arrays of them costs more than checking them.
+
+For output, lines and rings may be simplified (Douglas-Peucker) and coordinates rounded.
+"""
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_SEQUENCES = (list, tuple)
+_NUMBERS = (float, int)
+
+# nesting level of points in coordinates
+GEOMETRY_DEPTHS = {
+    'Point': 0,
+    'LineString': 1,
+    'MultiPoint': 1,
+    'Polygon': 2,
+    'MultiLineString': 2,
+    'MultiPolygon': 3,
+}
+
+
+class OutOfBounds(Exception):
+    """ Raised by checks for a point out of longitude/latitude bounds """
+
+    def __init__(self, point):
+        super(OutOfBounds, self).__init__(point)
+        self.point = point
+
+
+def is_array(value):
+    return numpy is not None and isinstance(value, numpy.ndarray)
+
+
+def is_sequence(value):
+    return value.__class__ in _SEQUENCES or is_array(value)
+
+
+def in_bounds(x, y):
+    return -180.0 <= x <= 180.0 and -90.0 <= y <= 90.0
+
+
+def check_points_array(value, bounds):
+    if value.ndim != 2 or value.shape[0] == 0 or value.shape[1] != 2 or value.dtype.kind not in 'iuf':
+        return None
+    if bounds:
+        inside = (numpy.abs(value[:, 0]) <= 180.0) & (numpy.abs(value[:, 1]) <= 90.0)
+        if not inside.all():
+            raise OutOfBounds(value[inside.argmin()].tolist())
+    return value.tolist()
+
+
+def check_point(value, bounds=False):
+    if is_array(value):
+        points = check_points_array(value.reshape(1, -1), bounds) if value.ndim == 1 else None
+        return points[0] if points is not None else None
+    if (
+        value.__class__ not in _SEQUENCES or len(value) != 2 or
+        value[0].__class__ not in _NUMBERS or value[1].__class__ not in _NUMBERS
+    ):
+        return None
+    if bounds and not in_bounds(value[0], value[1]):
+        raise OutOfBounds(value)
+    return value
+
+
+def check_points(value, bounds=False):
+    if is_array(value):
+        return check_points_array(value, bounds)
+    if value.__class__ not in _SEQUENCES or not value:
+        return None
+    for point in value:
+        if point.__class__ not in _SEQUENCES or len(point) != 2:
+            return None
+        x, y = point
+        if x.__class__ not in _NUMBERS or y.__class__ not in _NUMBERS:
+            return None
+        if bounds and not (-180.0 <= x <= 180.0 and -90.0 <= y <= 90.0):
+            raise OutOfBounds(point)
+    return value
+
+
+def check_polygon(value, bounds=False):
+    if not is_sequence(value) or len(value) == 0:
+        return None
+    rings = []
+    for ring in value:
+        ring = check_points(ring, bounds)
+        if ring is None or ring[0] != ring[-1]:
+            return None
+        rings.append(ring)
+    return rings
+
+
+def check_multilinestring(value, bounds=False):
+    if not is_sequence(value) or len(value) == 0:
+        return None
+    lines = []
+    for line in value:
+        line = check_points(line, bounds)
+        if line is None:
+            return None
+        lines.append(line)
+    return lines
+
+
+def check_multipolygon(value, bounds=False):
+    if not is_sequence(value) or len(value) == 0:
+        return None
+    polygons = []
+    for polygon in value:
+        polygon = check_polygon(polygon, bounds)
+        if polygon is None:
+            return None
+        polygons.append(polygon)
+    return polygons
+
+
+# geometry type -> check of coordinates
+GEOMETRY_CHECKS = {
+    'Point': check_point,
+    'LineString': check_points,
+    'Polygon': check_polygon,
+    'MultiPoint': check_points,
+    'MultiLineString': check_multilinestring,
+    'MultiPolygon': check_multipolygon,
+}
+
+
+def check_geometry(geo_type, value, bounds=False):
+    """ Returns coordinates as lists if they are valid for the geometry type, None means they need full validation """
+    check = GEOMETRY_CHECKS.get(geo_type)
+    if check is None:
+        return None
+    return check(value, bounds)
+
+
+def to_lists(value):
+    """ Convert arrays within coordinates to lists """
+    if is_array(value):
+        return value.tolist()
+    if value.__class__ in _SEQUENCES:
+        return value.__class__(to_lists(item) for item in value)
+    return value
+
+
+def check_bounds(geo_type, value):
+    """ Ensure points of valid coordinates are within bounds, raising :class:`OutOfBounds` """
+    def iter_points(value, depth):
+        if depth == 0:
+            yield value
+        else:
+            for item in value:
+                for point in iter_points(item, depth - 1):
+                    yield point
+
+    for point in iter_points(value, GEOMETRY_DEPTHS[geo_type]):
+        if not in_bounds(float(point[0]), float(point[1])):
+            raise OutOfBounds(point)
+
+
+def simplify_points(points, tolerance):
+    """ Simplify line with Douglas-Peucker algorithm, dropping points closer than tolerance to simplified line """
+    count = len(points)
+    if count < 3 or tolerance <= 0:
+        return list(points)
+
+    keep = [False] * count
+    keep[0] = keep[-1] = True
+    max_distance = tolerance * tolerance
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        x1, y1 = points[first]
+        dx = points[last][0] - x1
+        dy = points[last][1] - y1
+        length = dx * dx + dy * dy
+        farthest, distance = None, max_distance
+        for index in range(first + 1, last):
+            x, y = points[index]
+            if length:
+                t = ((x - x1) * dx + (y - y1) * dy) / length
+                t = 0 if t < 0 else 1 if t > 1 else t
+                x -= x1 + t * dx
+                y -= y1 + t * dy
+            else:
+                x -= x1
+                y -= y1
+            if x * x + y * y > distance:
+                farthest, distance = index, x * x + y * y
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def simplify_ring(ring, tolerance):
+    """ Simplify closed ring, keeping it as is if it would collapse """
+    simplified = simplify_points(ring, tolerance)
+    return simplified if len(simplified) >= 4 else list(ring)
+
+
+def simplify_geometry(geo_type, coordinates, tolerance):
+    """ Simplify lines and rings of geometry, points are left as is """
+    if geo_type == 'LineString':
+        return simplify_points(coordinates, tolerance)
+    if geo_type == 'MultiLineString':
+        return [simplify_points(line, tolerance) for line in coordinates]
+    if geo_type == 'Polygon':
+        return [simplify_ring(ring, tolerance) for ring in coordinates]
+    if geo_type == 'MultiPolygon':
+        return [[simplify_ring(ring, tolerance) for ring in polygon] for polygon in coordinates]
+    return coordinates
+
+
+def round_geometry(geo_type, coordinates, precision):
+    """ Round coordinates of all points to given number of decimal digits """
+    def round_points(value, depth):
+        if depth == 0:
+            return [round(value[0], precision), round(value[1], precision)]
+        return [round_points(item, depth - 1) for item in value]
+
+    return round_points(coordinates, GEOMETRY_DEPTHS[geo_type])
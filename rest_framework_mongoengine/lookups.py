@@ -0,0 +1,283 @@
+""" Retrieval of documents with their references, joined by ``$lookup`` stages of a single aggregation.
+
+Nested serializers of references (i.e. built for ``Meta.depth``) make a tree of lookups. Each lookup joins documents,
+referenced by ``ReferenceField`` or ``ListField(ReferenceField)``, into a temporary array of the retrieved document,
+projected to fields of the nested serializer. Lookups of nested serializers join from those arrays in turn.
+
+Joined documents are set into referencing documents, as mongoengine does on dereferencing, so nested serializers render them without queries.
+References, missing from joined arrays, are left as is and dereferenced as usual.
+
+Only references stored as plain ids (``dbref=False``, the default) can be joined.
+Note, joined documents count to the 16MB limit of aggregation results.
+"""
+from bson import DBRef
+from mongoengine import Document
+from mongoengine import fields as me_fields
+from mongoengine.base import get_document
+from rest_framework import serializers
+
+ALIAS_PREFIX = '_lookup_'
+
+# conditions not allowed in $match stage of aggregations
+NON_AGGREGATABLE = ('$near', '$nearSphere', '$where', '$text')
+
+
+class Lookup(object):
+    """ Join of documents, referenced by a field, and of their own references """
+
+    def __init__(self, name, local_field, alias, model, many, fields, children):
+        self.name = name  # name of referencing model field
+        self.local_field = local_field  # path to referencing db field in aggregated document
+        self.alias = alias  # temporary array of joined documents
+        self.model = model
+        self.many = many
+        self.fields = fields  # db fields to project, or None for whole documents
+        self.children = children
+
+    def __repr__(self):
+        return '<Lookup %s>' % self.alias
+
+    def build(self, value, joined):
+        """ Make document, referenced by the value, from joined data, or return the value if it was not joined """
+        if isinstance(value, DBRef):
+            pk = value.id
+        elif isinstance(value, Document):
+            pk = value.pk
+        else:
+            pk = value
+        son = joined[self.alias].get(pk)
+        if son is None:
+            return value
+        document = self.model._from_son(son)
+        attach_documents(document, self.children, joined)
+        return document
+
+
+def get_nested_serializer(field):
+    """ Returns nested serializer of the field and whether it renders a list, or ``(None, False)`` """
+    if isinstance(field, serializers.ListSerializer):
+        return field.child, True
+    if isinstance(field, serializers.BaseSerializer):
+        return field, False
+    if isinstance(field, serializers.ListField) and isinstance(field.child, serializers.BaseSerializer):
+        return field.child, True
+    return None, False
+
+
+def get_projection(serializer, model):
+    """ Names of db fields, rendered by the serializer, or None if it may need any """
+    names = ['_id']
+    if model._meta.get('allow_inheritance'):
+        names.append('_cls')
+    for field in serializer._readable_fields:
+        model_field = model._fields.get(field.source_attrs[0]) if field.source_attrs else None
+        if model_field is None:
+            return None
+        if model_field.db_field not in names:
+            names.append(model_field.db_field)
+    return names
+
+
+def get_lookups(serializer, model, prefix=''):
+    """ Build lookups for nested serializers of plain references.
+
+    Fields, nested into arrays of ``prefix`` (i.e. in deeper lookups), are named relative to it.
+    """
+    lookups = []
+    for field in serializer._readable_fields:
+        nested, many = get_nested_serializer(field)
+        if nested is None or len(field.source_attrs) != 1:
+            continue
+        model_field = model._fields.get(field.source_attrs[0])
+        ref_field = model_field
+        if many:
+            ref_field = model_field.field if isinstance(model_field, me_fields.ListField) else None
+        if not isinstance(ref_field, me_fields.ReferenceField) or ref_field.dbref:
+            continue
+
+        name = field.source_attrs[0]
+        local_field = prefix + '.' + model_field.db_field if prefix else model_field.db_field
+        alias = prefix + '__' + name if prefix else ALIAS_PREFIX + name
+        related = ref_field.document_type
+        lookups.append(Lookup(
+            name, local_field, alias, related, many,
+            get_projection(nested, related),
+            get_lookups(nested, related, alias)
+        ))
+    return lookups
+
+
+def iter_lookups(lookups):
+    """ Lookups of all levels, outer first """
+    for lookup in lookups:
+        yield lookup
+        for child in iter_lookups(lookup.children):
+            yield child
+
+
+def get_model_fields(model):
+    """ db fields of documents in the collection of the model, or None for dynamic documents """
+    names = ['_id', '_cls'] if model._meta.get('allow_inheritance') else ['_id']
+    for class_name in model._subclasses:
+        cls = get_document(class_name)
+        if cls._dynamic:
+            return None
+        for field in cls._fields.values():
+            if field.db_field not in names:
+                names.append(field.db_field)
+    return names
+
+
+def get_pipeline(lookups, model):
+    """ Aggregation stages, joining referenced documents, with projection of joined arrays """
+    stages = []
+    projection = {}
+    for lookup in iter_lookups(lookups):
+        stages.append({'$lookup': {
+            'from': lookup.model._get_collection_name(),
+            'localField': lookup.local_field,
+            'foreignField': '_id',
+            'as': lookup.alias,
+        }})
+        if lookup.fields is None:
+            projection[lookup.alias] = 1
+        else:
+            for name in lookup.fields:
+                projection[lookup.alias + '.' + name] = 1
+
+    # inclusive projection can not keep unknown fields of dynamic documents, so they get whole joined documents
+    model_fields = get_model_fields(model)
+    if stages and model_fields is not None:
+        for name in model_fields:
+            projection[name] = 1
+        stages.append({'$project': projection})
+    return stages
+
+
+def pop_joined(son, lookups):
+    """ Remove arrays of joined documents from aggregated document, returns them as dicts by primary key """
+    return {
+        lookup.alias: {item['_id']: item for item in son.pop(lookup.alias, None) or []}
+        for lookup in iter_lookups(lookups)
+    }
+
+
+def attach_documents(document, lookups, joined):
+    """ Set joined documents into referencing document """
+    for lookup in lookups:
+        value = document._data.get(lookup.name)
+        if value is None:
+            continue
+        if lookup.many:
+            document._data[lookup.name] = [lookup.build(item, joined) for item in value]
+        else:
+            document._data[lookup.name] = lookup.build(value, joined)
+
+
+def has_operator(query, operators):
+    if isinstance(query, dict):
+        return any(key in operators or has_operator(value, operators) for key, value in query.items())
+    if isinstance(query, (list, tuple)):
+        return any(has_operator(item, operators) for item in query)
+    return False
+
+
+class LookupQuerySet(object):
+    """ Lazy wrapper of queryset, retrieving documents with joined references in one aggregation.
+
+    Supports iteration, slicing, ``count()`` and ``get()``, as used by paginators and ``get_object``,
+    and chains ``all()``, ``filter()``, ``order_by()`` and ``collation()``. Other attributes are taken from the wrapped queryset.
+
+    Querysets, which can not be aggregated (with ``$near``, ``$where`` or ``$text`` conditions, restricted fields,
+    or without dereferencing), are iterated as usual.
+    """
+
+    def __init__(self, queryset, lookups):
+        self.queryset = queryset
+        self.lookups = lookups
+        self._result_cache = None
+
+    def __getattr__(self, name):
+        queryset = self.__dict__.get('queryset')
+        if queryset is None:
+            raise AttributeError(name)
+        return getattr(queryset, name)
+
+    def _clone(self, queryset):
+        return self.__class__(queryset, self.lookups)
+
+    def all(self):
+        return self._clone(self.queryset.all())
+
+    def filter(self, *args, **kwargs):
+        return self._clone(self.queryset.filter(*args, **kwargs))
+
+    def order_by(self, *keys):
+        return self._clone(self.queryset.order_by(*keys))
+
+    def collation(self, collation=None):
+        return self._clone(self.queryset.collation(collation))
+
+    def count(self):
+        return self.queryset.count(with_limit_and_skip=True)
+
+    def get(self, *args, **kwargs):
+        queryset = self.queryset.filter(*args, **kwargs).limit(2)
+        documents = list(self._clone(queryset))
+        if not documents:
+            model = queryset._document
+            raise model.DoesNotExist("%s matching query does not exist." % model._class_name)
+        if len(documents) > 1:
+            raise queryset._document.MultipleObjectsReturned("2 or more items returned, instead of 1")
+        return documents[0]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._clone(self.queryset[key])
+        documents = list(self._clone(self.queryset[key:key + 1]))
+        if not documents:
+            raise IndexError("list index out of range")
+        return documents[0]
+
+    def __iter__(self):
+        return iter(self._fetch())
+
+    def __len__(self):
+        return len(self._fetch())
+
+    def is_aggregatable(self):
+        queryset = self.queryset
+        return (
+            queryset._where_clause is None and
+            queryset._search_text is None and
+            not queryset._none and
+            not queryset._scalar and
+            not queryset._as_pymongo and
+            not queryset._loaded_fields and
+            queryset._auto_dereference and
+            not has_operator(queryset._query, NON_AGGREGATABLE)
+        )
+
+    def _fetch(self):
+        if self._result_cache is None:
+            self._result_cache = list(self.iter_documents())
+        return self._result_cache
+
+    def iter_documents(self):
+        queryset = self.queryset
+        if not self.lookups or not self.is_aggregatable():
+            for document in queryset:
+                yield document
+            return
+
+        model = queryset._document
+        # aggregation does not apply default ordering of the model, as cursors do
+        if not queryset._ordering and model._meta.get('ordering'):
+            queryset = queryset.order_by(*model._meta['ordering'])
+        kwargs = {'collation': queryset._collation} if queryset._collation else {}
+
+        for son in queryset.aggregate(get_pipeline(self.lookups, model), **kwargs):
+            joined = pop_joined(son, self.lookups)
+            document = model._from_son(son)
+            attach_documents(document, self.lookups, joined)
+            yield document
@@ -0,0 +1,230 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from mongoengine import fields as me_fields
+from rest_framework import mixins, serializers
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.mixins import (  # noqa
+    CreateModelMixin, DestroyModelMixin, UpdateModelMixin
+)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+CONDITIONAL_HEADERS = ('HTTP_IF_MATCH', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_UNMODIFIED_SINCE')
+
+
+def is_conditional(request):
+    return any(header in request.META for header in CONDITIONAL_HEADERS)
+
+
+def has_operator(query, operators):
+    """ Whether raw query uses any of the operators, at any depth """
+    if isinstance(query, dict):
+        return any(key in operators or has_operator(value, operators) for key, value in query.items())
+    if isinstance(query, (list, tuple)):
+        return any(has_operator(value, operators) for value in query)
+    return False
+
+
+def set_stamp_headers(response, stamp):
+    if stamp is None:
+        return response
+    if stamp.etag is not None:
+        response['ETag'] = stamp.etag
+    if stamp.last_modified is not None:
+        response['Last-Modified'] = http_date(stamp.last_modified)
+    return response
+
+
+class RetrieveModelMixin(mixins.RetrieveModelMixin):
+    """ Adaptation of DRF RetrieveModelMixin, supporting conditional requests.
+
+    If the view defines a stamp (see :class:`generics.GenericAPIView`), conditional requests check the stamp first, retrieving only stamp fields,
+    and 304 is responded without loading and serializing the document. Responses get ``ETag`` and ``Last-Modified`` headers.
+    Object permissions are checked in that case on the document holding only stamp fields.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        stamp = self.get_object_stamp() if is_conditional(request) else None
+        if stamp is not None:
+            response = get_conditional_response(request, etag=stamp.etag, last_modified=stamp.last_modified)
+            if response is not None:
+                return set_stamp_headers(Response(status=response.status_code), stamp)
+
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        return set_stamp_headers(Response(serializer.data), self.get_object_stamp(instance))
+
+
+class ListModelMixin(mixins.ListModelMixin):
+    """ Adaptation of DRF ListModelMixin, supporting conditional requests.
+
+    If the view's ``stamp_field`` is a timestamp (see :class:`generics.GenericAPIView`), collection ``ETag`` is aggregated over filtered queryset,
+    and 304 is responded without loading and serializing documents.
+    """
+
+    def list(self, request, *args, **kwargs):
+        stamp = self.get_list_stamp()
+        if stamp is not None:
+            response = get_conditional_response(request, etag=stamp.etag, last_modified=stamp.last_modified)
+            if response is not None:
+                return set_stamp_headers(Response(status=response.status_code), stamp)
+
+        response = super(ListModelMixin, self).list(request, *args, **kwargs)
+        return set_stamp_headers(response, stamp)
+
+
+class ClusterSerializer(serializers.Serializer):
+    """ Serializer of clusters, aggregated by :class:`ClusterModelMixin` """
+    count = serializers.IntegerField()
+    centroid = serializers.ListField(child=serializers.FloatField())
+    bbox = serializers.ListField(child=serializers.FloatField())
+
+
+class ClusterModelMixin(object):
+    """ Viewset action ``clusters``, grouping filtered documents by their location.
+
+    Points of the view's ``geo_field`` (``GeoPointField`` or ``PointField``) are grouped by aggregation into grid cells
+    of ``360 / 2 ** zoom`` degrees, zoom given by query parameter (``zoom`` up to ``max_cluster_zoom``).
+    Only clusters are retrieved, each with count of documents, centroid ``[lon, lat]`` and bounding box of its cell.
+
+    The queryset is filtered by the view's filter backends (i.e. ``in_bbox`` of :class:`filters.GeoFilterBackend`).
+    MongoDB does not allow ``$near`` in aggregations, so querysets filtered by distance (``near``) get 400.
+    """
+    cluster_zoom_param = 'zoom'
+    max_cluster_zoom = 20
+    max_clusters = 10000
+    cluster_serializer_class = ClusterSerializer
+    near_operators = ('$near', '$nearSphere')
+
+    def get_cluster_zoom(self):
+        field = serializers.IntegerField(min_value=0, max_value=self.max_cluster_zoom)
+        try:
+            return field.run_validation(self.request.query_params.get(self.cluster_zoom_param, 0))
+        except ValidationError as exc:
+            raise ValidationError({self.cluster_zoom_param: exc.detail})
+
+    def get_cluster_pipeline(self, model, zoom):
+        field_name = getattr(self, 'geo_field', None)
+        model_field = model._fields.get(field_name)
+        if isinstance(model_field, me_fields.GeoPointField):
+            path = '$' + model_field.db_field
+        elif isinstance(model_field, me_fields.PointField):
+            path = '$' + model_field.db_field + '.coordinates'
+        else:
+            raise ImproperlyConfigured(
+                "%s requires `geo_field` to name a GeoPointField or PointField of %s."
+                % (self.__class__.__name__, model.__name__)
+            )
+
+        size = 360.0 / 2 ** zoom
+
+        def cell(axis, offset):
+            index = {'$floor': {'$divide': [{'$add': [{'$arrayElemAt': [path, axis]}, offset]}, size]}}
+            # points on the east and north edges belong to the last cells
+            return {'$min': [index, max(int(2 * offset / size) - 1, 0)]}
+
+        return [
+            {'$match': {model_field.db_field: {'$ne': None}}},
+            {'$group': {
+                '_id': {'x': cell(0, 180), 'y': cell(1, 90)},
+                'count': {'$sum': 1},
+                'lon': {'$avg': {'$arrayElemAt': [path, 0]}},
+                'lat': {'$avg': {'$arrayElemAt': [path, 1]}},
+            }},
+            {'$sort': {'count': -1}},
+            {'$limit': self.max_clusters},
+        ]
+
+    def make_cluster(self, group, zoom):
+        size = 360.0 / 2 ** zoom
+        min_lon = group['_id']['x'] * size - 180
+        min_lat = group['_id']['y'] * size - 90
+        return {
+            'count': group['count'],
+            'centroid': [group['lon'], group['lat']],
+            'bbox': [min_lon, min_lat, min(min_lon + size, 180.0), min(min_lat + size, 90.0)],
+        }
+
+    @action(detail=False)
+    def clusters(self, request, *args, **kwargs):
+        zoom = self.get_cluster_zoom()
+        queryset = self.filter_queryset(self.get_queryset())
+        if has_operator(queryset._query, self.near_operators):
+            raise ValidationError(["Clusters can't be aggregated for documents sorted by distance."])
+        pipeline = self.get_cluster_pipeline(queryset._document, zoom)
+        clusters = [self.make_cluster(group, zoom) for group in queryset.order_by().aggregate(pipeline)]
+        serializer = self.cluster_serializer_class(clusters, many=True)
+        return Response(serializer.data)
+
+
+class ListItemsModelMixin(object):
+    """ Viewset action ``list_items``, paging through a list field of a document server-side.
+
+    ``GET <detail>/items/<field>/?offset=&limit=`` renders items of a list field, named in ``Meta.list_limits`` of the serializer
+    (see :class:`serializers.DocumentSerializer`). One aggregation retrieves only requested items with ``$slice``
+    and the length of the list with ``$size``. Page size defaults to the field's limit, up to ``max_items_limit``.
+    Responses are formatted as by ``LimitOffsetPagination``, with ``count``, ``next``, ``previous`` and ``results``.
+
+    The document is looked up as by ``get_object``, with ``lookup_collation`` if set,
+    but object permissions are checked on it holding only the list.
+    """
+    items_offset_param = 'offset'
+    items_limit_param = 'limit'
+    max_items_limit = 1000
+
+    def get_items_param(self, param, default, min_value, max_value=None):
+        field = serializers.IntegerField(min_value=min_value, max_value=max_value)
+        try:
+            return field.run_validation(self.request.query_params.get(param, default))
+        except ValidationError as exc:
+            raise ValidationError({param: exc.detail})
+
+    def get_items_pipeline(self, model, model_field, offset, limit):
+        path = {'$ifNull': ['$' + model_field.db_field, []]}
+        projection = {
+            model_field.db_field: {'$slice': [path, offset, limit]},
+            '_items_count': {'$size': path},
+        }
+        if model._meta.get('allow_inheritance'):
+            projection['_cls'] = 1
+        return [{'$limit': 1}, {'$project': projection}]
+
+    def get_items_link(self, offset, limit):
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.items_limit_param, limit)
+        return replace_query_param(url, self.items_offset_param, offset)
+
+    @action(detail=True, url_path=r'items/(?P<items_field>[^/.]+)')
+    def list_items(self, request, items_field=None, *args, **kwargs):
+        serializer = self.get_serializer()
+        limits = getattr(serializer.Meta, 'list_limits', {})
+        field = serializer.fields.get(items_field)
+        if items_field not in limits or field is None:
+            raise Http404()
+
+        offset = self.get_items_param(self.items_offset_param, 0, 0)
+        limit = self.get_items_param(self.items_limit_param, limits[items_field], 1, self.max_items_limit)
+
+        queryset = self.get_lookup_queryset()
+        queryset = queryset.filter(**self.get_lookup_kwargs(queryset)).order_by()
+        model = queryset._document
+        model_field = model._fields[field.source_attrs[0]]
+        # aggregate does not apply collation of the queryset
+        kwargs = {'collation': queryset._collation} if queryset._collation else {}
+        try:
+            son = next(iter(queryset.aggregate(self.get_items_pipeline(model, model_field, offset, limit), **kwargs)))
+        except StopIteration:
+            raise Http404()
+        count = son.pop('_items_count')
+        obj = model._from_son(son)
+        self.check_object_permissions(request, obj)
+
+        return Response({
+            'count': count,
+            'next': self.get_items_link(offset + limit, limit) if offset + limit < count else None,
+            'previous': self.get_items_link(max(offset - limit, 0), limit) if offset > 0 else None,
+            'results': field.to_representation(getattr(obj, model_field.name)),
+        })
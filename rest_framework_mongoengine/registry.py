@@ -0,0 +1,64 @@
+from mongoengine import Document
+from mongoengine.base.common import _document_registry
+from mongoengine.errors import NotRegistered
+
+
+class DocumentIndex(object):
+    """ Index of names of registered document classes, by collection and by short (old-style) class name.
+
+    Rebuilt when classes are added to mongoengine document registry.
+    Collection lookups are checked against the registry, so classes redefined under the same name are noticed as well.
+    """
+
+    def __init__(self):
+        self._state = (None, {}, {})
+
+    def rebuild(self):
+        by_collection = {}
+        by_short_name = {}
+        for name, doc_cls in list(_document_registry.items()):
+            by_short_name.setdefault(name.split('.')[-1], []).append(name)
+            if issubclass(doc_cls, Document):
+                collection = doc_cls._get_collection_name()
+                if collection is not None:
+                    by_collection.setdefault(collection, []).append(name)
+        self._state = (len(_document_registry), by_collection, by_short_name)
+        return self._state
+
+    def get_state(self):
+        state = self._state
+        if state[0] != len(_document_registry):
+            state = self.rebuild()
+        return state
+
+    def names_by_collection(self, collection):
+        names = self.get_state()[1].get(collection, [])
+        for name in names:
+            doc_cls = _document_registry.get(name)
+            if doc_cls is None or doc_cls._get_collection_name() != collection:
+                return self.rebuild()[1].get(collection, [])
+        return names
+
+    def names_by_short_name(self, short_name):
+        return self.get_state()[2].get(short_name, [])
+
+
+document_index = DocumentIndex()
+
+
+def get_collection_document(collection):
+    """ Returns name of the only document class, stored in the collection, or None """
+    names = document_index.names_by_collection(collection)
+    return names[0] if len(names) == 1 else None
+
+
+def get_document_class(name):
+    """ Replacement of mongoengine ``get_document``, resolving old-style names through the index instead of scanning the registry """
+    doc_cls = _document_registry.get(name)
+    if doc_cls is None:
+        names = document_index.names_by_short_name(name.split('.')[-1])
+        if len(names) == 1:
+            doc_cls = _document_registry.get(names[0])
+    if doc_cls is None:
+        raise NotRegistered('`%s` has not been registered in the document registry.' % name)
+    return doc_cls
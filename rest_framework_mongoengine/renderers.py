@@ -0,0 +1,56 @@
+import json
+
+from rest_framework.compat import SHORT_SEPARATORS
+from rest_framework.renderers import JSONRenderer
+
+
+class JSONFragment(bytes):
+    """ Pre-encoded JSON value.
+
+    Produced by :class:`serializers.FragmentListSerializer` and spliced verbatim into output by :class:`FragmentJSONRenderer`.
+    """
+    pass
+
+
+def has_fragments(value):
+    """ Check if the value contains :class:`JSONFragment` at any depth """
+    if isinstance(value, JSONFragment):
+        return True
+    if isinstance(value, dict):
+        return any(has_fragments(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(has_fragments(item) for item in value)
+    return False
+
+
+class FragmentJSONRenderer(JSONRenderer):
+    """ JSONRenderer, assembling lists of pre-encoded fragments.
+
+    Each :class:`JSONFragment` is spliced as is, at any depth of dicts and lists (i.e. in pagination envelopes).
+    Data without fragments are encoded as by ``JSONRenderer``. Output with fragments is always compact, regardless of requested indentation.
+    """
+
+    def encode(self, data):
+        """ encode a value as compact JSON bytes """
+        ret = json.dumps(
+            data, cls=self.encoder_class,
+            ensure_ascii=self.ensure_ascii,
+            allow_nan=not self.strict, separators=SHORT_SEPARATORS
+        )
+        ret = ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+        return ret.encode()
+
+    def splice(self, data):
+        """ encode a value, splicing fragments it contains """
+        if isinstance(data, JSONFragment):
+            return bytes(data)
+        if not has_fragments(data):
+            return self.encode(data)
+        if isinstance(data, dict):
+            return b'{' + b','.join(self.encode(str(key)) + b':' + self.splice(value) for key, value in data.items()) + b'}'
+        return b'[' + b','.join(self.splice(item) for item in data) + b']'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if has_fragments(data):
+            return self.splice(data)
+        return super(FragmentJSONRenderer, self).render(data, accepted_media_type, renderer_context)
@@ -1,19 +1,38 @@
 import copy
+import hashlib
+import uuid
 import warnings
 from collections import OrderedDict, namedtuple
-
+from collections.abc import Mapping
+from functools import partial
+
+from bson import DBRef, ObjectId
+from django.core.cache import caches
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils.translation import gettext_lazy as _
+from mongoengine import Document, signals
 from mongoengine import fields as me_fields
+from mongoengine.base import BaseDocument
+from mongoengine.errors import BulkWriteError, NotUniqueError
 from mongoengine.errors import ValidationError as me_ValidationError
+from pymongo import errors as pymongo_errors
 from rest_framework import fields as drf_fields
 from rest_framework import serializers
+from rest_framework import validators as drf_validators
+from rest_framework.fields import SkipField, get_error_detail, set_value
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.serializers import ALL_FIELDS
+from rest_framework.settings import api_settings
 from rest_framework.utils.field_mapping import ClassLookupDict
 
+from rest_framework_mongoengine import concurrency
 from rest_framework_mongoengine import fields as drfm_fields
+from rest_framework_mongoengine.lookups import get_nested_serializer
 from rest_framework_mongoengine.validators import (
-    UniqueTogetherValidator, UniqueValidator
+    UniqueTogetherValidator, UniqueValidator, get_duplicate_key_fields
 )
 
+from .renderers import FragmentJSONRenderer, JSONFragment
 from .repr import serializer_repr
 from .utils import (
     COMPOUND_FIELD_TYPES, get_field_info, get_field_kwargs,
@@ -65,6 +84,259 @@ def raise_errors_on_nested_writes(method_name, serializer, validated_data):
     )
 
 
+def get_path(field_name):
+    """ dotted path of model field, as used in ``expand``, without ``child`` of compound fields """
+    return '.'.join(part for part in field_name.split('.') if part != 'child')
+
+
+def intersect_paths(paths, allowed):
+    """ Paths, selecting fields within both sets (whole field paths select all their nested paths) """
+    result = set()
+    for path in paths:
+        for other in allowed:
+            if path == other or path.startswith(other + '.'):
+                result.add(path)
+            elif other.startswith(path + '.'):
+                result.add(other)
+    return result
+
+
+def prefetch_nested_references(serializer, instances):
+    """ Retrieve documents, rendered by nested serializers of references, with one ``$in`` query per field and level.
+
+    Documents are set into referencing instances, as mongoengine does on dereferencing, so rendering does not query.
+    References within embedded documents, rendered by nested serializers, are collected as well.
+    """
+    for field in serializer._readable_fields:
+        nested, many = get_nested_serializer(field)
+        if nested is None or len(field.source_attrs) != 1:
+            continue
+        name = field.source_attrs[0]
+        model = None
+        referencing = []
+        refs = []
+        embedded = []
+        for instance in instances:
+            if not isinstance(instance, BaseDocument):
+                continue
+            model_field = instance._fields.get(name)
+            value = instance._data.get(name)
+            if many and isinstance(model_field, me_fields.ListField) and isinstance(value, list):
+                model_field = model_field.field
+                items = value
+            elif not many and value is not None:
+                items = [value]
+            else:
+                continue
+            if isinstance(model_field, me_fields.ReferenceField):
+                items = [item for item in items if isinstance(item, DBRef)]
+                if items:
+                    model = model_field.document_type
+                    referencing.append(instance)
+                    refs.extend(items)
+            elif isinstance(model_field, me_fields.EmbeddedDocumentField):
+                embedded.extend(item for item in items if isinstance(item, BaseDocument))
+
+        if embedded:
+            prefetch_nested_references(nested, embedded)
+        if not refs:
+            continue
+
+        found = model.objects.in_bulk(list(OrderedDict.fromkeys(ref.id for ref in refs)))
+        for instance in referencing:
+            value = instance._data[name]
+            if many:
+                instance._data[name] = [
+                    found.get(item.id, item) if isinstance(item, DBRef) else item for item in value
+                ]
+            elif value.id in found:
+                instance._data[name] = found[value.id]
+        prefetch_nested_references(nested, list(found.values()))
+
+
+def get_write_error(exc):
+    """ First of ``writeErrors`` of bulk write error, raised by pymongo (and wrapped by mongoengine), or None """
+    error = exc
+    while error is not None and not isinstance(error, pymongo_errors.BulkWriteError):
+        error = error.__cause__ or error.__context__
+    write_errors = (getattr(error, 'details', None) or {}).get('writeErrors') or []
+    return write_errors[0] if write_errors else None
+
+
+class DocumentListSerializer(serializers.ListSerializer):
+    """ ListSerializer, validating uniqueness of all items at once.
+
+    Used by :class:`DocumentSerializer` with ``many=True``, unless ``Meta.list_serializer_class`` is set.
+    When creating documents, uniqueness validators of the child do not query for each item:
+    values repeated in the payload are found in memory, and existing values with one query per validator.
+    Errors are reported per item, once all items pass other validation.
+
+    With ``Meta.bulk_insert`` of the child, new documents are created in bulk:
+
+        * nested data of :class:`fields.ComboReferenceField` is validated with one list serializer per field
+        * referenced documents, created from nested data, are inserted with one ``insert_many`` per field
+        * then the documents themselves are inserted with one ``insert_many``
+
+    Documents are validated by mongoengine before inserting, but ``save`` is not called and ``post_save`` signals are not sent.
+    If an insert fails, documents inserted before (referenced ones, and the ones preceding the failed document) are deleted.
+    This is not atomic: other clients may see them meanwhile, and documents without preassigned primary keys
+    (other than ``ObjectIdField``) cannot be deleted. Duplicate key errors are reported per item, as by uniqueness validators,
+    other write errors are raised as is.
+    The bulk mode is not used if the child serializer overrides ``create``.
+    """
+
+    @property
+    def validates_uniqueness_in_batch(self):
+        # lists of instances are validated item by item, to exclude each instance
+        return self.instance is None
+
+    @property
+    def inserts_in_bulk(self):
+        return (
+            self.instance is None and
+            getattr(getattr(self.child, 'Meta', None), 'bulk_insert', False) and
+            type(self.child).create is DocumentSerializer.create
+        )
+
+    def get_combo_fields(self):
+        return [
+            field for field in self.child._writable_fields
+            if isinstance(field, drfm_fields.ComboReferenceField) and len(field.source_attrs) == 1
+        ]
+
+    def to_internal_value(self, data):
+        combo_fields = self.get_combo_fields() if self.inserts_in_bulk and isinstance(data, list) else []
+        for field in combo_fields:
+            values = [field.get_value(item) for item in data if isinstance(item, Mapping)]
+            values = [value for value in values if field.is_inline(value)]
+            if values:
+                field.validate_inline(values)
+        try:
+            ret = super(DocumentListSerializer, self).to_internal_value(data)
+        finally:
+            for field in combo_fields:
+                field.clear_inline()
+
+        if self.validates_uniqueness_in_batch:
+            errors = [{} for item in ret]
+            self.validate_uniqueness(ret, errors)
+            if any(errors):
+                raise serializers.ValidationError(errors)
+        return ret
+
+    def create(self, validated_data):
+        if not self.inserts_in_bulk:
+            return super(DocumentListSerializer, self).create(validated_data)
+
+        instances = []
+        for attrs in validated_data:
+            raise_errors_on_nested_writes('create', self.child, attrs)
+            instances.append(self.child.recursive_build(attrs))
+
+        # combo field (None for the documents themselves) and documents to insert, referenced ones first
+        batches = []
+        for field in self.get_combo_fields():
+            referenced = [instance._data.get(field.source) for instance in instances]
+            referenced = [doc for doc in referenced if isinstance(doc, Document) and doc.pk is None]
+            if referenced:
+                batches.append((field, list(OrderedDict((id(doc), doc) for doc in referenced).values())))
+        batches.append((None, instances))
+
+        inserted = []
+        for field, documents in batches:
+            model = field.model if field is not None else self.child.get_model()
+            try:
+                self.insert(model, documents)
+            except (NotUniqueError, BulkWriteError) as exc:
+                write_error = get_write_error(exc)
+                if write_error is not None:
+                    # ordered insert stops at the failed document
+                    inserted.append((model, documents[:write_error['index']]))
+                self.delete_inserted(inserted)
+                if write_error is not None and write_error.get('code') == 11000:
+                    raise self.get_insert_error(write_error, field, documents, instances)
+                if isinstance(exc, NotUniqueError):
+                    raise serializers.ValidationError({
+                        api_settings.NON_FIELD_ERRORS_KEY: [self.child.error_messages['not_unique']]
+                    }, code='unique')
+                raise
+            inserted.append((model, documents))
+        return instances
+
+    def insert(self, model, documents):
+        id_field = model._fields[model._meta['id_field']]
+        for document in documents:
+            if document.pk is None and isinstance(id_field, me_fields.ObjectIdField):
+                # known before inserting, to delete inserted documents if the insert fails
+                document.pk = ObjectId()
+                # setting pk marks document as existing, which insert refuses
+                document._created = True
+            document.validate()
+        model.objects.insert(documents, load_bulk=False)
+        for document in documents:
+            # as after Document.save
+            document._created = False
+            document._clear_changed_fields()
+
+    def delete_inserted(self, inserted):
+        for model, documents in reversed(inserted):
+            pks = [document.pk for document in documents if document.pk is not None]
+            if pks:
+                model.objects(pk__in=pks).delete()
+
+    def get_insert_error(self, write_error, field, documents, instances):
+        """ Errors by item for duplicate key error of a document, inserted by the combo field (or None for the item itself) """
+        exc = pymongo_errors.DuplicateKeyError(write_error.get('errmsg', ''), write_error['code'], write_error)
+        document = documents[write_error['index']]
+        if field is None:
+            return serializers.ValidationError([
+                self.child.get_unique_error(exc).detail if instance is document else {} for instance in instances
+            ])
+        detail = {field.field_name: field.serializer().get_unique_error(exc).detail}
+        return serializers.ValidationError([
+            detail if instance._data.get(field.source) is document else {} for instance in instances
+        ])
+
+    def to_representation(self, data):
+        instances = list(data)
+        self.prefetch_references(instances)
+        return super(DocumentListSerializer, self).to_representation(instances)
+
+    def prefetch_references(self, instances):
+        """ Retrieve documents, rendered nested by combo reference fields of the child, with one ``$in`` query per field.
+
+        Documents are set into referencing instances, as mongoengine does on dereferencing, so accessing them does not query.
+        Documents of nested serializers are retrieved by :func:`prefetch_nested_references`.
+        """
+        prefetch_nested_references(self.child, instances)
+        for field in self.child._readable_fields:
+            if not isinstance(field, drfm_fields.ComboReferenceField) or field.depth == 0 or len(field.source_attrs) != 1:
+                continue
+            name = field.source
+            collection = field.model._get_collection_name()
+            refs = [
+                (instance, instance._data.get(name)) for instance in instances
+                if isinstance(instance, Document) and isinstance(instance._fields.get(name), me_fields.ReferenceField)
+            ]
+            refs = [(instance, ref) for instance, ref in refs if isinstance(ref, DBRef) and ref.collection == collection]
+            if not refs:
+                continue
+            found = field.get_queryset().in_bulk(list(OrderedDict.fromkeys(ref.id for instance, ref in refs)))
+            for instance, ref in refs:
+                doc = found.get(ref.id)
+                if doc is not None:
+                    instance._data[name] = doc
+
+    def validate_uniqueness(self, items, errors):
+        for field in self.child._writable_fields:
+            for validator in field.validators:
+                if isinstance(validator, UniqueValidator) and validator.batchable:
+                    validator.validate_batch(items, field, errors)
+        for validator in self.child.validators:
+            if isinstance(validator, UniqueTogetherValidator) and validator.batchable:
+                validator.validate_batch(items, self.child, errors)
+
+
 class DocumentSerializer(serializers.ModelSerializer):
     """ Serializer for Documents.
 
@@ -102,8 +374,42 @@ class DocumentSerializer(serializers.ModelSerializer):
         ``BinaryField``
 
     All other fields are mapped to ``DocumentField`` and probably will work wrong.
+
+    Uniqueness of fields in unique indexes is checked by validators, querying for existing documents
+    with collation of the index, if it has one (i.e. case-insensitive index with ``'collation': {'locale': 'en', 'strength': 2}``).
+    With ``Meta.unique_validation = 'index'`` the queries are skipped, relying on unique indexes instead.
+    In either case, duplicate key errors of writes are reported as the validators would do.
+    With ``many=True``, uniqueness of all items is validated at once by :class:`DocumentListSerializer`.
+
+    With ``Meta.concurrent_validation = True``, validation steps making queries (reference fields and uniqueness validators)
+    run concurrently on a thread pool (see :mod:`concurrency`), and errors are collected in order of fields and validators.
+
+    References may be expanded per request, with query parameter ``expand`` listing dotted paths (i.e. ``?expand=author,comments.author``).
+    Expanded references are rendered by nested serializers, as for ``Meta.depth``, and paths continue into nested and embedded serializers.
+    Only paths listed in ``Meta.expandable_fields`` (or their prefixes) may be requested, at most ``Meta.max_expand_depth`` levels deep (defaults to 2),
+    others get 400. Expansion applies to safe methods only, since expanded references are read-only.
+    Serializers may be given paths with ``expand`` argument as well, bypassing the whitelist.
+    Documents of nested serializers are retrieved with one query per field and level (see :func:`prefetch_nested_references`).
+
+    Rendered fields may be selected per request, with query parameters ``fields`` (fields to render) or ``omit`` (fields to skip),
+    listing field names or dotted paths into nested serializers (i.e. ``?fields=id,title,comments.text``). Unknown names are ignored.
+    Selection applies to safe methods only, or is given with ``only`` and ``omit`` arguments.
+    Fields are pruned before they are built, and :meth:`get_projection` gives model fields to retrieve for them
+    (applied by ``GenericAPIView.get_queryset``).
+
+    Named selections of fields may be declared with ``Meta.profiles``, mapping profile names to field paths or ``'__all__'``
+    (i.e. ``{'list': ('id', 'title'), 'detail': '__all__'}``). Serializers given ``profile`` argument render fields of that profile,
+    narrowed by the request's selection, if any. Viewsets choose profiles by action (see ``viewsets.GenericViewSet``).
+
+    Long lists (i.e. ``EmbeddedDocumentListField``) may be limited with ``Meta.list_limits``, mapping field names to max count of items.
+    ``GenericAPIView.get_queryset`` retrieves only that many first items with ``$slice`` projection,
+    and :class:`mixins.ListItemsModelMixin` pages through whole lists.
     """
 
+    default_error_messages = {
+        'not_unique': _('Document violates a unique constraint.')
+    }
+
     serializer_field_mapping = {
         me_fields.StringField: drf_fields.CharField,
         me_fields.URLField: drf_fields.URLField,
@@ -150,8 +456,32 @@ class DocumentSerializer(serializers.ModelSerializer):
     " class to create nested serializers for embedded at max recursion "
     serializer_embedded_bottom = drf_fields.HiddenField
 
+    " query parameter, listing paths of references to expand "
+    expand_param = 'expand'
+
+    " query parameters, listing paths of fields to render or to skip "
+    fields_param = 'fields'
+    omit_param = 'omit'
+
     _saving_instances = True
 
+    def __init__(self, *args, **kwargs):
+        self._expand = kwargs.pop('expand', None)
+        self._only = kwargs.pop('only', None)
+        self._omit = kwargs.pop('omit', None)
+        self._profile = kwargs.pop('profile', None)
+        super(DocumentSerializer, self).__init__(*args, **kwargs)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        # arguments are split between list and child serializers by DRF, only the default list class is altered
+        list_serializer = super(DocumentSerializer, cls).many_init(*args, **kwargs)
+        meta = getattr(cls, 'Meta', None)
+        if not hasattr(meta, 'list_serializer_class') and type(list_serializer) is serializers.ListSerializer:
+            # DocumentListSerializer adds no state to ListSerializer
+            list_serializer.__class__ = DocumentListSerializer
+        return list_serializer
+
     def create(self, validated_data):
         raise_errors_on_nested_writes('create', self, validated_data)
 
@@ -192,16 +522,43 @@ class DocumentSerializer(serializers.ModelSerializer):
                 )
             )
             raise me_ValidationError(msg)
+        except NotUniqueError as exc:
+            raise self.get_unique_error(exc)
 
         return instance
 
     def update(self, instance, validated_data):
         raise_errors_on_nested_writes('update', self, validated_data)
 
-        instance = self.recursive_save(validated_data, instance)
+        try:
+            instance = self.recursive_save(validated_data, instance)
+        except NotUniqueError as exc:
+            raise self.get_unique_error(exc)
 
         return instance
 
+    def get_unique_error(self, exc):
+        """ Translate duplicate key error into ValidationError, as raised by uniqueness validators. """
+        field_names = get_duplicate_key_fields(self.get_model(), exc)
+        if field_names is None:
+            return serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [self.error_messages['not_unique']]
+            }, code='unique')
+        if len(field_names) == 1 and field_names[0] in self.fields:
+            return serializers.ValidationError({
+                field_names[0]: [UniqueValidator.message]
+            }, code='unique')
+        return serializers.ValidationError({
+            api_settings.NON_FIELD_ERRORS_KEY: [UniqueTogetherValidator.message.format(field_names=', '.join(field_names))]
+        }, code='unique')
+
+    def is_unique_validated_by_index(self):
+        unique_validation = getattr(self.Meta, 'unique_validation', 'query')
+        assert unique_validation in ('query', 'index'), (
+            "'unique_validation' should be 'query' or 'index'."
+        )
+        return unique_validation == 'index'
+
     def recursive_save(self, validated_data, instance=None):
         """
         Recursively traverses validated_data and creates EmbeddedDocuments
@@ -209,6 +566,15 @@ class DocumentSerializer(serializers.ModelSerializer):
 
         Returns Mongonengine model instance.
         """
+        instance = self.recursive_build(validated_data, instance)
+
+        if self._saving_instances:
+            instance.save()
+
+        return instance
+
+    def recursive_build(self, validated_data, instance=None):
+        """ Part of ``recursive_save``, making the instance without saving it """
         # me_data is an analogue of validated_data, but contains
         # mongoengine EmbeddedDocument instances for nested data structures
         # instead of OrderedDicts.
@@ -251,16 +617,13 @@ class DocumentSerializer(serializers.ModelSerializer):
             except KeyError:  # this is dynamic data
                 me_data[key] = value
 
-        # create (if needed), save (if needed) and return mongoengine instance
+        # create (if needed) and return mongoengine instance
         if not instance:
             instance = self.get_model()(**me_data)
         else:
             for key, value in me_data.items():
                 setattr(instance, key, value)
 
-        if self._saving_instances:
-            instance.save()
-
         return instance
 
     def to_internal_value(self, data):
@@ -280,7 +643,10 @@ class DocumentSerializer(serializers.ModelSerializer):
             if isinstance(field, EmbeddedDocumentSerializer) and field.field_name in data:
                 field.initial_data = data[field.field_name]
 
-        ret = super(DocumentSerializer, self).to_internal_value(data)
+        if self.is_validation_concurrent():
+            ret = self.validate_fields_concurrently(data)
+        else:
+            ret = super(DocumentSerializer, self).to_internal_value(data)
 
         # for EmbeddedDocumentSerializers create _validated_data
         # so that create()/update() could use them
@@ -290,6 +656,109 @@ class DocumentSerializer(serializers.ModelSerializer):
 
         return ret
 
+    def is_validation_concurrent(self):
+        return getattr(self.Meta, 'concurrent_validation', False)
+
+    def is_query_bound(self, field):
+        """ Check if validation of the field makes queries """
+        if isinstance(field, (drfm_fields.ReferenceField, drfm_fields.GenericReferenceField)):
+            return True
+        if any(isinstance(validator, drf_validators.UniqueValidator) for validator in field.validators):
+            return True
+        child = getattr(field, 'child', None)
+        return child is not None and self.is_query_bound(child)
+
+    def run_field_validation(self, field, data):
+        return field.run_validation(field.get_value(data))
+
+    def validate_fields_concurrently(self, data):
+        """ Adaptation of DRF Serializer.to_internal_value, validating query-bound fields concurrently.
+
+        Only validation of fields themselves runs on the pool, ``validate_<field>`` methods are called in the calling thread.
+        """
+        if not isinstance(data, Mapping):
+            message = self.error_messages['invalid'].format(
+                datatype=type(data).__name__
+            )
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [message]
+            }, code='invalid')
+
+        fields = list(self._writable_fields)
+        bound = [field for field in fields if self.is_query_bound(field)]
+        futures = dict(zip(
+            [field.field_name for field in bound],
+            concurrency.submit([partial(self.run_field_validation, field, data) for field in bound])
+        ))
+
+        ret = OrderedDict()
+        errors = OrderedDict()
+        for field in fields:
+            validate_method = getattr(self, 'validate_' + field.field_name, None)
+            try:
+                if field.field_name in futures:
+                    validated_value = futures[field.field_name].result()
+                else:
+                    validated_value = self.run_field_validation(field, data)
+                if validate_method is not None:
+                    validated_value = validate_method(validated_value)
+            except serializers.ValidationError as exc:
+                errors[field.field_name] = exc.detail
+            except DjangoValidationError as exc:
+                errors[field.field_name] = get_error_detail(exc)
+            except SkipField:
+                pass
+            else:
+                set_value(ret, field.source_attrs, validated_value)
+
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        return ret
+
+    def run_validators(self, value):
+        """ Adaptation of DRF Serializer.run_validators, running unique together validators concurrently. """
+        if not self.is_validation_concurrent():
+            return super(DocumentSerializer, self).run_validators(value)
+
+        if isinstance(value, dict):
+            to_validate = self._read_only_defaults()
+            to_validate.update(value)
+        else:
+            to_validate = value
+
+        validators = list(self.validators)
+        bound = [
+            index for index, validator in enumerate(validators)
+            if isinstance(validator, drf_validators.UniqueTogetherValidator)
+        ]
+        futures = dict(zip(
+            bound,
+            concurrency.submit([partial(self.call_validator, validators[index], to_validate) for index in bound])
+        ))
+
+        errors = []
+        for index, validator in enumerate(validators):
+            try:
+                if index in futures:
+                    futures[index].result()
+                else:
+                    self.call_validator(validator, to_validate)
+            except serializers.ValidationError as exc:
+                if isinstance(exc.detail, dict):
+                    raise
+                errors.extend(exc.detail)
+            except DjangoValidationError as exc:
+                errors.extend(get_error_detail(exc))
+        if errors:
+            raise serializers.ValidationError(errors)
+
+    def call_validator(self, validator, value):
+        if getattr(validator, 'requires_context', False):
+            validator(value, self)
+        else:
+            validator(value)
+
     def get_model(self):
         """
         By default returns the model defined in the Meta class.
@@ -308,12 +777,192 @@ class DocumentSerializer(serializers.ModelSerializer):
         )
         return self.Meta.model
 
+    def get_request(self):
+        """ Request of the root serializer (or of the child of root list serializer), None for nested serializers """
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return self.context.get('request') if parent is None else None
+
+    def get_query_paths(self, request, param):
+        """ Set of comma-separated paths in query parameter, or None if missing or empty """
+        value = request.query_params.get(param, '')
+        paths = set(path.strip() for path in value.split(',') if path.strip())
+        return paths or None
+
+    def get_expand(self):
+        """ Set of paths to expand, given with ``expand`` argument or requested from the root serializer.
+
+        Expansion is requested with safe methods only: expanded references are read-only, and would drop written values.
+        """
+        if self._expand is not None:
+            return set(self._expand)
+        request = self.get_request()
+        if request is None or request.method not in SAFE_METHODS:
+            return set()
+        paths = self.get_query_paths(request, self.expand_param)
+        if paths is None:
+            return set()
+
+        allowed = set()
+        for path in getattr(self.Meta, 'expandable_fields', ()):
+            parts = path.split('.')
+            allowed.update('.'.join(parts[:i]) for i in range(1, len(parts) + 1))
+        max_depth = getattr(self.Meta, 'max_expand_depth', 2)
+        for path in sorted(paths):
+            if path not in allowed or path.count('.') >= max_depth:
+                raise serializers.ValidationError({self.expand_param: ["Can not expand '%s'." % path]})
+
+        # expanding a path expands its prefixes
+        for path in list(paths):
+            parts = path.split('.')
+            paths.update('.'.join(parts[:i]) for i in range(1, len(parts)))
+        return paths
+
+    def get_profile_paths(self):
+        """ Paths of fields in the profile, given with ``profile`` argument, or None for all fields """
+        if self._profile is None:
+            return None
+        profiles = getattr(self.Meta, 'profiles', {})
+        assert self._profile in profiles, (
+            "Profile '{profile}' is not defined in 'profiles' option of serializer {serializer_class}.".format(
+                profile=self._profile,
+                serializer_class=self.__class__.__name__
+            )
+        )
+        paths = profiles[self._profile]
+        return None if paths == ALL_FIELDS else set(paths)
+
+    def get_selection(self):
+        """ Paths of fields to render and to skip, as ``(only, omit)``, ``only`` is None to render all fields """
+        if self._only is not None or self._omit is not None:
+            only, omit = (set(self._only) if self._only is not None else None), set(self._omit or ())
+        else:
+            request = self.get_request()
+            if request is None or request.method not in SAFE_METHODS:
+                only, omit = None, set()
+            else:
+                only = self.get_query_paths(request, self.fields_param)
+                omit = self.get_query_paths(request, self.omit_param) or set()
+
+        profile = self.get_profile_paths()
+        if profile is not None:
+            only = profile if only is None else intersect_paths(only, profile)
+        return only, omit
+
+    def is_selected(self, field_name):
+        only, omit = self._selection
+        if field_name in omit:
+            return False
+        return only is None or any(path == field_name or path.startswith(field_name + '.') for path in only)
+
+    def get_nested_selection(self, field_name):
+        """ paths to render and to skip within nested serializer of the field """
+        only, omit = self._selection
+        prefix = field_name + '.'
+        if only is not None and field_name not in only:
+            only = sorted(path[len(prefix):] for path in only if path.startswith(prefix))
+        else:
+            only = None
+        return only, sorted(path[len(prefix):] for path in omit if path.startswith(prefix))
+
+    def get_rendered_paths(self):
+        """ Paths of model fields, read by readable fields, or None if some may read anything (i.e. methods and properties) """
+        model = self.get_model()
+        paths = []
+        for field in self._readable_fields:
+            if not field.source_attrs or field.source_attrs[0] not in model._fields:
+                return None
+            name = field.source_attrs[0]
+            model_field = model._fields[name]
+            if isinstance(model_field, me_fields.ListField):
+                model_field = model_field.field
+            nested, many = get_nested_serializer(field)
+            sub_paths = None
+            if isinstance(model_field, me_fields.EmbeddedDocumentField) and isinstance(nested, DocumentSerializer):
+                sub_paths = nested.get_rendered_paths() if nested._only is not None or nested._omit else None
+            if sub_paths is None:
+                paths.append(name)
+            else:
+                paths.extend(name + '.' + path for path in sub_paths)
+        return paths
+
+    def get_model_path(self, path):
+        """ The path, if it names a model field (through embedded documents), or None """
+        model = self.get_model()
+        for name in path.split('.'):
+            model_field = model._fields.get(name) if model is not None else None
+            if model_field is None:
+                return None
+            if isinstance(model_field, me_fields.ListField):
+                model_field = model_field.field
+            model = model_field.document_type if isinstance(model_field, me_fields.EmbeddedDocumentField) else None
+        return path
+
+    def get_list_limits(self):
+        """ Names of model fields of rendered lists, mapped to max count of items to retrieve (see ``Meta.list_limits``) """
+        limits = {}
+        list_limits = getattr(self.Meta, 'list_limits', {})
+        if not list_limits:
+            return limits
+        model = self.get_model()
+        for field_name, limit in list_limits.items():
+            field = self.fields.get(field_name)
+            if field is None:
+                continue
+            model_field = model._fields.get(field.source_attrs[0]) if len(field.source_attrs) == 1 else None
+            assert isinstance(model_field, me_fields.ListField), (
+                "The field '{field_name}' in 'list_limits' option of serializer {serializer_class} "
+                "is not a list field of the model.".format(
+                    field_name=field_name,
+                    serializer_class=self.__class__.__name__
+                )
+            )
+            limits[field.source_attrs[0]] = limit
+        return limits
+
+    def get_projection(self):
+        """ Model fields to retrieve for selected fields, as arguments of ``QuerySet.only()`` and ``exclude()``.
+
+        Returns ``(None, None)`` if fields are not selected, or if rendered fields may read anything.
+        """
+        only, omit = self.get_selection()
+        if only is None and not omit:
+            return None, None
+        rendered = self.get_rendered_paths()
+        if rendered is None:
+            return None, None
+        if only is not None:
+            return rendered, None
+
+        def overlaps(path, other):
+            return path == other or path.startswith(other + '.') or other.startswith(path + '.')
+
+        exclude = [self.get_model_path(path) for path in sorted(omit)]
+        exclude = [path for path in exclude if path is not None and not any(overlaps(path, other) for other in rendered)]
+        return None, exclude
+
+    def is_expanded(self, field_name):
+        return get_path(field_name) in getattr(self, '_expanded', ())
+
+    def get_nested_expand(self, field_name):
+        """ paths to expand within nested serializer of the field """
+        prefix = get_path(field_name) + '.'
+        return sorted(path[len(prefix):] for path in getattr(self, '_expanded', ()) if path.startswith(prefix))
+
+    def to_representation(self, instance):
+        if self.parent is None:
+            prefetch_nested_references(self, [instance])
+        return super(DocumentSerializer, self).to_representation(instance)
+
     def get_fields(self):
         assert hasattr(self, 'Meta'), (
             'Class {serializer_class} missing "Meta" attribute'.format(
                 serializer_class=self.__class__.__name__
             )
         )
+        self._expanded = self.get_expand()
+        self._selection = self.get_selection()
         depth = getattr(self.Meta, 'depth', 0)
         depth_embedding = getattr(self.Meta, 'depth_embedding', 5)
 
@@ -344,6 +993,9 @@ class DocumentSerializer(serializers.ModelSerializer):
         fields = OrderedDict()
 
         for field_name in field_names:
+            if not self.is_selected(field_name):
+                continue
+
             # If the field is explicitly declared on the class then use that.
             if field_name in declared_fields:
                 fields[field_name] = declared_fields[field_name]
@@ -364,6 +1016,13 @@ class DocumentSerializer(serializers.ModelSerializer):
             # Create the serializer field.
             fields[field_name] = field_class(**field_kwargs)
 
+        # Pass selection into nested serializers, before their fields are built
+        for field_name, field in fields.items():
+            only, omit = self.get_nested_selection(field_name)
+            nested, many = get_nested_serializer(field)
+            if (only is not None or omit) and isinstance(nested, DocumentSerializer):
+                nested._only, nested._omit = only, omit
+
         # Add in any hidden fields.
         fields.update(hidden_fields)
 
@@ -587,8 +1246,8 @@ class DocumentSerializer(serializers.ModelSerializer):
 
         if field_name in info.references:
             relation_info = info.references[field_name]
-            if nested_depth and relation_info.related_model:
-                return self.build_nested_reference_field(field_name, relation_info, nested_depth)
+            if relation_info.related_model and (nested_depth or self.is_expanded(field_name)):
+                return self.build_nested_reference_field(field_name, relation_info, max(nested_depth, 1))
             else:
                 return self.build_reference_field(field_name, relation_info, nested_depth)
 
@@ -652,7 +1311,7 @@ class DocumentSerializer(serializers.ModelSerializer):
 
     def build_compound_field(self, field_name, model_field, child_field):
         if isinstance(model_field, me_fields.ListField):
-            field_class = drf_fields.ListField
+            field_class = drfm_fields.ListField
         elif isinstance(model_field, me_fields.DictField):
             field_class = drfm_fields.DictField
         else:
@@ -711,6 +1370,9 @@ class DocumentSerializer(serializers.ModelSerializer):
 
         field_class = NestedSerializer
         field_kwargs = get_nested_relation_kwargs(field_name, relation_info)
+        expand = self.get_nested_expand(field_name)
+        if expand:
+            field_kwargs['expand'] = expand
         return field_class, field_kwargs
 
     def build_generic_embedded_field(self, field_name, relation_info, embedded_depth):
@@ -736,6 +1398,9 @@ class DocumentSerializer(serializers.ModelSerializer):
 
         field_class = EmbeddedSerializer
         field_kwargs = get_nested_embedded_kwargs(field_name, relation_info)
+        expand = self.get_nested_expand(field_name)
+        if expand:
+            field_kwargs['expand'] = expand
         return field_class, field_kwargs
 
     def build_bottom_embedded_field(self, field_name, relation_info, embedded_depth):
@@ -754,7 +1419,8 @@ class DocumentSerializer(serializers.ModelSerializer):
         hidden_fields = {}
 
         field_names = set(field_names)
-        unique_fields = set()
+        # field name -> collation of its unique index
+        unique_fields = {}
         unique_together_fields = set()
 
         # include `unique_with` from model indexes
@@ -764,15 +1430,14 @@ class DocumentSerializer(serializers.ModelSerializer):
             field_set = set(map(lambda e: e[0], idx['fields']))
             if field_names.issuperset(field_set):
                 if len(field_set) == 1:
-                    unique_fields |= field_set
+                    unique_fields.update(dict.fromkeys(field_set, idx.get('collation')))
                 else:
                     unique_together_fields |= field_set
 
-        for field_name in unique_fields:
-            uniq_extra_kwargs[field_name] = {
-                'required': True,
-                'validators': [UniqueValidator(queryset=model.objects)]
-            }
+        for field_name, collation in unique_fields.items():
+            uniq_extra_kwargs[field_name] = {'required': True}
+            if not self.is_unique_validated_by_index():
+                uniq_extra_kwargs[field_name]['validators'] = [UniqueValidator(queryset=model.objects, collation=collation)]
 
         for field_name in unique_together_fields:
             fld = model._fields[field_name]
@@ -793,6 +1458,9 @@ class DocumentSerializer(serializers.ModelSerializer):
         return extra_kwargs, hidden_fields
 
     def get_unique_together_validators(self):
+        if self.is_unique_validated_by_index():
+            return []
+
         model = self.get_model()
         validators = []
         field_names = set(self.get_field_names(self._declared_fields, self.field_info))
@@ -805,7 +1473,8 @@ class DocumentSerializer(serializers.ModelSerializer):
             if len(field_set) > 1 and field_names.issuperset(set(field_set)):
                 validators.append(UniqueTogetherValidator(
                     queryset=model.objects,
-                    fields=field_set
+                    fields=field_set,
+                    collation=idx.get('collation')
                 ))
         return validators
 
@@ -882,10 +1551,20 @@ class DynamicDocumentSerializer(DocumentSerializer):
         ret = super(DynamicDocumentSerializer, self).to_representation(instance)
 
         for field_name, field in self._map_dynamic_fields(instance).items():
+            if not self.is_selected(field_name):
+                continue
             ret[field_name] = field.to_representation(field.get_attribute(instance))
 
         return ret
 
+    def get_projection(self):
+        only, exclude = super(DynamicDocumentSerializer, self).get_projection()
+        if only is not None:
+            # dynamic fields are not known before retrieval
+            selected = set(path.split('.')[0] for path in self.get_selection()[0])
+            only = only + sorted(selected - set(self.fields))
+        return only, exclude
+
     def _map_dynamic_fields(self, document):
         dynamic_fields = {}
         if document._dynamic:
@@ -894,3 +1573,165 @@ class DynamicDocumentSerializer(DocumentSerializer):
                 dfield.bind(name, self)
                 dynamic_fields[name] = dfield
         return dynamic_fields
+
+
+# collection name -> set of cache aliases, holding fragments of its documents
+_fragment_caches = {}
+
+
+def get_fragment_key(document):
+    """ cache key of version of encoded representations of a saved document, or None """
+    if not isinstance(document, Document) or document.pk is None:
+        return None
+    return 'drfm:fragment:%s:%s' % (document._get_collection_name(), document.pk)
+
+
+def invalidate_fragments(sender, document, **kwargs):
+    """ drop cached representations of the document, by dropping their version.
+
+    Connected to ``post_save`` and ``post_delete`` signals, may be also called directly.
+    """
+    key = get_fragment_key(document)
+    if key is None:
+        return
+    for alias in _fragment_caches.get(document._get_collection_name(), ()):
+        caches[alias].delete(key)
+
+
+class FragmentListSerializer(DocumentListSerializer):
+    """ ListSerializer, caching representation of each document as encoded JSON.
+
+    Set it as ``Meta.list_serializer_class`` of a :class:`DocumentSerializer` and render responses with :class:`renderers.FragmentJSONRenderer`.
+    List representation is assembled of cached fragments, only uncached documents get serialized and encoded.
+    If the request was negotiated to another renderer (i.e. browsable API), documents are serialized as usual, without caching.
+    The serializer can only be used at root (with ``many=True``), not nested in other serializers.
+
+    Options are taken from ``Meta`` of child serializer:
+
+        * ``fragment_cache``: alias of django cache to use (defaults to ``'default'``)
+        * ``fragment_cache_timeout``: seconds to keep fragments (defaults to 300)
+
+    Fragments are keyed by document, serializer class and :meth:`get_cache_key_params`, and shared by all requests with the same key.
+    Selected and expanded fields make the key as the set of rendered fields, so requests rendering the same fields share fragments.
+    Representations depending on anything else (i.e. on ``request.user``, or hyperlinks depending on request host)
+    must add it to the key by overriding :meth:`get_cache_key_params`.
+
+    Each fragment is a cache entry of its own, keyed with current version of the document.
+    Fragments of a document are dropped by dropping the version on its ``post_save`` and ``post_delete``, which requires blinker.
+    Signals are connected when the serializer is first instantiated in a process.
+    Fragments are not dropped when other documents, rendered into them (i.e. references of nested serializers), change.
+    Such changes, and changes made by ``QuerySet.update()`` or by other processes not using the serializer, are visible only after the timeout.
+    """
+    renderer_class = FragmentJSONRenderer
+
+    def __init__(self, *args, **kwargs):
+        super(FragmentListSerializer, self).__init__(*args, **kwargs)
+        meta = getattr(self.child, 'Meta', None)
+        self.cache_alias = getattr(meta, 'fragment_cache', 'default')
+        self.cache_timeout = getattr(meta, 'fragment_cache_timeout', 300)
+        self.renderer = self.renderer_class()
+
+        if not _fragment_caches:
+            signals.post_save.connect(invalidate_fragments)
+            signals.post_delete.connect(invalidate_fragments)
+        model = meta.model
+        _fragment_caches.setdefault(model._get_collection_name(), set()).add(self.cache_alias)
+
+    def get_cache_key_params(self):
+        """ Parameters of representation, other than serializer class, as list of ``(name, value)`` strings.
+
+        Empty values are skipped. Override to add anything else the representation depends on, i.e.::
+
+            def get_cache_key_params(self):
+                return super().get_cache_key_params() + [('user', str(self.context['request'].user.pk))]
+        """
+        only, omit = self.child.get_selection()
+        params = []
+        if only is not None or omit or self.child.get_expand():
+            params.append((self.child.fields_param, ','.join(sorted(self.get_rendered_fields(self.child)))))
+        return params + self.get_output_options(self.child)
+
+    def get_rendered_fields(self, serializer, prefix=''):
+        """ Paths of fields, rendered by the serializer and its nested serializers """
+        paths = []
+        for field in serializer._readable_fields:
+            path = prefix + field.field_name
+            nested, many = get_nested_serializer(field)
+            nested_paths = self.get_rendered_fields(nested, path + '.') if nested is not None else []
+            paths.extend(nested_paths or [path])
+        return paths
+
+    def get_output_options(self, serializer, prefix=''):
+        """ Reduction options of GeoJSON fields, requested for the serializer and its nested serializers, as ``(path, options)`` """
+        options = []
+        for field in serializer._readable_fields:
+            path = prefix + field.field_name
+            if isinstance(field, drfm_fields.GeoJSONField):
+                tolerance, precision = field.get_output_options()
+                if tolerance is not None or precision is not None:
+                    options.append((path, '%s,%s' % (tolerance, precision)))
+                continue
+            nested, many = get_nested_serializer(field)
+            if nested is not None:
+                options += self.get_output_options(nested, path + '.')
+        return options
+
+    def get_serializer_key(self):
+        """ identifies representation within cached entry of a document """
+        child_class = self.child.__class__
+        key = '%s.%s' % (child_class.__module__, child_class.__qualname__)
+        query = '&'.join('%s=%s' % (param, value) for param, value in self.get_cache_key_params() if value)
+        return key + '?' + query if query else key
+
+    def uses_fragments(self):
+        """ Whether fragments get spliced by the renderer: without request, or if it was negotiated to :class:`renderers.FragmentJSONRenderer` """
+        request = self.context.get('request')
+        renderer = getattr(request, 'accepted_renderer', None)
+        return request is None or isinstance(renderer, FragmentJSONRenderer)
+
+    def to_representation(self, data):
+        assert self.parent is None, (
+            'FragmentListSerializer of {serializer_class} can not be nested in other serializers.'.format(
+                serializer_class=self.child.__class__.__name__
+            )
+        )
+        if not self.uses_fragments():
+            return super(FragmentListSerializer, self).to_representation(data)
+
+        instances = list(data)
+        cache = caches[self.cache_alias]
+        digest = hashlib.sha1(self.get_serializer_key().encode()).hexdigest()
+
+        version_keys = [get_fragment_key(instance) for instance in instances]
+        versions = cache.get_many([key for key in version_keys if key is not None])
+        new_versions = {}
+        for key in version_keys:
+            if key is not None and key not in versions:
+                new_versions[key] = versions[key] = uuid.uuid4().hex
+        if new_versions:
+            cache.set_many(new_versions, self.cache_timeout)
+
+        keys = [
+            '%s:%s:%s' % (key, versions[key], digest) if key is not None else None
+            for key in version_keys
+        ]
+        cached = cache.get_many([
+            key for key, version_key in zip(keys, version_keys) if key is not None and version_key not in new_versions
+        ])
+
+        self.prefetch_references([instance for instance, key in zip(instances, keys) if key not in cached])
+
+        ret = []
+        updates = {}
+        for instance, key in zip(instances, keys):
+            fragment = cached.get(key)
+            if fragment is None:
+                fragment = self.renderer.encode(self.child.to_representation(instance))
+                if key is not None:
+                    updates[key] = fragment
+            ret.append(JSONFragment(fragment))
+
+        if updates:
+            cache.set_many(updates, self.cache_timeout)
+
+        return ret
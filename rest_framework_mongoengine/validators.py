@@ -1,18 +1,106 @@
 from __future__ import unicode_literals
 
+import operator
+import re
+import unicodedata
+from collections import OrderedDict
+from functools import reduce
+
+from mongoengine.queryset.visitor import Q
+from pymongo.errors import DuplicateKeyError
 from rest_framework import validators
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SkipField
+from rest_framework.settings import api_settings
 
 from rest_framework_mongoengine.repr import smart_repr
 
 
+def collation_key(value, collation):
+    """ Key to compare values in memory, as the collation compares them in queries.
+
+    Approximates case (strength 2) and diacritics (strength 1) insensitivity of ICU collations,
+    which is enough to detect repeated values in payloads.
+    """
+    if isinstance(value, tuple):
+        return tuple(collation_key(item, collation) for item in value)
+    if collation is None or not isinstance(value, str):
+        return value
+    strength = collation.get('strength', 3)
+    if strength <= 2:
+        value = value.casefold()
+    if strength <= 1:
+        value = ''.join(char for char in unicodedata.normalize('NFD', value) if not unicodedata.combining(char))
+    return value
+
+
 class MongoValidatorMixin():
+    collation = None
+
+    def get_queryset(self):
+        """ queryset to probe, comparing values with the validator's collation """
+        if self.collation is None:
+            return self.queryset
+        return self.queryset.collation(self.collation)
+
     def exclude_current_instance(self, queryset, instance):
         if instance is not None:
             return queryset.filter(pk__ne=instance.pk)
         return queryset
 
+    def exists(self, queryset):
+        """ Check existence of matching documents.
+
+        Counts with limit 1, so the server answers from unique index, without fetching and decoding documents.
+        """
+        return queryset.limit(1).count(with_limit_and_skip=True) > 0
+
+    def group_by_value(self, items, get_value):
+        """ Group indexes of items by their values, compared with respect to collation.
+
+        Returns dict, mapping comparison keys to pairs of first value and list of indexes, and list of indexes of unhashable values.
+        Items with ``None`` values are skipped.
+        """
+        groups = OrderedDict()
+        unhashable = []
+        for index, attrs in enumerate(items):
+            value = get_value(attrs)
+            if value is None:
+                continue
+            try:
+                groups.setdefault(collation_key(value, self.collation), (value, []))[1].append(index)
+            except TypeError:
+                unhashable.append(index)
+        return groups, unhashable
+
+    def add_repeated_errors(self, groups, existing, errors, key, message):
+        """ Report all items with existing values, and repeated items except first ones """
+        existing_keys = set()
+        for value in existing:
+            try:
+                existing_keys.add(collation_key(value, self.collation))
+            except TypeError:
+                pass
+        for value_key, (value, indexes) in groups.items():
+            if value_key not in existing_keys:
+                indexes = indexes[1:]
+            for index in indexes:
+                add_item_error(errors, index, key, message)
+
+    def repr_collation(self):
+        if self.collation is None:
+            return ''
+        return ', collation=%s' % smart_repr(self.collation)
+
+
+def is_validated_in_batch(serializer):
+    """ Check if serializer is an item of list serializer, validating uniqueness of all items at once """
+    return getattr(getattr(serializer, 'parent', None), 'validates_uniqueness_in_batch', False)
+
+
+def add_item_error(errors, index, key, message):
+    errors[index].setdefault(key, []).append(message)
+
 
 class UniqueValidator(MongoValidatorMixin, validators.UniqueValidator):
     """ Replacement of DRF UniqueValidator.
@@ -20,32 +108,73 @@ class UniqueValidator(MongoValidatorMixin, validators.UniqueValidator):
     Used by :class:`DocumentSerializer` for fields, present in unique indexes.
     """
 
-    def __init__(self, queryset, message=None, lookup=''):
+    def __init__(self, queryset, message=None, lookup='', collation=None):
         """
         Setting empty string as default lookup for UniqueValidator.
         For Mongoengine exact is a shortcut to query with regular experission.
         This fixes https://github.com/umutbozkurt/django-rest-framework-mongoengine/issues/264
+
+        For case-insensitive uniqueness, pass ``collation`` of the unique index (i.e. ``{'locale': 'en', 'strength': 2}``)
+        instead of ``iexact`` lookup, so the probe uses the index rather than regex scan.
         """
         super(UniqueValidator, self).__init__(queryset, message, lookup)
+        self.collation = collation
+
+    @property
+    def batchable(self):
+        return not self.lookup
 
     def __call__(self, value, serializer_field):
+        if self.batchable and is_validated_in_batch(serializer_field.parent):
+            return
+
         # Determine the underlying model field name. This may not be the
         # same as the serializer field name if `source=<>` is set.
         field_name = serializer_field.source_attrs[-1]
         # Determine the existing instance, if this is an update operation.
         instance = getattr(serializer_field.parent, 'instance', None)
 
-        queryset = self.queryset
+        queryset = self.get_queryset()
         queryset = self.filter_queryset(value, queryset, field_name)
         queryset = self.exclude_current_instance(queryset, instance)
 
-        if queryset.first():
+        if self.exists(queryset):
             raise ValidationError(self.message.format())
 
+    def validate_batch(self, items, serializer_field, errors):
+        """ Validate the field in validated data of all items being created.
+
+        Values repeated within items are found in memory, existing values are found with single ``$in`` query.
+        Errors are added to ``errors`` (list of dicts, one per item).
+        Falls back to a query per item for unhashable values.
+        Not applicable with custom lookup, since it cannot be expressed with ``$in``.
+        """
+        field_name = serializer_field.source_attrs[-1]
+        message = self.message.format()
+
+        def get_value(attrs):
+            for attr in serializer_field.source_attrs:
+                attrs = attrs.get(attr) if isinstance(attrs, dict) else None
+            return attrs
+
+        groups, unhashable = self.group_by_value(items, get_value)
+
+        for index in unhashable:
+            if self.exists(self.filter_queryset(get_value(items[index]), self.get_queryset(), field_name)):
+                add_item_error(errors, index, serializer_field.field_name, message)
+
+        if not groups:
+            return
+
+        values = [value for value, indexes in groups.values()]
+        existing = self.get_queryset().filter(**{'%s__in' % field_name: values}).scalar(field_name)
+        self.add_repeated_errors(groups, existing, errors, serializer_field.field_name, message)
+
     def __repr__(self):
-        return '<%s(queryset=%s)>' % (
+        return '<%s(queryset=%s%s)>' % (
             self.__class__.__name__,
-            smart_repr(self.queryset)
+            smart_repr(self.queryset),
+            self.repr_collation()
         )
 
 
@@ -53,17 +182,27 @@ class UniqueTogetherValidator(MongoValidatorMixin, validators.UniqueTogetherVali
     """ Replacement of DRF UniqueTogetherValidator.
 
     Used by :class:`DocumentSerializer` for fields, present in unique indexes.
+    Takes optional ``collation``, like :class:`UniqueValidator`.
     """
+    batchable = True
+
+    def __init__(self, queryset, fields, message=None, collation=None):
+        super(UniqueTogetherValidator, self).__init__(queryset, fields, message)
+        self.collation = collation
+
     def __call__(self, attrs, serializer):
         try:
             self.enforce_required_fields(attrs, serializer)
         except SkipField:
             return
 
+        if self.batchable and is_validated_in_batch(serializer):
+            return
+
         # Determine the existing instance, if this is an update operation.
         instance = getattr(serializer, 'instance', None)
 
-        queryset = self.queryset
+        queryset = self.get_queryset()
         queryset = self.filter_queryset(attrs, queryset, serializer)
         queryset = self.exclude_current_instance(queryset, instance)
 
@@ -71,15 +210,46 @@ class UniqueTogetherValidator(MongoValidatorMixin, validators.UniqueTogetherVali
         checked_values = [
             value for field, value in attrs.items() if field in self.fields
         ]
-        if None not in checked_values and queryset.first():
+        if None not in checked_values and self.exists(queryset):
             field_names = ', '.join(self.fields)
             raise ValidationError(self.message.format(field_names=field_names))
 
+    def validate_batch(self, items, serializer, errors):
+        """ Validate validated data of all items being created.
+
+        Combinations repeated within items are found in memory, existing ones are found with single query,
+        matching an ``$or`` of all combinations. Errors are added to ``errors`` (list of dicts, one per item).
+        Items missing any of the fields or having ``None`` there are skipped, like ``__call__`` does.
+        """
+        sources = [serializer.fields[field_name].source for field_name in self.fields]
+        message = self.message.format(field_names=', '.join(self.fields))
+
+        def get_value(attrs):
+            values = tuple(attrs.get(source) for source in sources)
+            return None if None in values else values
+
+        groups, unhashable = self.group_by_value(items, get_value)
+
+        for index in unhashable:
+            queryset = self.get_queryset().filter(**dict(zip(sources, get_value(items[index]))))
+            if self.exists(queryset):
+                add_item_error(errors, index, api_settings.NON_FIELD_ERRORS_KEY, message)
+
+        if not groups:
+            return
+
+        query = reduce(operator.or_, (Q(**dict(zip(sources, values))) for values, indexes in groups.values()))
+        existing = self.get_queryset().filter(query).scalar(*sources)
+        if len(sources) == 1:
+            existing = ((value,) for value in existing)
+        self.add_repeated_errors(groups, existing, errors, api_settings.NON_FIELD_ERRORS_KEY, message)
+
     def __repr__(self):
-        return '<%s(queryset=%s, fields=%s)>' % (
+        return '<%s(queryset=%s, fields=%s%s)>' % (
             self.__class__.__name__,
             smart_repr(self.queryset),
-            smart_repr(self.fields)
+            smart_repr(self.fields),
+            self.repr_collation()
         )
 
 
@@ -96,3 +266,32 @@ class OptionalUniqueTogetherValidator(UniqueTogetherValidator):
                 raise SkipField()
             else:
                 raise
+
+
+def get_duplicate_key_fields(model, exc):
+    """ Find names of fields in unique index, violated by a write.
+
+    Takes ``NotUniqueError`` (raised by mongoengine) or ``DuplicateKeyError`` (raised by pymongo).
+    Returns tuple of field names, or None if the index cannot be recognized.
+    """
+    error = exc
+    while error is not None and not isinstance(error, DuplicateKeyError):
+        error = error.__cause__ or error.__context__
+
+    details = getattr(error, 'details', None) or {}
+    if details.get('keyPattern'):
+        db_fields = list(details['keyPattern'].keys())
+    else:
+        # servers before 4.2 report index name only
+        match = re.search(r'index: (\S+) dup key', str(exc))
+        if match is None:
+            return None
+        for idx in model._meta.get('index_specs', []):
+            name = idx.get('name') or '_'.join('%s_%s' % item for item in idx['fields'])
+            if idx.get('unique', False) and name == match.group(1):
+                db_fields = [item[0] for item in idx['fields']]
+                break
+        else:
+            return None
+
+    return tuple(model._reverse_db_field_map.get(name, name) for name in db_fields)
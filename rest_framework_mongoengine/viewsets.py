@@ -1,12 +1,32 @@
-from rest_framework import mixins
 from rest_framework.viewsets import ViewSetMixin
 
+from rest_framework_mongoengine import mixins
 from rest_framework_mongoengine.generics import GenericAPIView
 
 
 class GenericViewSet(ViewSetMixin, GenericAPIView):
-    """ Adaptation of DRF GenericViewSet """
-    pass
+    """ Adaptation of DRF GenericViewSet
+
+    Serializers, defining ``Meta.profiles`` (see :class:`serializers.DocumentSerializer`), get profile for current action:
+    named by ``action_profiles`` (``retrieve`` renders ``detail`` profile by default), or the action itself (i.e. ``list``).
+    Actions without a defined profile render all fields. Queryset retrieves only fields of the profile (see ``project_queryset``).
+    """
+    action_profiles = {'retrieve': 'detail'}
+
+    def get_serializer_profile(self):
+        """ name of serializer profile for current action, or None if the serializer does not define it """
+        action = getattr(self, 'action', None)
+        profile = self.action_profiles.get(action, action)
+        meta = getattr(self.get_serializer_class(), 'Meta', None)
+        if profile is None or profile not in getattr(meta, 'profiles', {}):
+            return None
+        return profile
+
+    def get_serializer(self, *args, **kwargs):
+        profile = self.get_serializer_profile()
+        if profile is not None:
+            kwargs.setdefault('profile', profile)
+        return super(GenericViewSet, self).get_serializer(*args, **kwargs)
 
 
 class ModelViewSet(mixins.CreateModelMixin,
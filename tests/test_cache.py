@@ -0,0 +1,166 @@
+from __future__ import unicode_literals
+
+from bson import ObjectId
+from django.test import TestCase
+from mock import patch
+from mongoengine import Document, fields
+from mongoengine.queryset import QuerySet
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+
+from rest_framework_mongoengine import generics
+from rest_framework_mongoengine.cache import cache_documents
+from rest_framework_mongoengine.fields import (
+    GenericReferenceField, ReferenceField
+)
+from rest_framework_mongoengine.serializers import DocumentSerializer
+
+
+class CachedDoc(Document):
+    name = fields.StringField()
+
+
+class CachedDocSerializer(DocumentSerializer):
+    class Meta:
+        model = CachedDoc
+        fields = '__all__'
+
+
+class CachedReferencingDoc(Document):
+    refs = fields.ListField(fields.GenericReferenceField())
+
+
+class CachedReferencingSerializer(DocumentSerializer):
+    class Meta:
+        model = CachedReferencingDoc
+        fields = '__all__'
+
+
+class CachedRetrView(generics.RetrieveAPIView):
+    queryset = CachedDoc.objects
+    serializer_class = CachedDocSerializer
+    use_document_cache = True
+
+
+class CachedUpdateView(generics.RetrieveUpdateAPIView):
+    queryset = CachedDoc.objects
+    serializer_class = CachedDocSerializer
+    use_document_cache = True
+
+
+class TestDocumentCache(TestCase):
+    def setUp(self):
+        self.cache = cache_documents(CachedDoc, timeout=60, max_size=2)
+        self.objects = [CachedDoc.objects.create(name=name) for name in ('foo', 'bar', 'baz')]
+
+    def doCleanups(self):
+        CachedDoc.drop_collection()
+
+    def load(self, pk):
+        return CachedDoc.objects.get(pk=pk)
+
+    def test_read_through(self):
+        pk = self.objects[0].pk
+        doc = self.cache.get(str(pk), self.load)
+        assert doc.name == 'foo'
+        assert (self.cache.hits, self.cache.misses) == (0, 1)
+
+        with patch.object(QuerySet, 'get') as get:
+            doc = self.cache.get(pk, self.load)
+        assert not get.called
+        assert doc.pk == pk and doc.name == 'foo'
+        assert (self.cache.hits, self.cache.misses) == (1, 1)
+
+    def test_fresh_instances(self):
+        pk = self.objects[0].pk
+        self.cache.get(pk, self.load)
+        doc = self.cache.get(pk, self.load)
+        doc.name = 'changed'
+        assert self.cache.get(pk, self.load).name == 'foo'
+
+    def test_max_size(self):
+        for obj in self.objects:
+            self.cache.get(obj.pk, self.load)
+        self.cache.get(self.objects[0].pk, self.load)
+        assert (self.cache.hits, self.cache.misses) == (0, 4)
+
+    def test_timeout(self):
+        pk = self.objects[0].pk
+        self.cache.timeout = 0
+        self.cache.get(pk, self.load)
+        self.cache.get(pk, self.load)
+        assert self.cache.misses == 2
+
+    def test_invalidated_on_save(self):
+        pk = self.objects[0].pk
+        self.cache.get(pk, self.load)
+        self.objects[0].name = 'changed'
+        self.objects[0].save()
+        assert self.cache.get(pk, self.load).name == 'changed'
+        assert self.cache.misses == 2
+
+    def test_invalidated_on_delete(self):
+        pk = self.objects[0].pk
+        self.cache.get(pk, self.load)
+        self.objects[0].delete()
+        with self.assertRaises(CachedDoc.DoesNotExist):
+            self.cache.get(pk, self.load)
+
+    def test_get_object(self):
+        view = CachedRetrView.as_view()
+        oid = self.objects[0].id
+        for _ in range(2):
+            request = APIRequestFactory().get('/' + str(oid))
+            response = view(request, id=str(oid)).render()
+            assert response.status_code == status.HTTP_200_OK
+            assert response.data == {'id': str(oid), 'name': 'foo'}
+        assert (self.cache.hits, self.cache.misses) == (1, 1)
+
+        request = APIRequestFactory().get('/')
+        response = view(request, id=str(ObjectId())).render()
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_unsafe_methods(self):
+        oid = self.objects[0].id
+        self.cache.get(oid, self.load)
+        # not seen by the cache
+        CachedDoc.objects(id=oid).update(set__name='changed')
+        request = APIRequestFactory().patch('/', {}, format='json')
+        response = CachedUpdateView.as_view()(request, id=str(oid)).render()
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['name'] == 'changed'
+        assert (self.cache.hits, self.cache.misses) == (0, 1)
+
+    def test_restricted_queryset(self):
+        class RestrictedView(CachedRetrView):
+            queryset = CachedDoc.objects.filter(name='bar')
+
+        oid = self.objects[0].id
+        request = APIRequestFactory().get('/' + str(oid))
+        response = RestrictedView.as_view()(request, id=str(oid)).render()
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert self.cache.misses == 0
+
+    def test_reference_field(self):
+        field = ReferenceField(model=CachedDoc)
+        pk = self.objects[0].pk
+        assert field.to_internal_value(str(pk)) == self.objects[0].to_dbref()
+        assert field.to_internal_value(str(pk)) == self.objects[0].to_dbref()
+        assert (self.cache.hits, self.cache.misses) == (1, 1)
+
+    def test_generic_reference_list(self):
+        field = GenericReferenceField()
+        self.cache.get(self.objects[0].pk, self.load)
+        missing = str(ObjectId())
+        refs = [{'_cls': 'CachedDoc', '_id': str(obj.pk)} for obj in self.objects[:2]]
+        serializer = CachedReferencingSerializer(data={'refs': refs + [{'_cls': 'CachedDoc', '_id': missing}]})
+        with patch.object(QuerySet, 'in_bulk', autospec=True, side_effect=QuerySet.in_bulk) as in_bulk:
+            with patch.object(QuerySet, 'get', side_effect=AssertionError):
+                assert not serializer.is_valid()
+        assert in_bulk.call_count == 1
+        assert serializer.errors == {'refs': {2: ['Document with id=%s does not exist.' % missing]}}
+        assert (self.cache.hits, self.cache.misses) == (1, 3)
+
+        # found documents are put into the cache
+        with patch.object(QuerySet, 'in_bulk', side_effect=AssertionError):
+            assert field.run_list_validation(refs) == self.objects[:2]
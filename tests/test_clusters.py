@@ -0,0 +1,91 @@
+from __future__ import unicode_literals
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+from mongoengine import Document, fields
+from rest_framework import status
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.test import APIRequestFactory
+
+from rest_framework_mongoengine.filters import GeoFilterBackend
+from rest_framework_mongoengine.mixins import ClusterModelMixin
+from rest_framework_mongoengine.routers import SimpleRouter
+from rest_framework_mongoengine.serializers import DocumentSerializer
+from rest_framework_mongoengine.viewsets import ReadOnlyModelViewSet
+
+
+class ClusteredDoc(Document):
+    point = fields.PointField()
+    legacy_point = fields.GeoPointField()
+    name = fields.StringField()
+
+
+class ClusteredSerializer(DocumentSerializer):
+    class Meta:
+        model = ClusteredDoc
+        fields = '__all__'
+
+
+class NameFilterBackend(BaseFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        return queryset.filter(name=request.query_params['name'])
+
+
+class ClusteredViewSet(ClusterModelMixin, ReadOnlyModelViewSet):
+    queryset = ClusteredDoc.objects
+    serializer_class = ClusteredSerializer
+    filter_backends = [GeoFilterBackend]
+    geo_field = 'point'
+
+
+class TestClusters(TestCase):
+    def setUp(self):
+        for point in ([1, 1], [1.5, 2], [100, 50], [180, 90], None):
+            ClusteredDoc.objects.create(point=point, legacy_point=point)
+
+    def doCleanups(self):
+        ClusteredDoc.drop_collection()
+
+    def get_clusters(self, query, **initkwargs):
+        view = ClusteredViewSet.as_view({'get': 'clusters'}, **initkwargs)
+        return view(APIRequestFactory().get('/', query))
+
+    def test_route(self):
+        router = SimpleRouter()
+        router.register('clustered', ClusteredViewSet)
+        assert 'clustereddoc-clusters' in set(route.name for route in router.urls)
+
+    def test_clusters(self):
+        response = self.get_clusters({'zoom': 3})
+        assert response.status_code == status.HTTP_200_OK
+        assert sorted(response.data, key=lambda cluster: cluster['bbox']) == [
+            {'count': 2, 'centroid': [1.25, 1.5], 'bbox': [0.0, 0.0, 45.0, 45.0]},
+            {'count': 1, 'centroid': [100.0, 50.0], 'bbox': [90.0, 45.0, 135.0, 90.0]},
+            {'count': 1, 'centroid': [180.0, 90.0], 'bbox': [135.0, 45.0, 180.0, 90.0]},
+        ]
+
+    def test_whole_world(self):
+        response = self.get_clusters({})
+        assert response.data == [{'count': 4, 'centroid': [70.625, 35.75], 'bbox': [-180.0, -90.0, 180.0, 90.0]}]
+
+    def test_legacy_point(self):
+        response = self.get_clusters({'zoom': 3}, geo_field='legacy_point')
+        assert sorted(cluster['count'] for cluster in response.data) == [1, 1, 2]
+
+    def test_filtered(self):
+        ClusteredDoc.objects(point__exists=True).first().update(name='foo')
+        response = self.get_clusters({'zoom': 3, 'name': 'foo'}, filter_backends=[NameFilterBackend])
+        assert [cluster['count'] for cluster in response.data] == [1]
+
+    def test_near(self):
+        response = self.get_clusters({'near': '1,1', 'radius': 1000})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_invalid_zoom(self):
+        response = self.get_clusters({'zoom': 30})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert list(response.data) == ['zoom']
+
+    def test_not_point(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.get_clusters({}, geo_field='name')
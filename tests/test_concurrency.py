@@ -0,0 +1,146 @@
+from __future__ import unicode_literals
+
+import threading
+
+from django.test import TestCase
+from django.utils import timezone, translation
+from mock import patch
+from mongoengine import Document, fields
+
+from rest_framework_mongoengine import concurrency
+from rest_framework_mongoengine.fields import ReferenceField
+from rest_framework_mongoengine.serializers import DocumentSerializer
+
+
+class ConcurrentReferenced(Document):
+    name = fields.StringField()
+
+
+class ConcurrentValidating(Document):
+    meta = {
+        'indexes': [
+            {'fields': ['name', 'code'], 'unique': True}
+        ]
+    }
+    slug = fields.StringField(unique=True)
+    name = fields.StringField()
+    code = fields.IntField()
+    ref = fields.ReferenceField(ConcurrentReferenced)
+    refs = fields.ListField(fields.ReferenceField(ConcurrentReferenced))
+
+
+class ConcurrentSerializer(DocumentSerializer):
+    class Meta:
+        model = ConcurrentValidating
+        fields = '__all__'
+        concurrent_validation = True
+
+
+class TestSubmit(TestCase):
+    def test_results(self):
+        futures = concurrency.submit([lambda: 1, lambda: 2, lambda: 1 / 0])
+        assert [future.result() for future in futures[:2]] == [1, 2]
+        assert isinstance(futures[2].exception(), ZeroDivisionError)
+
+    def test_concurrent(self):
+        barrier = threading.Barrier(2, timeout=5)
+        futures = concurrency.submit([barrier.wait, barrier.wait])
+        assert sorted(future.result() for future in futures) == [0, 1]
+
+    def test_language(self):
+        with translation.override('de'):
+            futures = concurrency.submit([translation.get_language, translation.get_language])
+            assert [future.result() for future in futures] == ['de', 'de']
+
+    def test_timezone(self):
+        with timezone.override('Europe/Berlin'):
+            futures = concurrency.submit([timezone.get_current_timezone_name, timezone.get_current_timezone_name])
+            assert [future.result() for future in futures] == ['Europe/Berlin', 'Europe/Berlin']
+
+    def test_nested(self):
+        def nested():
+            return [future.done() for future in concurrency.submit([lambda: 1, lambda: 2])]
+
+        futures = concurrency.submit([nested, nested])
+        assert [future.result() for future in futures] == [[True, True], [True, True]]
+
+
+class TestConcurrentValidation(TestCase):
+    def setUp(self):
+        self.referenced = ConcurrentReferenced.objects.create(name='foo')
+        ConcurrentValidating.objects.create(slug='existing', name='example', code=1)
+
+    def doCleanups(self):
+        ConcurrentReferenced.drop_collection()
+        ConcurrentValidating.drop_collection()
+
+    def test_query_bound(self):
+        serializer = ConcurrentSerializer()
+        bound = set(name for name, field in serializer.fields.items() if serializer.is_query_bound(field))
+        assert bound == {'slug', 'ref', 'refs'}
+
+    def test_valid(self):
+        data = {
+            'slug': 'other', 'name': 'example', 'code': 2,
+            'ref': str(self.referenced.pk), 'refs': [str(self.referenced.pk)]
+        }
+        serializer = ConcurrentSerializer(data=data)
+        assert serializer.is_valid(), serializer.errors
+        assert serializer.validated_data == {
+            'slug': 'other', 'name': 'example', 'code': 2,
+            'ref': self.referenced, 'refs': [self.referenced]
+        }
+
+    def test_errors(self):
+        data = {
+            'slug': 'existing', 'name': 'example', 'code': 'x',
+            'ref': '0123456789abcdef01234567', 'refs': ['0123456789abcdef01234567']
+        }
+        serializer = ConcurrentSerializer(data=data)
+        assert not serializer.is_valid()
+        assert list(serializer.errors.keys()) == [name for name in serializer.fields if name in ('slug', 'code', 'ref', 'refs')]
+        assert serializer.errors['slug'] == ['This field must be unique.']
+
+    def test_unique_together(self):
+        data = {'slug': 'other', 'name': 'example', 'code': 1}
+        serializer = ConcurrentSerializer(data=data)
+        assert not serializer.is_valid()
+        assert serializer.errors == {'non_field_errors': ['The fields name, code must make a unique set.']}
+
+    def test_fields_concurrent(self):
+        barrier = threading.Barrier(2, timeout=5)
+        to_internal_value = ReferenceField.to_internal_value
+
+        def waiting(field, value):
+            barrier.wait()
+            return to_internal_value(field, value)
+
+        data = {'slug': 'other', 'name': 'other', 'code': 2, 'ref': str(self.referenced.pk), 'refs': [str(self.referenced.pk)]}
+        serializer = ConcurrentSerializer(data=data)
+        with patch.object(ReferenceField, 'to_internal_value', autospec=True, side_effect=waiting):
+            assert serializer.is_valid(), serializer.errors
+
+    def test_validate_methods(self):
+        threads = []
+
+        class MethodSerializer(ConcurrentSerializer):
+            def validate_slug(self, value):
+                threads.append(threading.current_thread())
+                return value.upper()
+
+            def validate_ref(self, value):
+                threads.append(threading.current_thread())
+                return value
+
+        data = {'slug': 'other', 'name': 'other', 'code': 2, 'ref': str(self.referenced.pk)}
+        serializer = MethodSerializer(data=data)
+        assert serializer.is_valid(), serializer.errors
+        assert serializer.validated_data['slug'] == 'OTHER'
+        assert threads == [threading.current_thread()] * 2
+
+    def test_translated(self):
+        data = {'slug': 'existing', 'name': 'other', 'code': 2, 'ref': '0123456789abcdef01234567'}
+        with translation.override('de'):
+            serializer = ConcurrentSerializer(data=data)
+            assert not serializer.is_valid()
+            assert serializer.errors['slug'] == ['Dieses Feld muss eindeutig sein.']
@@ -0,0 +1,133 @@
+from __future__ import unicode_literals
+
+from django.test import TestCase
+from mock import patch
+from mongoengine import Document, EmbeddedDocument, fields
+from mongoengine.queryset import QuerySet
+from rest_framework import serializers, status
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from rest_framework_mongoengine import generics
+from rest_framework_mongoengine.serializers import DocumentSerializer
+
+
+class ExpandTeam(Document):
+    name = fields.StringField()
+
+
+class ExpandAuthor(Document):
+    name = fields.StringField()
+    team = fields.ReferenceField(ExpandTeam)
+
+
+class ExpandComment(EmbeddedDocument):
+    text = fields.StringField()
+    author = fields.ReferenceField(ExpandAuthor)
+
+
+class ExpandPost(Document):
+    title = fields.StringField()
+    author = fields.ReferenceField(ExpandAuthor)
+    editors = fields.ListField(fields.ReferenceField(ExpandAuthor))
+    comments = fields.EmbeddedDocumentListField(ExpandComment)
+
+
+class ExpandPostSerializer(DocumentSerializer):
+    class Meta:
+        model = ExpandPost
+        fields = '__all__'
+        expandable_fields = ('author.team', 'editors', 'comments.author')
+
+
+class ShallowExpandPostSerializer(ExpandPostSerializer):
+    class Meta(ExpandPostSerializer.Meta):
+        max_expand_depth = 1
+
+
+class ExpandPostView(generics.ListCreateAPIView):
+    queryset = ExpandPost.objects
+    serializer_class = ExpandPostSerializer
+
+
+def get_context(expand):
+    return {'request': Request(APIRequestFactory().get('/', {'expand': expand}))}
+
+
+class TestExpand(TestCase):
+    def setUp(self):
+        self.team = ExpandTeam.objects.create(name='team')
+        self.authors = [ExpandAuthor.objects.create(name='author%d' % i, team=self.team) for i in range(2)]
+        self.posts = [
+            ExpandPost.objects.create(
+                title='post%d' % i, author=self.authors[i], editors=self.authors,
+                comments=[ExpandComment(text='comment', author=self.authors[1 - i])]
+            ) for i in range(2)
+        ]
+
+    def doCleanups(self):
+        ExpandTeam.drop_collection()
+        ExpandAuthor.drop_collection()
+        ExpandPost.drop_collection()
+
+    def get_post(self, index=0):
+        return ExpandPost.objects.get(pk=self.posts[index].pk)
+
+    def test_flat(self):
+        data = ExpandPostSerializer(self.get_post(), context=get_context('')).data
+        assert data['author'] == str(self.authors[0].pk)
+        assert data['comments'] == [{'text': 'comment', 'author': str(self.authors[1].pk)}]
+
+    def test_expand(self):
+        data = ExpandPostSerializer(self.get_post(), context=get_context('author,editors')).data
+        assert data['author'] == {'id': str(self.authors[0].pk), 'name': 'author0', 'team': str(self.team.pk)}
+        assert [editor['name'] for editor in data['editors']] == ['author0', 'author1']
+
+    def test_nested(self):
+        data = ExpandPostSerializer(self.get_post(), context=get_context('author.team,comments.author')).data
+        assert data['author']['team'] == {'id': str(self.team.pk), 'name': 'team'}
+        assert data['comments'][0]['author'] == {'id': str(self.authors[1].pk), 'name': 'author1', 'team': str(self.team.pk)}
+        assert data['editors'] == [str(author.pk) for author in self.authors]
+
+    def test_argument(self):
+        data = ExpandPostSerializer(self.get_post(), expand=['author']).data
+        assert data['author']['name'] == 'author0'
+
+    def test_not_allowed(self):
+        for expand in ('title', 'editors.team', 'comments.author.team'):
+            with self.assertRaises(serializers.ValidationError) as ctx:
+                ExpandPostSerializer(self.get_post(), context=get_context(expand)).data
+            assert ctx.exception.detail == {'expand': ["Can not expand '%s'." % expand]}
+
+    def test_max_depth(self):
+        data = ShallowExpandPostSerializer(self.get_post(), context=get_context('author')).data
+        assert data['author']['name'] == 'author0'
+        with self.assertRaises(serializers.ValidationError):
+            ShallowExpandPostSerializer(self.get_post(), context=get_context('author.team')).data
+
+    def test_batched(self):
+        posts = list(ExpandPost.objects.order_by('title'))
+        serializer = ExpandPostSerializer(posts, many=True, context=get_context('author.team,editors,comments.author'))
+        with patch.object(QuerySet, 'in_bulk', autospec=True, side_effect=QuerySet.in_bulk) as in_bulk:
+            with patch.object(ExpandAuthor, '_get_db', side_effect=AssertionError):
+                with patch.object(ExpandTeam, '_get_db', side_effect=AssertionError):
+                    data = serializer.data
+        # authors, their teams, editors, authors of comments
+        assert in_bulk.call_count == 4
+        assert [post['author']['team']['name'] for post in data] == ['team', 'team']
+        assert [post['comments'][0]['author']['name'] for post in data] == ['author1', 'author0']
+
+    def test_view(self):
+        response = ExpandPostView.as_view()(APIRequestFactory().get('/', {'expand': 'author'}))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data[0]['author']['name'] in ('author0', 'author1')
+
+        response = ExpandPostView.as_view()(APIRequestFactory().get('/', {'expand': 'title'}))
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_write(self):
+        request = APIRequestFactory().post('/?expand=author', {'title': 'x', 'author': str(self.authors[0].pk)}, format='json')
+        response = ExpandPostView.as_view()(request)
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['author'] == str(self.authors[0].pk)
+        assert ExpandPost.objects.get(title='x').author == self.authors[0]
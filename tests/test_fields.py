@@ -9,7 +9,7 @@ from mongoengine import Document, fields
 from rest_framework.exceptions import ValidationError
 
 from rest_framework_mongoengine.fields import (
-    DocumentField, GenericField, ObjectIdField
+    DocumentField, GenericField, ListField, ObjectIdField, to_object_ids
 )
 
 from .models import DumbDocument, DumbEmbedded
@@ -33,6 +33,28 @@ class TestObjectId(FieldTest, TestCase):
     }
 
 
+class TestObjectIdList(TestCase):
+    field = ListField(child=ObjectIdField())
+
+    def test_to_object_ids(self):
+        oid = ObjectId('56353a4aa21aab2c49d86ebb')
+        assert to_object_ids(['56353a4aa21aab2c49d86ebb', oid, '56353A4AA21AAB2C49D86EBB']) == [oid, oid, oid]
+
+    def test_valid(self):
+        ids = [ObjectId() for _ in range(3)]
+        assert self.field.run_validation([str(oid) for oid in ids]) == ids
+
+    def test_invalid(self):
+        with pytest.raises(ValidationError) as exc_info:
+            self.field.run_validation(['56353a4aa21aab2c49d86ebb', 'xxx', None])
+        assert list(exc_info.value.detail.keys()) == [1, 2]
+        assert "is not a valid ObjectId" in exc_info.value.detail[1][0]
+
+    def test_output(self):
+        oid = ObjectId('56353a4aa21aab2c49d86ebb')
+        assert self.field.to_representation([oid, None]) == ['56353a4aa21aab2c49d86ebb', None]
+
+
 class TestDocumentField(TestCase):
 
     def doCleanups(self):
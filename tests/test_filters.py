@@ -0,0 +1,121 @@
+from __future__ import unicode_literals
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+from mongoengine import Document, fields
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from rest_framework_mongoengine import generics
+from rest_framework_mongoengine.filters import (
+    GeoFilterBackend, get_geo_index
+)
+from rest_framework_mongoengine.serializers import DocumentSerializer
+
+
+class LocatedDoc(Document):
+    name = fields.StringField()
+    point = fields.PointField()
+    legacy_point = fields.GeoPointField()
+    points = fields.MultiPointField()
+    meta = {'ordering': ['name']}
+
+
+class LocatedSerializer(DocumentSerializer):
+    class Meta:
+        model = LocatedDoc
+        fields = ('id', 'name')
+
+
+class LocatedView(generics.ListAPIView):
+    queryset = LocatedDoc.objects
+    serializer_class = LocatedSerializer
+    filter_backends = [GeoFilterBackend]
+    geo_field = 'point'
+
+
+class TestGeoFilter(TestCase):
+    def doCleanups(self):
+        LocatedDoc.drop_collection()
+
+    def filter(self, query, geo_field='point'):
+        request = Request(APIRequestFactory().get('/', query))
+        view = LocatedView(geo_field=geo_field)
+        return GeoFilterBackend().filter_queryset(request, LocatedDoc.objects.order_by('name'), view)
+
+    def test_geo_index(self):
+        assert get_geo_index(LocatedDoc, 'point') == '2dsphere'
+        assert get_geo_index(LocatedDoc, 'legacy_point') == '2d'
+        assert get_geo_index(LocatedDoc, 'points') is None
+        assert get_geo_index(LocatedDoc, 'name') is None
+
+    def test_no_params(self):
+        queryset = self.filter({'name': 'foo'})
+        assert queryset._query == {}
+        assert queryset._ordering == [('name', 1)]
+
+    def test_bbox(self):
+        queryset = self.filter({'in_bbox': '1,2,3,4'})
+        assert queryset._query == {'point': {'$geoWithin': {'$geometry': {
+            'type': 'Polygon', 'coordinates': [[[1, 2], [3, 2], [3, 4], [1, 4], [1, 2]]]
+        }}}}
+        queryset = self.filter({'in_bbox': '1,2,3,4'}, 'legacy_point')
+        assert queryset._query == {'legacy_point': {'$within': {'$box': [(1, 2), (3, 4)]}}}
+
+    def test_near(self):
+        queryset = self.filter({'near': '1,2', 'radius': '100'})
+        assert queryset._query['point']['$near']['$geometry'] == {'type': 'Point', 'coordinates': [1, 2]}
+        assert queryset._query['point']['$near']['$maxDistance'] == 100
+        assert queryset._ordering == []
+
+        queryset = self.filter({'near': '1,2', 'radius': '100'}, 'legacy_point')
+        assert queryset._query['legacy_point']['$nearSphere'] == [1, 2]
+        assert queryset._query['legacy_point']['$maxDistance'] == 100 / 6371000.0
+
+    def test_polygon(self):
+        ring = [[0, 0], [1, 0], [1, 1], [0, 0]]
+        queryset = self.filter({'polygon': '[[[0, 0], [1, 0], [1, 1], [0, 0]]]'})
+        assert queryset._query == {'point': {'$geoWithin': {'$geometry': {'type': 'Polygon', 'coordinates': [ring]}}}}
+        queryset = self.filter({'polygon': '{"type": "Polygon", "coordinates": [[[0, 0], [1, 0], [1, 1], [0, 0]]]}'}, 'legacy_point')
+        assert queryset._query == {'legacy_point': {'$within': {'$polygon': ring}}}
+
+    def test_intersects(self):
+        queryset = self.filter({'intersects': '{"type": "LineString", "coordinates": [[0, 0], [1, 1]]}'})
+        assert queryset._query == {'point': {'$geoIntersects': {'$geometry': {
+            'type': 'LineString', 'coordinates': [[0, 0], [1, 1]]
+        }}}}
+
+    def test_combined(self):
+        queryset = self.filter({'in_bbox': '0,0,10,10', 'near': '1,2'})
+        assert list(queryset._query['point']) == ['$geoWithin', '$near']
+
+    def test_unindexed(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.filter({'near': '1,2'}, 'points')
+        assert self.filter({}, 'points')._query == {}
+
+
+class TestGeoFilterErrors(TestCase):
+    def doCleanups(self):
+        LocatedDoc.drop_collection()
+
+    def get_errors(self, query):
+        response = LocatedView.as_view()(APIRequestFactory().get('/', query))
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        return response.data
+
+    def test_invalid(self):
+        assert list(self.get_errors({'in_bbox': '1,2,3'})) == ['in_bbox']
+        assert list(self.get_errors({'in_bbox': '1,2,3,100'})) == ['in_bbox']
+        assert list(self.get_errors({'near': '200,0'})) == ['near']
+        assert list(self.get_errors({'near': '1,2', 'radius': '-1'})) == ['radius']
+        assert list(self.get_errors({'radius': '1'})) == ['radius']
+        assert list(self.get_errors({'polygon': '[[0, 0], [1, 1]]'})) == ['polygon']
+        assert list(self.get_errors({'polygon': 'x'})) == ['polygon']
+        assert list(self.get_errors({'intersects': '[[0, 0], [1, 1]]'})) == ['intersects']
+
+    def test_unsupported(self):
+        view = LocatedView.as_view(geo_field='legacy_point')
+        response = view(APIRequestFactory().get('/', {'intersects': '{"type": "Point", "coordinates": [0, 0]}'}))
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
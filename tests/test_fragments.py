@@ -0,0 +1,155 @@
+from __future__ import unicode_literals
+
+import json
+
+from django.core.cache import cache
+from django.test import TestCase
+from mock import patch
+from rest_framework import serializers, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from rest_framework_mongoengine import generics
+from rest_framework_mongoengine.renderers import (
+    FragmentJSONRenderer, JSONFragment
+)
+from rest_framework_mongoengine.serializers import (
+    DocumentSerializer, FragmentListSerializer
+)
+
+from .models import DumbDocument
+
+
+class FragmentSerializer(DocumentSerializer):
+    class Meta:
+        model = DumbDocument
+        fields = '__all__'
+        list_serializer_class = FragmentListSerializer
+
+
+class FragmentListView(generics.ListAPIView):
+    queryset = DumbDocument.objects
+    serializer_class = FragmentSerializer
+    renderer_classes = [FragmentJSONRenderer]
+
+
+class PlainListView(FragmentListView):
+    renderer_classes = [JSONRenderer, FragmentJSONRenderer]
+
+
+class UserFragmentListSerializer(FragmentListSerializer):
+    def get_cache_key_params(self):
+        return super(UserFragmentListSerializer, self).get_cache_key_params() + [('user', self.context['user'])]
+
+
+class UserFragmentSerializer(DocumentSerializer):
+    class Meta:
+        model = DumbDocument
+        fields = '__all__'
+        list_serializer_class = UserFragmentListSerializer
+
+
+class TestFragmentRenderer(TestCase):
+    def test_list(self):
+        data = [JSONFragment(b'{"a":1}'), JSONFragment(b'{"a":2}')]
+        assert FragmentJSONRenderer().render(data) == b'[{"a":1},{"a":2}]'
+
+    def test_envelope(self):
+        data = {'count': 2, 'next': None, 'results': [JSONFragment(b'{"a":1}'), JSONFragment(b'{"a":2}')]}
+        rendered = FragmentJSONRenderer().render(data)
+        assert json.loads(rendered.decode()) == {'count': 2, 'next': None, 'results': [{'a': 1}, {'a': 2}]}
+
+    def test_nested_envelope(self):
+        data = {'data': {'results': [JSONFragment(b'{"a":1}')], 'count': 1}, 'pages': [1]}
+        rendered = FragmentJSONRenderer().render(data)
+        assert json.loads(rendered.decode()) == {'data': {'results': [{'a': 1}], 'count': 1}, 'pages': [1]}
+
+    def test_plain(self):
+        assert FragmentJSONRenderer().render([]) == b'[]'
+        assert json.loads(FragmentJSONRenderer().render({'a': [1]}).decode()) == {'a': [1]}
+
+
+class TestFragmentListSerializer(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.objects = [DumbDocument.objects.create(name=name, foo=i) for i, name in enumerate(['foo', 'bar'])]
+
+    def doCleanups(self):
+        DumbDocument.drop_collection()
+
+    def get_data(self):
+        serializer = FragmentSerializer(DumbDocument.objects.order_by('foo'), many=True)
+        return serializer.data
+
+    def test_fragments(self):
+        data = self.get_data()
+        assert all(isinstance(item, JSONFragment) for item in data)
+        assert [json.loads(item.decode()) for item in data] == [
+            {'id': str(obj.id), 'name': obj.name, 'foo': obj.foo} for obj in self.objects
+        ]
+
+    def test_cached(self):
+        first = self.get_data()
+        with patch.object(FragmentSerializer, 'to_representation') as to_representation:
+            second = self.get_data()
+        assert not to_representation.called
+        assert list(first) == list(second)
+
+    def test_invalidated_on_save(self):
+        self.get_data()
+        self.objects[0].name = 'baz'
+        self.objects[0].save()
+        with patch.object(FragmentSerializer, 'to_representation', return_value={}) as to_representation:
+            self.get_data()
+        assert to_representation.call_count == 1
+
+    def test_view(self):
+        view = FragmentListView.as_view()
+        request = APIRequestFactory().get('/')
+        for _ in range(2):
+            response = view(request).render()
+            assert response.status_code == status.HTTP_200_OK
+            assert json.loads(response.content.decode()) == [
+                {'id': str(obj.id), 'name': obj.name, 'foo': obj.foo} for obj in self.objects
+            ]
+
+    def test_other_renderer(self):
+        response = PlainListView.as_view()(APIRequestFactory().get('/')).render()
+        assert response.status_code == status.HTTP_200_OK
+        assert json.loads(response.content.decode()) == [
+            {'id': str(obj.id), 'name': obj.name, 'foo': obj.foo} for obj in self.objects
+        ]
+        assert not cache.get('drfm:fragment:%s:%s' % (DumbDocument._get_collection_name(), self.objects[0].pk))
+
+    def test_nested(self):
+        class ParentSerializer(serializers.Serializer):
+            items = FragmentSerializer(many=True)
+
+        with self.assertRaises(AssertionError):
+            ParentSerializer({'items': list(DumbDocument.objects)}).data
+
+    def test_cache_key_params(self):
+        queryset = DumbDocument.objects.order_by('foo')
+        serializer = UserFragmentSerializer(queryset, many=True, context={'user': '1'})
+        assert serializer.get_serializer_key().endswith('UserFragmentSerializer?user=1')
+        serializer.data
+        with patch.object(UserFragmentSerializer, 'to_representation', return_value={}) as to_representation:
+            UserFragmentSerializer(queryset, many=True, context={'user': '1'}).data
+            UserFragmentSerializer(queryset, many=True, context={'user': '2'}).data
+        assert to_representation.call_count == 2
+
+    def test_variants(self):
+        data = self.get_data()
+        for name in ('foo', 'bar'):
+            UserFragmentSerializer(DumbDocument.objects.order_by('foo'), many=True, context={'user': name}).data
+        version_key = 'drfm:fragment:%s:%s' % (DumbDocument._get_collection_name(), self.objects[0].pk)
+        version = cache.get(version_key)
+        # each variant is an entry of its own
+        assert isinstance(version, str)
+        assert len([key for key in cache._cache if version in key]) == 3
+
+        self.objects[0].name = 'baz'
+        self.objects[0].save()
+        assert cache.get(version_key) is None
+        assert json.loads(self.get_data()[0].decode())['name'] == 'baz'
+        assert self.get_data()[1] == data[1]
@@ -1,14 +1,21 @@
 from __future__ import unicode_literals
 
+from datetime import datetime
+
 from bson import ObjectId
+from django.http import Http404
 from django.test import TestCase
+from mock import patch
+from mongoengine import Document, EmbeddedDocument, fields
+from mongoengine.queryset import QuerySet
 from rest_framework import permissions, status
 from rest_framework.test import APIRequestFactory
 
 from rest_framework_mongoengine import generics
+from rest_framework_mongoengine.cache import missing_documents
 from rest_framework_mongoengine.serializers import DocumentSerializer
 
-from .models import DumbDocument
+from .models import DumbDocument, IntIdDocument
 
 
 class DumbSerializer(DocumentSerializer):
@@ -85,5 +92,230 @@ class TestBasicViews(TestCase):
         view = RetrView.as_view()
         oid = 'invalid_id'
         request = self.client.get('/' + oid)
-        response = view(request, id=oid).render()
+        with patch.object(QuerySet, 'get') as get:
+            response = view(request, id=oid).render()
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert not get.called
+
+
+class IntIdSerializer(DocumentSerializer):
+    class Meta:
+        model = IntIdDocument
+        fields = '__all__'
+
+
+class NegativeCachingView(generics.RetrieveAPIView):
+    queryset = IntIdDocument.objects
+    serializer_class = IntIdSerializer
+    negative_cache_timeout = 60
+
+
+class TestLookupValidation(TestCase):
+    client_class = APIRequestFactory
+
+    def setUp(self):
+        missing_documents.clear()
+
+    def doCleanups(self):
+        IntIdDocument.drop_collection()
+
+    def retrieve(self, pk):
+        request = self.client.get('/' + pk)
+        return NegativeCachingView.as_view()(request, id=pk).render()
+
+    def test_invalid(self):
+        with patch.object(QuerySet, 'get') as get:
+            response = self.retrieve('abc')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert not get.called
+
+    def test_negative_cache(self):
+        response = self.retrieve('1')
         assert response.status_code == status.HTTP_404_NOT_FOUND
+        with patch.object(QuerySet, 'get') as get:
+            response = self.retrieve('1')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert not get.called
+
+    def test_negative_cache_invalidated(self):
+        self.retrieve('1')
+        IntIdDocument.objects.create(id=1, name='foo')
+        response = self.retrieve('1')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {'id': 1, 'name': 'foo', 'foo': None}
+
+    def test_negative_cache_expired(self):
+        NegativeCachingView.negative_cache_timeout = 0
+        try:
+            self.retrieve('1')
+            with patch.object(QuerySet, 'get', side_effect=IntIdDocument.DoesNotExist) as get:
+                self.retrieve('1')
+            assert get.called
+        finally:
+            NegativeCachingView.negative_cache_timeout = 60
+
+    def test_lookup_collation(self):
+        view = NegativeCachingView(kwargs={'id': '1'}, lookup_collation={'locale': 'en', 'strength': 2})
+        view.request = None
+        view.format_kwarg = None
+        queryset = view.get_lookup_queryset()
+        assert queryset._collation == {'locale': 'en', 'strength': 2}
+        with patch.object(QuerySet, 'get', side_effect=IntIdDocument.DoesNotExist):
+            with self.assertRaises(Http404):
+                view.get_object()
+        assert not missing_documents.contains(IntIdDocument, 1)
+
+
+class StampedEmbedded(EmbeddedDocument):
+    text = fields.StringField()
+
+
+class StampedDocument(Document):
+    name = fields.StringField()
+    updated = fields.DateTimeField()
+    emb = fields.EmbeddedDocumentField(StampedEmbedded)
+
+
+class StampedSerializer(DocumentSerializer):
+    class Meta:
+        model = StampedDocument
+        fields = '__all__'
+
+
+class StampedRetrView(generics.RetrieveAPIView):
+    queryset = StampedDocument.objects
+    serializer_class = StampedSerializer
+    stamp_field = 'updated'
+
+
+class HashedRetrView(generics.RetrieveAPIView):
+    queryset = StampedDocument.objects
+    serializer_class = StampedSerializer
+    etag_fields = ('name', 'emb')
+
+
+class DenyingPermission(permissions.BasePermission):
+    def has_object_permission(self, request, view, obj):
+        return False
+
+
+class DeniedRetrView(StampedRetrView):
+    permission_classes = [DenyingPermission]
+
+
+class StampedListView(generics.ListAPIView):
+    queryset = StampedDocument.objects
+    serializer_class = StampedSerializer
+    stamp_field = 'updated'
+
+
+class TestConditionalViews(TestCase):
+    client_class = APIRequestFactory
+
+    def setUp(self):
+        self.objects = [
+            StampedDocument.objects.create(name='foo', updated=datetime(2020, 1, 1, 10, 0), emb=StampedEmbedded(text='foo')),
+            StampedDocument.objects.create(name='bar', updated=datetime(2020, 1, 2, 10, 0)),
+        ]
+
+    def doCleanups(self):
+        StampedDocument.drop_collection()
+
+    def retrieve(self, view_class, oid, **headers):
+        request = self.client.get('/' + str(oid), **headers)
+        return view_class.as_view()(request, id=oid).render()
+
+    def test_retr_stamped(self):
+        oid = self.objects[0].id
+        response = self.retrieve(StampedRetrView, oid)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] == '"1577872800000"'
+        assert response['Last-Modified'] == 'Wed, 01 Jan 2020 10:00:00 GMT'
+
+    def test_retr_not_modified(self):
+        oid = self.objects[0].id
+        etag = self.retrieve(StampedRetrView, oid)['ETag']
+        with patch.object(StampedRetrView, 'get_object') as get_object:
+            response = self.retrieve(StampedRetrView, oid, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert not get_object.called
+
+    def test_retr_modified(self):
+        oid = self.objects[0].id
+        etag = self.retrieve(StampedRetrView, oid)['ETag']
+        self.objects[0].updated = datetime(2020, 1, 3, 10, 0)
+        self.objects[0].save()
+        response = self.retrieve(StampedRetrView, oid, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+
+    def test_retr_if_modified_since(self):
+        oid = self.objects[0].id
+        response = self.retrieve(StampedRetrView, oid, HTTP_IF_MODIFIED_SINCE='Wed, 01 Jan 2020 10:00:00 GMT')
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_retr_permissions(self):
+        oid = self.objects[0].id
+        etag = self.retrieve(StampedRetrView, oid)['ETag']
+        response = self.retrieve(DeniedRetrView, oid, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_retr_without_stamp(self):
+        obj = StampedDocument.objects.create(name='baz')
+        response = self.retrieve(StampedRetrView, obj.id)
+        assert not response.has_header('ETag')
+        obj.name = 'qux'
+        obj.save()
+        response = self.retrieve(StampedRetrView, obj.id, HTTP_IF_NONE_MATCH='"None"')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['name'] == 'qux'
+
+    def test_retr_not_found(self):
+        response = self.retrieve(StampedRetrView, ObjectId(), HTTP_IF_NONE_MATCH='"x"')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_retr_hashed(self):
+        oid = self.objects[0].id
+        etag = self.retrieve(HashedRetrView, oid)['ETag']
+        response = self.retrieve(HashedRetrView, oid, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        self.objects[0].name = 'baz'
+        self.objects[0].save()
+        response = self.retrieve(HashedRetrView, oid, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        # stamp of loaded document matches the one retrieved for conditional requests
+        response = self.retrieve(HashedRetrView, oid, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_retr_hashed_embedded(self):
+        oid = self.objects[0].id
+        etag = self.retrieve(HashedRetrView, oid)['ETag']
+        self.objects[0].emb.text = 'bar'
+        self.objects[0].save()
+        response = self.retrieve(HashedRetrView, oid, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+
+    def test_list_stamped(self):
+        view = StampedListView.as_view()
+        response = view(self.client.get('/')).render()
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] == '"2-1577959200000"'
+        assert not response.has_header('Last-Modified')
+
+        response = view(self.client.get('/', HTTP_IF_NONE_MATCH=response['ETag'])).render()
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        StampedDocument.objects.create(name='baz', updated=datetime(2020, 1, 1, 0, 0))
+        response = view(self.client.get('/', HTTP_IF_NONE_MATCH='"2-1577959200000"')).render()
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_list_deleted(self):
+        view = StampedListView.as_view()
+        etag = view(self.client.get('/')).render()['ETag']
+        self.objects[0].delete()
+        response = view(self.client.get('/', HTTP_IF_MODIFIED_SINCE='Thu, 02 Jan 2020 10:00:00 GMT')).render()
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data) == 1
+        response = view(self.client.get('/', HTTP_IF_NONE_MATCH=etag)).render()
+        assert response.status_code == status.HTTP_200_OK
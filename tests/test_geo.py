@@ -1,8 +1,28 @@
+import json
+
+import pytest
+from django.core.cache import cache
 from django.test import TestCase
+from mock import patch
 from mongoengine import Document, fields
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from rest_framework_mongoengine import geo
+from rest_framework_mongoengine.cache import DerivedValues, derived_values
 
-from rest_framework_mongoengine.fields import GeoJSONField, GeoPointField
-from rest_framework_mongoengine.serializers import DocumentSerializer
+from rest_framework_mongoengine.fields import (
+    GeoJSONField, GeoPointField, get_mongo_validator
+)
+from rest_framework_mongoengine.geo import (
+    OutOfBounds, check_geometry, round_geometry, simplify_geometry,
+    simplify_points
+)
+from rest_framework_mongoengine.renderers import FragmentJSONRenderer
+from rest_framework_mongoengine.serializers import (
+    DocumentSerializer, FragmentListSerializer
+)
 
 from .utils import FieldTest, dedent
 
@@ -139,6 +159,73 @@ class TestMultiPolyField(FieldTest, TestCase):
     ]
 
 
+class TestGeometryChecks(TestCase):
+    square = [[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]
+
+    def test_valid(self):
+        assert check_geometry('Point', (0.1, 2)) == (0.1, 2)
+        assert check_geometry('LineString', [[0.1, 0.2], (0.3, 0.4)]) == [[0.1, 0.2], (0.3, 0.4)]
+        assert check_geometry('Polygon', [self.square]) == [self.square]
+        assert check_geometry('MultiLineString', [self.square, self.square[:2]]) == [self.square, self.square[:2]]
+        assert check_geometry('MultiPolygon', [[self.square], [self.square, self.square]]) == [[self.square], [self.square, self.square]]
+
+    def test_invalid(self):
+        assert check_geometry('Point', [0.1]) is None
+        assert check_geometry('MultiPoint', []) is None
+        assert check_geometry('Polygon', [self.square[:-1]]) is None
+        assert check_geometry('MultiPolygon', [[self.square], [[[0, 0], ['x', 0], [0, 0]]]]) is None
+        assert check_geometry('Unknown', [0, 0]) is None
+
+    def test_bounds(self):
+        assert check_geometry('LineString', [[-180, -90], [180, 90]], bounds=True) == [[-180, -90], [180, 90]]
+        with pytest.raises(OutOfBounds) as exc_info:
+            check_geometry('Polygon', [[[0, 0], [0, 91], [1, 1], [0, 0]]], bounds=True)
+        assert exc_info.value.point == [0, 91]
+
+    def test_fallback(self):
+        # rejected by the check, but valid for mongoengine
+        assert check_geometry('Point', [True, 1]) is None
+        assert GeoJSONField('Point').run_validation([True, 1]) == [True, 1]
+
+    def test_field_bounds(self):
+        field = GeoJSONField('MultiPoint', check_bounds=True)
+        with pytest.raises(ValidationError) as exc_info:
+            field.run_validation([[0, 0], [200, 0]])
+        assert exc_info.value.detail == ['Point [200, 0] is out of longitude/latitude bounds.']
+        with pytest.raises(ValidationError):
+            field.run_validation([[0, 0], [200, True]])
+        assert field.run_validation([[0, 0], [180, 90]]) == [[0, 0], [180, 90]]
+
+    def test_arrays(self):
+        numpy = pytest.importorskip('numpy')
+        ring = numpy.array(self.square, dtype=float)
+        field = GeoJSONField('Polygon', check_bounds=True)
+        value = field.run_validation({'type': 'Polygon', 'coordinates': [ring, ring]})
+        assert value == [self.square, self.square]
+        assert type(value[0][0][0]) is float
+        assert GeoJSONField('Point').run_validation(numpy.array([1, 2])) == [1, 2]
+
+    def test_invalid_arrays(self):
+        numpy = pytest.importorskip('numpy')
+        field = GeoJSONField('LineString', check_bounds=True)
+        with pytest.raises(ValidationError) as exc_info:
+            field.run_validation(numpy.array([[0, 0], [0, 100]]))
+        assert exc_info.value.detail == ['Point [0, 100] is out of longitude/latitude bounds.']
+        with pytest.raises(ValidationError) as exc_info:
+            field.run_validation(numpy.array([[0, 0, 0], [1, 1, 1]]))
+        assert "must be a two-dimensional" in exc_info.value.detail[0]
+        with pytest.raises(ValidationError) as exc_info:
+            GeoJSONField('Polygon').run_validation([numpy.array([[0, 0], [0, 1], [1, 1]])])
+        assert "must start and end" in exc_info.value.detail[0]
+
+    def test_shared_validator(self):
+        assert get_mongo_validator(fields.PointField) is get_mongo_validator(fields.PointField)
+        GeoPointField().run_validation([0.1, 0.2])
+        with patch.object(fields.GeoPointField, '__init__') as init:
+            GeoPointField().run_validation([0.1, 0.2])
+        assert not init.called
+
+
 class GeoDoc(Document):
     geo_point_field = fields.GeoPointField()
     point_field = fields.PointField()
@@ -168,3 +255,122 @@ class TestGeoMapping(TestCase):
                 multi_poly_field = GeoJSONField(geo_type='MultiPolygon', required=False)
         """)
         assert repr(TestSerializer()) == expected
+
+
+class TestSimplification(TestCase):
+    def test_simplify_points(self):
+        line = [[0, 0], [1, 0.05], [2, -0.05], [3, 1], [4, 0]]
+        assert simplify_points(line, 0.1) == [[0, 0], [2, -0.05], [3, 1], [4, 0]]
+        assert simplify_points(line, 2) == [[0, 0], [4, 0]]
+        assert simplify_points(line, 0.01) == line
+
+    def test_simplify_ring(self):
+        ring = [[0, 0], [1, 0.01], [0, 1], [0, 0]]
+        assert simplify_geometry('Polygon', [ring], 0.1) == [ring]
+        square = [[0, 0], [1, 0.01], [2, 0], [2, 2], [0, 2], [0, 0]]
+        assert simplify_geometry('Polygon', [square], 0.1) == [[[0, 0], [2, 0], [2, 2], [0, 2], [0, 0]]]
+
+    def test_round(self):
+        assert round_geometry('Point', [1.23456, 2.34567], 2) == [1.23, 2.35]
+        assert round_geometry('MultiPoint', [[1.23456, 2.34567]], 0) == [[1.0, 2.0]]
+
+
+class SimplifiedDoc(Document):
+    poly_field = fields.PolygonField()
+
+
+class SimplifiedSerializer(DocumentSerializer):
+    class Meta:
+        model = SimplifiedDoc
+        fields = ('poly_field',)
+        extra_kwargs = {'poly_field': {'simplify_param': 'simplify', 'precision_param': 'precision'}}
+
+
+class FragmentSimplifiedSerializer(SimplifiedSerializer):
+    class Meta(SimplifiedSerializer.Meta):
+        list_serializer_class = FragmentListSerializer
+
+
+class PlainPolySerializer(DocumentSerializer):
+    class Meta:
+        model = SimplifiedDoc
+        fields = ('poly_field',)
+
+
+class TestSimplifiedOutput(TestCase):
+    square = [[[0, 0], [1.00001, 0.01], [2, 0], [2, 2], [0, 2], [0, 0]]]
+
+    def setUp(self):
+        derived_values.clear()
+        self.doc = SimplifiedDoc.objects.create(poly_field=self.square)
+
+    def doCleanups(self):
+        SimplifiedDoc.drop_collection()
+
+    def serialize(self, query):
+        request = Request(APIRequestFactory().get('/', query))
+        return SimplifiedSerializer(self.doc, context={'request': request}).data['poly_field']
+
+    def test_unchanged(self):
+        assert self.serialize({}) == {'type': 'Polygon', 'coordinates': self.square}
+        assert self.serialize({'simplify': 'x', 'precision': 'y'})['coordinates'] == self.square
+        assert self.serialize({'simplify': '-1'})['coordinates'] == self.square
+
+    def test_simplified(self):
+        assert self.serialize({'simplify': '0.1'})['coordinates'] == [[[0, 0], [2, 0], [2, 2], [0, 2], [0, 0]]]
+        assert self.serialize({'precision': '1'})['coordinates'] == [
+            [[0, 0], [1.0, 0.0], [2, 0], [2, 2], [0, 2], [0, 0]]
+        ]
+
+    def test_disabled(self):
+        field = GeoJSONField('Polygon', precision_param='precision')
+        field.bind('poly_field', SimplifiedSerializer(context={'request': Request(APIRequestFactory().get('/?simplify=1'))}))
+        assert field.get_output_options() == (None, None)
+
+        request = Request(APIRequestFactory().get('/', {'simplify': '0.1'}))
+        assert PlainPolySerializer(self.doc, context={'request': request}).data['poly_field']['coordinates'] == self.square
+
+    def test_fragments(self):
+        cache.clear()
+
+        def serialize(query):
+            request = Request(APIRequestFactory().get('/', query))
+            request.accepted_renderer = FragmentJSONRenderer()
+            serializer = FragmentSimplifiedSerializer([self.doc], many=True, context={'request': request})
+            return [json.loads(item.decode())['poly_field']['coordinates'] for item in serializer.data]
+
+        assert serialize({'simplify': '0.1'}) == [[[[0, 0], [2, 0], [2, 2], [0, 2], [0, 0]]]]
+        assert serialize({}) == [self.square]
+
+    def test_quantized(self):
+        field = GeoJSONField('Polygon', simplify_param='simplify')
+        field.bind('poly_field', SimplifiedSerializer(context={'request': Request(APIRequestFactory().get('/?simplify=0.1'))}))
+        assert field.get_output_options() == (0.0625, None)
+        with patch.object(geo, 'simplify_geometry', wraps=geo.simplify_geometry) as simplify:
+            for tolerance in ('0.07', '0.1', '0.12'):
+                self.serialize({'simplify': tolerance})
+        assert simplify.call_count == 1
+
+    def test_max_size(self):
+        values = DerivedValues(max_size=3)
+        other = SimplifiedDoc.objects.create(poly_field=self.square)
+        for key in range(3):
+            values.get(self.doc, key, lambda: key, 60)
+        values.get(other, 0, lambda: 'other', 60)
+        # values of least recently used document are dropped
+        assert values.get(self.doc, 0, lambda: 'computed', 60) == 'computed'
+        assert values.get(other, 0, lambda: 'computed', 60) == 'other'
+        assert values._size == 2
+
+    def test_cached(self):
+        with patch.object(geo, 'simplify_geometry', wraps=geo.simplify_geometry) as simplify:
+            self.serialize({'simplify': '0.1'})
+            self.serialize({'simplify': '0.1'})
+            assert simplify.call_count == 1
+            self.serialize({'simplify': '0.2'})
+            assert simplify.call_count == 2
+
+            self.doc.poly_field = [[[0, 0], [3, 0], [3, 3], [0, 0]]]
+            self.doc.save()
+            assert self.serialize({'simplify': '0.1'})['coordinates'] == [[[0, 0], [3, 0], [3, 3], [0, 0]]]
+            assert simplify.call_count == 3
@@ -0,0 +1,138 @@
+from __future__ import unicode_literals
+
+from django.test import TestCase
+from mock import patch
+from mongoengine import Document, EmbeddedDocument, fields
+from mongoengine.queryset import QuerySet
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+
+from rest_framework_mongoengine.mixins import ListItemsModelMixin
+from rest_framework_mongoengine.routers import SimpleRouter
+from rest_framework_mongoengine.serializers import DocumentSerializer
+from rest_framework_mongoengine.viewsets import ReadOnlyModelViewSet
+
+
+class ItemComment(EmbeddedDocument):
+    text = fields.StringField()
+
+
+class ItemsDoc(Document):
+    title = fields.StringField()
+    comments = fields.EmbeddedDocumentListField(ItemComment)
+    tags = fields.ListField(fields.StringField())
+
+
+class ItemsSerializer(DocumentSerializer):
+    class Meta:
+        model = ItemsDoc
+        fields = '__all__'
+        list_limits = {'comments': 3, 'tags': 2}
+
+
+class ItemsViewSet(ListItemsModelMixin, ReadOnlyModelViewSet):
+    queryset = ItemsDoc.objects
+    serializer_class = ItemsSerializer
+
+
+class CollatedItemsViewSet(ItemsViewSet):
+    lookup_field = 'title'
+    lookup_collation = {'locale': 'en', 'strength': 2}
+
+
+class TestListLimits(TestCase):
+    def setUp(self):
+        self.doc = ItemsDoc.objects.create(
+            title='title', comments=[ItemComment(text=str(i)) for i in range(10)], tags=['a', 'b', 'c']
+        )
+
+    def doCleanups(self):
+        ItemsDoc.drop_collection()
+
+    def get_queryset(self, **params):
+        view = ItemsViewSet(action_map={'get': 'retrieve'})
+        view.request = view.initialize_request(APIRequestFactory().get('/', params))
+        view.format_kwarg = None
+        return view.get_queryset()
+
+    def test_limits(self):
+        assert ItemsSerializer().get_list_limits() == {'comments': 3, 'tags': 2}
+        assert ItemsSerializer(only=['title', 'tags']).get_list_limits() == {'tags': 2}
+
+    def test_projection(self):
+        queryset = self.get_queryset()
+        assert queryset._loaded_fields.as_dict() == {'comments': {'$slice': 3}, 'tags': {'$slice': 2}}
+        doc = queryset.get()
+        assert [comment.text for comment in doc.comments] == ['0', '1', '2']
+        assert doc.tags == ['a', 'b']
+
+        queryset = self.get_queryset(fields='title,tags')
+        assert queryset._loaded_fields.as_dict() == {'title': 1, 'tags': {'$slice': 2}}
+
+    def test_retrieve(self):
+        view = ItemsViewSet.as_view({'get': 'retrieve'})
+        response = view(APIRequestFactory().get('/'), id=str(self.doc.pk))
+        assert response.data['comments'] == [{'text': '0'}, {'text': '1'}, {'text': '2'}]
+        assert response.data['tags'] == ['a', 'b']
+
+
+class TestListItems(TestCase):
+    def setUp(self):
+        self.doc = ItemsDoc.objects.create(
+            title='title', comments=[ItemComment(text=str(i)) for i in range(10)], tags=['a', 'b', 'c']
+        )
+
+    def doCleanups(self):
+        ItemsDoc.drop_collection()
+
+    def get_items(self, field, query=None, pk=None):
+        view = ItemsViewSet.as_view({'get': 'list_items'})
+        return view(APIRequestFactory().get('/', query or {}), id=pk or str(self.doc.pk), items_field=field)
+
+    def test_route(self):
+        router = SimpleRouter()
+        router.register('items', ItemsViewSet)
+        assert 'itemsdoc-list-items' in set(route.name for route in router.urls)
+
+    def test_first_page(self):
+        response = self.get_items('comments')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['count'] == 10
+        assert response.data['results'] == [{'text': '0'}, {'text': '1'}, {'text': '2'}]
+        assert response.data['previous'] is None
+        assert 'offset=3' in response.data['next']
+
+    def test_page(self):
+        response = self.get_items('comments', {'offset': 8, 'limit': 5})
+        assert response.data['count'] == 10
+        assert response.data['results'] == [{'text': '8'}, {'text': '9'}]
+        assert response.data['next'] is None
+        assert 'offset=3' in response.data['previous']
+
+    def test_primitive(self):
+        response = self.get_items('tags', {'offset': 1})
+        assert response.data == {'count': 3, 'next': None, 'previous': response.data['previous'], 'results': ['b', 'c']}
+
+    def test_empty(self):
+        doc = ItemsDoc.objects.create(title='empty')
+        response = self.get_items('tags', pk=str(doc.pk))
+        assert response.data['count'] == 0
+        assert response.data['results'] == []
+
+    def test_not_limited(self):
+        assert self.get_items('title').status_code == status.HTTP_404_NOT_FOUND
+
+    def test_missing(self):
+        assert self.get_items('tags', pk='0123456789abcdef01234567').status_code == status.HTTP_404_NOT_FOUND
+
+    def test_invalid(self):
+        response = self.get_items('tags', {'limit': 0})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'limit' in response.data
+
+    def test_collation(self):
+        view = CollatedItemsViewSet.as_view({'get': 'list_items'})
+        with patch.object(QuerySet, 'aggregate', autospec=True, side_effect=QuerySet.aggregate) as aggregate:
+            response = view(APIRequestFactory().get('/'), title='title', items_field='tags')
+        assert response.data['results'] == ['a', 'b']
+        assert aggregate.call_args[1] == {'collation': {'locale': 'en', 'strength': 2}}
@@ -0,0 +1,198 @@
+from __future__ import unicode_literals
+
+from bson import DBRef
+from django.test import TestCase
+from mongoengine import Document, fields
+from rest_framework import status
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.test import APIRequestFactory
+
+from rest_framework_mongoengine import generics
+from rest_framework_mongoengine.filters import LookupFilterBackend
+from rest_framework_mongoengine.lookups import (
+    LookupQuerySet, get_lookups, get_pipeline
+)
+from rest_framework_mongoengine.serializers import DocumentSerializer
+
+
+class LookupLeaf(Document):
+    title = fields.StringField()
+
+
+class LookupBranch(Document):
+    name = fields.StringField()
+    leaf = fields.ReferenceField(LookupLeaf)
+    notes = fields.StringField()
+
+
+class LookupRoot(Document):
+    name = fields.StringField()
+    branch = fields.ReferenceField(LookupBranch)
+    branches = fields.ListField(fields.ReferenceField(LookupBranch))
+    legacy = fields.ReferenceField(LookupBranch, dbref=True)
+    meta = {'ordering': ['name']}
+
+
+class LookupBranchSerializer(DocumentSerializer):
+    class Meta:
+        model = LookupBranch
+        fields = ('id', 'name', 'leaf')
+        depth = 1
+
+
+class LookupRootSerializer(DocumentSerializer):
+    branch = LookupBranchSerializer(read_only=True)
+
+    class Meta:
+        model = LookupRoot
+        fields = ('id', 'name', 'branch', 'branches', 'legacy')
+        depth = 1
+
+
+class LookupView(generics.ListAPIView):
+    queryset = LookupRoot.objects
+    serializer_class = LookupRootSerializer
+    filter_backends = [LookupFilterBackend]
+    pagination_class = LimitOffsetPagination
+
+
+class LookupDetailView(generics.RetrieveAPIView):
+    queryset = LookupRoot.objects
+    serializer_class = LookupRootSerializer
+    filter_backends = [LookupFilterBackend]
+
+
+class TestLookups(TestCase):
+    def test_lookups(self):
+        lookups = get_lookups(LookupRootSerializer(), LookupRoot)
+        assert [(lookup.name, lookup.local_field, lookup.alias, lookup.many) for lookup in lookups] == [
+            ('branch', 'branch', '_lookup_branch', False),
+            ('branches', 'branches', '_lookup_branches', True),
+        ]
+        assert lookups[0].model is LookupBranch
+        assert lookups[0].fields == ['_id', 'name', 'leaf']
+        assert lookups[1].fields == ['_id', 'name', 'notes', 'leaf']
+
+        child = lookups[0].children[0]
+        assert (child.name, child.local_field, child.alias) == ('leaf', '_lookup_branch.leaf', '_lookup_branch__leaf')
+        assert child.fields == ['_id', 'title']
+        assert lookups[1].children == []
+
+    def test_pipeline(self):
+        pipeline = get_pipeline(get_lookups(LookupRootSerializer(), LookupRoot), LookupRoot)
+        assert [stage['$lookup']['as'] for stage in pipeline[:-1]] == [
+            '_lookup_branch', '_lookup_branch__leaf', '_lookup_branches'
+        ]
+        assert pipeline[1]['$lookup'] == {
+            'from': 'lookup_leaf', 'localField': '_lookup_branch.leaf', 'foreignField': '_id', 'as': '_lookup_branch__leaf'
+        }
+        assert pipeline[-1] == {'$project': {
+            '_lookup_branch._id': 1, '_lookup_branch.name': 1, '_lookup_branch.leaf': 1,
+            '_lookup_branch__leaf._id': 1, '_lookup_branch__leaf.title': 1,
+            '_lookup_branches._id': 1, '_lookup_branches.name': 1, '_lookup_branches.leaf': 1, '_lookup_branches.notes': 1,
+            '_id': 1, 'name': 1, 'branch': 1, 'branches': 1, 'legacy': 1,
+        }}
+
+
+class TestLookupQuerySet(TestCase):
+    def setUp(self):
+        self.leaf = LookupLeaf.objects.create(title='leaf')
+        self.branches = [
+            LookupBranch.objects.create(name='branch%d' % i, leaf=self.leaf, notes='notes') for i in range(2)
+        ]
+        self.roots = [
+            LookupRoot.objects.create(
+                name='root%d' % i, branch=self.branches[i], legacy=self.branches[i],
+                branches=[self.branches[1], self.branches[0], self.branches[1]]
+            ) for i in range(2)
+        ]
+
+    def doCleanups(self):
+        LookupLeaf.drop_collection()
+        LookupBranch.drop_collection()
+        LookupRoot.drop_collection()
+
+    def get_queryset(self, queryset=None):
+        return LookupQuerySet(LookupRoot.objects if queryset is None else queryset, get_lookups(LookupRootSerializer(), LookupRoot))
+
+    def test_joined(self):
+        roots = list(self.get_queryset())
+        assert [root.name for root in roots] == ['root0', 'root1']
+        branch = roots[0]._data['branch']
+        assert isinstance(branch, LookupBranch)
+        assert branch.name == 'branch0'
+        # projected to fields of nested serializer
+        assert branch.notes is None
+        assert [item.name for item in roots[0]._data['branches']] == ['branch1', 'branch0', 'branch1']
+        assert all(item.notes == 'notes' for item in roots[0]._data['branches'])
+        # references with dbref are not joined
+        assert isinstance(roots[0]._data['legacy'], DBRef)
+        assert roots[0]._changed_fields == []
+
+    def test_missing(self):
+        LookupRoot.objects(name='root0').update(set__branch=self.leaf.pk)
+        root = self.get_queryset().get(name='root0')
+        assert isinstance(root._data['branch'], DBRef)
+
+    def test_slice(self):
+        queryset = self.get_queryset()
+        assert queryset.count() == 2
+        assert [root.name for root in queryset[1:]] == ['root1']
+        assert queryset.order_by('-name')[0].name == 'root1'
+        assert len(queryset.filter(name='root0')) == 1
+
+    def test_get(self):
+        queryset = self.get_queryset()
+        root = queryset.get(pk=self.roots[1].pk)
+        assert root._data['branch'].name == 'branch1'
+        with self.assertRaises(LookupRoot.DoesNotExist):
+            queryset.get(name='other')
+        with self.assertRaises(LookupRoot.MultipleObjectsReturned):
+            queryset.get(branches=self.branches[0])
+
+    def test_not_aggregatable(self):
+        queryset = self.get_queryset(LookupRoot.objects(__raw__={'$where': 'this.name == "root0"'}))
+        assert not queryset.is_aggregatable()
+        assert not self.get_queryset(LookupRoot.objects.only('name')).is_aggregatable()
+        assert self.get_queryset().is_aggregatable()
+
+
+class TestLookupViews(TestCase):
+    def setUp(self):
+        leaf = LookupLeaf.objects.create(title='leaf')
+        branch = LookupBranch.objects.create(name='branch', leaf=leaf, notes='notes')
+        self.root = LookupRoot.objects.create(name='root', branch=branch, branches=[branch], legacy=branch)
+        LookupRoot.objects.create(name='other')
+        self.expected = {
+            'id': str(self.root.pk),
+            'name': 'root',
+            'branch': {'id': str(branch.pk), 'name': 'branch', 'leaf': {'id': str(leaf.pk), 'title': 'leaf'}},
+            'branches': [{'id': str(branch.pk), 'name': 'branch', 'leaf': str(leaf.pk), 'notes': 'notes'}],
+            'legacy': {'id': str(branch.pk), 'name': 'branch', 'leaf': str(leaf.pk), 'notes': 'notes'},
+        }
+
+    def doCleanups(self):
+        LookupLeaf.drop_collection()
+        LookupBranch.drop_collection()
+        LookupRoot.drop_collection()
+
+    def test_list(self):
+        request = APIRequestFactory().get('/', {'limit': 1, 'offset': 1})
+        response = LookupView.as_view()(request)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['count'] == 2
+        assert response.data['results'] == [self.expected]
+
+    def test_retrieve(self):
+        request = APIRequestFactory().get('/')
+        response = LookupDetailView.as_view()(request, id=str(self.root.pk))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == self.expected
+
+    def test_unsafe(self):
+        request = APIRequestFactory().post('/')
+        view = LookupView()
+        view.request = view.initialize_request(request)
+        view.format_kwarg = None
+        queryset = LookupFilterBackend().filter_queryset(view.request, LookupRoot.objects, view)
+        assert not isinstance(queryset, LookupQuerySet)
@@ -0,0 +1,92 @@
+from __future__ import unicode_literals
+
+from django.test import TestCase
+from mongoengine import Document, EmbeddedDocument, fields
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+
+from rest_framework_mongoengine.serializers import DocumentSerializer
+from rest_framework_mongoengine.viewsets import ModelViewSet
+
+
+class ProfiledComment(EmbeddedDocument):
+    text = fields.StringField()
+    votes = fields.IntField()
+
+
+class ProfiledDoc(Document):
+    title = fields.StringField()
+    body = fields.StringField()
+    comments = fields.EmbeddedDocumentListField(ProfiledComment)
+
+
+class ProfiledSerializer(DocumentSerializer):
+    class Meta:
+        model = ProfiledDoc
+        fields = '__all__'
+        profiles = {
+            'list': ('id', 'title', 'comments.text'),
+            'detail': '__all__',
+            'export': ('title', 'body'),
+        }
+
+
+class ProfiledViewSet(ModelViewSet):
+    queryset = ProfiledDoc.objects
+    serializer_class = ProfiledSerializer
+
+
+class ExportViewSet(ProfiledViewSet):
+    action_profiles = {'list': 'export'}
+
+
+class TestProfiles(TestCase):
+    def setUp(self):
+        self.doc = ProfiledDoc.objects.create(title='title', body='body', comments=[ProfiledComment(text='text', votes=1)])
+
+    def doCleanups(self):
+        ProfiledDoc.drop_collection()
+
+    def test_profile(self):
+        data = ProfiledSerializer(self.doc, profile='list').data
+        assert data == {'id': str(self.doc.pk), 'title': 'title', 'comments': [{'text': 'text'}]}
+        assert set(ProfiledSerializer(self.doc, profile='detail').data) == {'id', 'title', 'body', 'comments'}
+
+    def test_narrowed(self):
+        serializer = ProfiledSerializer(self.doc, profile='list', only=['title', 'body', 'comments'])
+        assert serializer.data == {'title': 'title', 'comments': [{'text': 'text'}]}
+        assert serializer.get_projection() == (['title', 'comments.text'], None)
+
+    def test_undefined(self):
+        with self.assertRaises(AssertionError):
+            ProfiledSerializer(self.doc, profile='other').data
+
+    def test_list(self):
+        response = ProfiledViewSet.as_view({'get': 'list'})(APIRequestFactory().get('/'))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == [{'id': str(self.doc.pk), 'title': 'title', 'comments': [{'text': 'text'}]}]
+
+    def test_retrieve(self):
+        response = ProfiledViewSet.as_view({'get': 'retrieve'})(APIRequestFactory().get('/'), id=str(self.doc.pk))
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.data) == {'id', 'title', 'body', 'comments'}
+
+    def test_action_profiles(self):
+        response = ExportViewSet.as_view({'get': 'list'})(APIRequestFactory().get('/', {'fields': 'body,comments'}))
+        assert response.data == [{'body': 'body'}]
+
+    def test_projection(self):
+        view = ProfiledViewSet(action_map={'get': 'list'})
+        view.request = view.initialize_request(APIRequestFactory().get('/'))
+        view.format_kwarg = None
+        assert view.get_queryset()._loaded_fields.as_dict() == {'_id': 1, 'title': 1, 'comments.text': 1}
+
+        view.action = 'update'
+        assert view.get_serializer_profile() is None
+        assert not view.get_queryset()._loaded_fields
+
+    def test_write(self):
+        view = ProfiledViewSet.as_view({'put': 'update'})
+        response = view(APIRequestFactory().put('/', {'title': 'new', 'body': 'new'}, format='json'), id=str(self.doc.pk))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['body'] == 'new'
@@ -1,8 +1,12 @@
 from collections import OrderedDict
 
-from bson import DBRef
+from bson import DBRef, ObjectId
 from django.test import TestCase
+from mock import patch
 from mongoengine import Document, fields
+from mongoengine.errors import BulkWriteError
+from mongoengine.queryset import QuerySet
+from rest_framework.exceptions import ValidationError
 from rest_framework.fields import IntegerField
 from rest_framework.serializers import Serializer
 
@@ -11,7 +15,7 @@ from rest_framework_mongoengine.fields import (
 )
 from rest_framework_mongoengine.serializers import DocumentSerializer
 
-from .utils import dedent
+from .utils import assert_num_queries, dedent
 
 
 class ReferencedDoc(Document):
@@ -62,6 +66,10 @@ class GenericReferencingDoc(Document):
     ref = fields.GenericReferenceField()
 
 
+class GenericListReferencingDoc(Document):
+    refs = fields.ListField(fields.GenericReferenceField())
+
+
 class ReferencedSerializer(DocumentSerializer):
     class Meta:
         model = ReferencedDoc
@@ -72,6 +80,13 @@ class ListReferencingModel(Document):
     refs = fields.ListField(ReferenceField(ReferencedDoc))
 
 
+class FlatReferencingDoc(Document):
+    ref = fields.ReferenceField(ReferencedDoc)
+    refs = fields.ListField(fields.ReferenceField(ReferencedDoc))
+    generic = fields.GenericReferenceField()
+    generics = fields.ListField(fields.GenericReferenceField())
+
+
 class RecursiveReferencingDoc(Document):
     ref = fields.ReferenceField('self')
 
@@ -703,6 +718,111 @@ class TestGenericReferenceIntegration(TestCase):
         assert serializer.data == expected
 
 
+class TestGenericReferenceListIntegration(TestCase):
+    def setUp(self):
+        self.targets = [ReferencedDoc.objects.create(name=name) for name in ('foo', 'bar')]
+        self.other = OtherReferencedDoc.objects.create(name='baz')
+
+    def doCleanups(self):
+        ReferencedDoc.drop_collection()
+        OtherReferencedDoc.drop_collection()
+        GenericListReferencingDoc.drop_collection()
+
+    def get_serializer(self, data):
+        class TestSerializer(DocumentSerializer):
+            class Meta:
+                model = GenericListReferencingDoc
+                fields = '__all__'
+
+        return TestSerializer(data=data)
+
+    def test_batched(self):
+        refs = [
+            {'_cls': 'ReferencedDoc', '_id': str(self.targets[1].id)},
+            {'_cls': 'OtherReferencedDoc', '_id': str(self.other.id)},
+            {'_cls': 'ReferencedDoc', '_id': str(self.targets[0].id)},
+            {'_cls': 'ReferencedDoc', '_id': str(self.targets[1].id)},
+        ]
+        serializer = self.get_serializer({'refs': refs})
+        with patch.object(QuerySet, 'in_bulk', autospec=True, side_effect=QuerySet.in_bulk) as in_bulk:
+            with patch.object(QuerySet, 'get', side_effect=AssertionError):
+                assert serializer.is_valid(), serializer.errors
+        assert in_bulk.call_count == 2
+        assert serializer.validated_data['refs'] == [self.targets[1], self.other, self.targets[0], self.targets[1]]
+
+        instance = serializer.save()
+        assert serializer.data['refs'] == refs
+        assert GenericListReferencingDoc.objects.get(id=instance.id).refs == serializer.validated_data['refs']
+
+    def test_errors(self):
+        missing = str(ObjectId())
+        refs = [
+            {'_cls': 'ReferencedDoc', '_id': missing},
+            {'_cls': 'ReferencedDoc', '_id': str(self.targets[0].id)},
+            {'_cls': 'NoSuchDoc', '_id': missing},
+            {'_cls': 'OtherReferencedDoc', '_id': 'xxx'},
+            {'_cls': 'OtherReferencedDoc', '_id': missing},
+        ]
+        serializer = self.get_serializer({'refs': refs})
+        assert not serializer.is_valid()
+        assert serializer.errors == {'refs': {
+            0: ['Document with id=%s does not exist.' % missing],
+            2: ['Document `NoSuchDoc` has not been defined.'],
+            3: ['Cannot parse "\'xxx\'" as ObjectIdField.'],
+            4: ['Document with id=%s does not exist.' % missing],
+        }}
+
+
+class FlatReferencingSerializer(DocumentSerializer):
+    class Meta:
+        model = FlatReferencingDoc
+        fields = '__all__'
+
+
+class TestFlatReferenceRepresentation(TestCase):
+    def setUp(self):
+        self.target = ReferencedDoc.objects.create(name='foo')
+        self.other = OtherReferencedDoc.objects.create(name='bar')
+        FlatReferencingDoc.objects.create(
+            ref=self.target, refs=[self.target, self.target],
+            generic=self.other, generics=[self.target, self.other]
+        )
+        self.expected = {
+            'ref': str(self.target.id),
+            'refs': [str(self.target.id), str(self.target.id)],
+            'generic': {'_cls': 'OtherReferencedDoc', '_id': str(self.other.id)},
+            'generics': [
+                {'_cls': 'ReferencedDoc', '_id': str(self.target.id)},
+                {'_cls': 'OtherReferencedDoc', '_id': str(self.other.id)},
+            ],
+        }
+
+    def doCleanups(self):
+        ReferencedDoc.drop_collection()
+        OtherReferencedDoc.drop_collection()
+        FlatReferencingDoc.drop_collection()
+
+    def test_not_dereferenced(self):
+        instance = FlatReferencingDoc.objects.get()
+        with patch('mongoengine.dereference.DeReference.__call__', side_effect=AssertionError):
+            with patch.object(ReferencedDoc, '_get_db', side_effect=AssertionError):
+                data = FlatReferencingSerializer(instance).data
+        assert dict(data, id=None) == dict(self.expected, id=None)
+
+    def test_query_count(self):
+        queryset = FlatReferencingDoc.objects.all()
+        with assert_num_queries(1):
+            data = FlatReferencingSerializer(queryset, many=True).data
+        assert dict(data[0], id=None) == dict(self.expected, id=None)
+
+    def test_assigned(self):
+        instance = FlatReferencingDoc(ref=self.target, refs=[self.target], generic=self.other, generics=[self.other])
+        data = FlatReferencingSerializer(instance).data
+        assert data['ref'] == str(self.target.id)
+        assert data['refs'] == [str(self.target.id)]
+        assert data['generics'] == [{'_cls': 'OtherReferencedDoc', '_id': str(self.other.id)}]
+
+
 class ComboReferencingSerializer(DocumentSerializer):
     class Meta:
         model = ReferencingDoc
@@ -759,6 +879,30 @@ class TestComboReferenceIntegration(TestCase):
         }
         assert serializer.data == expected
 
+    def test_retrieval_deep_list(self):
+        other = ReferencedDoc.objects.create(name='Bar')
+        for target in (self.target, other, self.target):
+            ReferencingDoc.objects.create(ref=target)
+
+        class TestSerializer(DocumentSerializer):
+            class Meta:
+                model = ReferencingDoc
+                fields = '__all__'
+                depth = 1
+
+            ref = ComboReferenceField(serializer=ReferencedSerializer)
+
+        serializer = TestSerializer(ReferencingDoc.objects.order_by('id'), many=True)
+        with patch.object(QuerySet, 'in_bulk', autospec=True, side_effect=QuerySet.in_bulk) as in_bulk:
+            with patch.object(ReferencedDoc, '_get_db', side_effect=AssertionError):
+                with patch.object(ComboReferenceField, 'get_depth', wraps=ComboReferenceField.get_depth) as get_depth:
+                    data = serializer.data
+        assert in_bulk.call_count == 1
+        assert get_depth.call_count == 1
+        assert [item['ref'] for item in data] == [
+            {'id': str(target.id), 'name': target.name} for target in (self.target, other, self.target)
+        ]
+
     def test_create_ref(self):
         new_target = ReferencedDoc.objects.create(name="Bar")
         data = {'ref': new_target.id}
@@ -832,6 +976,122 @@ class TestComboReferenceIntegration(TestCase):
         assert serializer.data == expected
 
 
+class BulkComboReferencingSerializer(DocumentSerializer):
+    class Meta:
+        model = ReferencingDoc
+        fields = '__all__'
+        bulk_insert = True
+
+    ref = ComboReferenceField(serializer=ReferencedSerializer)
+
+
+class UniqueReferencingDoc(Document):
+    name = fields.StringField(unique=True)
+    ref = fields.ReferenceField(ReferencedDocWithUniqueField)
+
+
+class IndexUniqueReferencedSerializer(DocumentSerializer):
+    class Meta:
+        model = ReferencedDocWithUniqueField
+        fields = '__all__'
+        unique_validation = 'index'
+
+
+class BulkUniqueReferencingSerializer(DocumentSerializer):
+    class Meta:
+        model = UniqueReferencingDoc
+        fields = '__all__'
+        bulk_insert = True
+        unique_validation = 'index'
+
+    ref = ComboReferenceField(serializer=IndexUniqueReferencedSerializer)
+
+
+class TestComboReferenceBulkInsertErrors(TestCase):
+    def setUp(self):
+        ReferencedDocWithUniqueField.objects.create(name='existing')
+        UniqueReferencingDoc.objects.create(name='existing')
+
+    def doCleanups(self):
+        ReferencedDocWithUniqueField.drop_collection()
+        UniqueReferencingDoc.drop_collection()
+
+    def save(self, data):
+        serializer = BulkUniqueReferencingSerializer(data=data, many=True)
+        assert serializer.is_valid(), serializer.errors
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.save()
+        return ctx.exception.detail
+
+    def test_duplicate(self):
+        errors = self.save([
+            {'name': 'a', 'ref': {'name': 'a'}},
+            {'name': 'existing', 'ref': {'name': 'b'}},
+            {'name': 'c', 'ref': {'name': 'c'}},
+        ])
+        assert errors == [{}, {'non_field_errors': ['Document violates a unique constraint.']}, {}]
+        # referenced documents and the preceding document are deleted
+        assert [doc.name for doc in ReferencedDocWithUniqueField.objects] == ['existing']
+        assert [doc.name for doc in UniqueReferencingDoc.objects] == ['existing']
+
+    def test_duplicate_referenced(self):
+        errors = self.save([
+            {'name': 'a', 'ref': {'name': 'a'}},
+            {'name': 'b', 'ref': {'name': 'existing'}},
+        ])
+        assert errors == [{}, {'ref': {'non_field_errors': ['Document violates a unique constraint.']}}]
+        assert [doc.name for doc in ReferencedDocWithUniqueField.objects] == ['existing']
+        assert UniqueReferencingDoc.objects.count() == 1
+
+    def test_other_errors(self):
+        serializer = BulkUniqueReferencingSerializer(data=[{'name': 'a', 'ref': {'name': 'a'}}], many=True)
+        assert serializer.is_valid(), serializer.errors
+        error = BulkWriteError('Bulk write error')
+        with patch.object(QuerySet, 'insert', side_effect=[None, error]):
+            with self.assertRaises(BulkWriteError):
+                serializer.save()
+
+
+class TestComboReferenceBulkInsert(TestCase):
+    def setUp(self):
+        self.target = ReferencedDoc.objects.create(name='Foo')
+
+    def doCleanups(self):
+        ReferencedDoc.drop_collection()
+        ReferencingDoc.drop_collection()
+
+    def test_create(self):
+        data = [{'ref': {'name': 'Bar'}}, {'ref': str(self.target.id)}, {'ref': {'name': 'Baz'}}]
+        serializer = BulkComboReferencingSerializer(data=data, many=True)
+        with patch.object(ReferencedSerializer, 'is_valid', side_effect=AssertionError):
+            assert serializer.is_valid(), serializer.errors
+
+        with patch.object(QuerySet, 'insert', autospec=True, side_effect=QuerySet.insert) as insert:
+            with patch.object(Document, 'save', side_effect=AssertionError):
+                instances = serializer.save()
+        assert insert.call_count == 2
+
+        names = [ReferencingDoc.objects.get(id=instance.id).ref.name for instance in instances]
+        assert names == ['Bar', 'Foo', 'Baz']
+        assert ReferencedDoc.objects.count() == 3
+        assert [item['ref'] for item in serializer.data] == [str(instance.ref.id) for instance in instances]
+
+        instances[0].ref.name = 'Qux'
+        instances[0].ref.save()
+        assert ReferencedDoc.objects.count() == 3
+
+    def test_errors(self):
+        data = [{'ref': {'name': 'Bar'}}, {'ref': {'name': {'x': 1}}}, {'ref': 'xxx'}]
+        serializer = BulkComboReferencingSerializer(data=data, many=True)
+        assert not serializer.is_valid()
+        assert serializer.errors == [
+            {},
+            {'ref': {'name': ['Not a valid string.']}},
+            {'ref': ['Cannot parse "xxx" as ObjectIdField.']},
+        ]
+        assert serializer.child.fields['ref'].inline_documents is None
+
+
 class TestReferenceCustomPk(TestCase):
     """Operational test
 
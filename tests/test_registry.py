@@ -0,0 +1,79 @@
+from __future__ import unicode_literals
+
+import pytest
+from bson import DBRef, ObjectId
+from django.test import TestCase
+from mock import patch
+from mongoengine import Document, EmbeddedDocument, fields
+from mongoengine.errors import NotRegistered
+from rest_framework.exceptions import ValidationError
+
+from rest_framework_mongoengine.fields import (
+    GenericField, GenericReferenceField
+)
+from rest_framework_mongoengine.registry import (
+    document_index, get_collection_document, get_document_class
+)
+
+
+class IndexedDoc(Document):
+    meta = {'collection': 'indexed_docs'}
+    name = fields.StringField()
+
+
+class IndexedEmbeddedBase(EmbeddedDocument):
+    meta = {'allow_inheritance': True}
+    name = fields.StringField()
+
+
+class IndexedEmbedded(IndexedEmbeddedBase):
+    pass
+
+
+class TestDocumentIndex(TestCase):
+    def test_collection(self):
+        assert get_collection_document('indexed_docs') == 'IndexedDoc'
+        assert get_collection_document('no_such_collection') is None
+
+    def test_no_scan(self):
+        get_collection_document('indexed_docs')
+        with patch.object(Document, '_get_collection_name', side_effect=AssertionError) as scan:
+            with patch.object(IndexedDoc, '_get_collection_name', return_value='indexed_docs'):
+                assert get_collection_document('indexed_docs') == 'IndexedDoc'
+            assert not scan.called
+
+    def test_registered_later(self):
+        get_collection_document('indexed_docs')
+
+        class LaterIndexedDoc(Document):
+            meta = {'collection': 'later_indexed_docs'}
+
+        assert get_collection_document('later_indexed_docs') == 'LaterIndexedDoc'
+
+    def test_redefined(self):
+        document_index.rebuild()
+        with patch.object(IndexedDoc, '_get_collection_name', return_value='renamed_docs'):
+            assert get_collection_document('indexed_docs') is None
+            assert get_collection_document('renamed_docs') == 'IndexedDoc'
+        document_index.rebuild()
+
+    def test_document_class(self):
+        assert get_document_class('IndexedDoc') is IndexedDoc
+        assert get_document_class('IndexedEmbeddedBase.IndexedEmbedded') is IndexedEmbedded
+        assert get_document_class('IndexedEmbedded') is IndexedEmbedded
+        with pytest.raises(NotRegistered):
+            get_document_class('NoSuchDoc')
+
+    def test_generic_field(self):
+        field = GenericField()
+        value = field.to_internal_value({'embedded': {'_cls': 'IndexedEmbedded', 'name': 'foo'}})
+        assert isinstance(value['embedded'], IndexedEmbedded)
+        assert field.to_representation(value) == {'embedded': {'_cls': 'IndexedEmbedded', 'name': 'foo'}}
+
+    def test_dbref(self):
+        field = GenericReferenceField()
+        pk = ObjectId()
+        assert field.to_representation(DBRef('indexed_docs', pk)) == {'_cls': 'IndexedDoc', '_id': str(pk)}
+        with pytest.raises(ValidationError) as exc:
+            field.to_representation(DBRef('no_such_collection', pk))
+        assert exc.value.detail == ['No document defined for collection `no_such_collection`.']
@@ -0,0 +1,149 @@
+from __future__ import unicode_literals
+
+from django.test import TestCase
+from mongoengine import Document, EmbeddedDocument, fields
+from rest_framework import serializers, status
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from rest_framework_mongoengine import generics
+from rest_framework_mongoengine.serializers import (
+    DocumentSerializer, FragmentListSerializer
+)
+
+
+class SelectedComment(EmbeddedDocument):
+    text = fields.StringField()
+    votes = fields.IntField()
+
+
+class SelectedPost(Document):
+    title = fields.StringField()
+    body = fields.StringField()
+    stamp = fields.IntField()
+    comments = fields.EmbeddedDocumentListField(SelectedComment)
+
+
+class SelectedPostSerializer(DocumentSerializer):
+    class Meta:
+        model = SelectedPost
+        fields = '__all__'
+
+
+class SummarySerializer(DocumentSerializer):
+    summary = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SelectedPost
+        fields = ('id', 'title', 'summary')
+
+    def get_summary(self, obj):
+        return obj.body[:4]
+
+
+class FragmentPostSerializer(DocumentSerializer):
+    class Meta:
+        model = SelectedPost
+        fields = '__all__'
+        list_serializer_class = FragmentListSerializer
+
+
+class SelectedPostView(generics.ListAPIView):
+    queryset = SelectedPost.objects
+    serializer_class = SelectedPostSerializer
+    stamp_field = 'stamp'
+
+
+def get_context(method='get', **params):
+    request = getattr(APIRequestFactory(), method)('/?' + '&'.join('%s=%s' % item for item in params.items()))
+    return {'request': Request(request)}
+
+
+class TestSelection(TestCase):
+    def setUp(self):
+        self.post = SelectedPost.objects.create(
+            title='title', body='body text', stamp=1,
+            comments=[SelectedComment(text='comment', votes=1)]
+        )
+
+    def doCleanups(self):
+        SelectedPost.drop_collection()
+
+    def test_fields(self):
+        data = SelectedPostSerializer(self.post, context=get_context(fields='id,title')).data
+        assert data == {'id': str(self.post.pk), 'title': 'title'}
+
+    def test_nested(self):
+        serializer = SelectedPostSerializer(self.post, context=get_context(fields='title,comments.text'))
+        assert serializer.data == {'title': 'title', 'comments': [{'text': 'comment'}]}
+        assert serializer.get_projection() == (['title', 'comments.text'], None)
+
+    def test_omit(self):
+        serializer = SelectedPostSerializer(self.post, context=get_context(omit='body,stamp,comments.votes,other'))
+        assert serializer.data == {'id': str(self.post.pk), 'title': 'title', 'comments': [{'text': 'comment'}]}
+        assert serializer.get_projection() == (None, ['body', 'comments.votes', 'stamp'])
+
+    def test_unknown_source(self):
+        serializer = SummarySerializer(self.post, context=get_context(fields='title,summary'))
+        assert serializer.data == {'title': 'title', 'summary': 'body'}
+        assert serializer.get_projection() == (None, None)
+        serializer = SummarySerializer(self.post, context=get_context(fields='title'))
+        assert serializer.get_projection() == (['title'], None)
+
+    def test_unsafe(self):
+        serializer = SelectedPostSerializer(self.post, context=get_context('post', fields='title'))
+        assert serializer.get_selection() == (None, set())
+        assert set(serializer.data) == {'id', 'title', 'body', 'stamp', 'comments'}
+
+    def test_arguments(self):
+        serializer = SelectedPostSerializer(self.post, only=['title'], omit=['body'])
+        assert serializer.data == {'title': 'title'}
+
+    def test_fragment_key(self):
+        serializer = FragmentPostSerializer([self.post], many=True, context=get_context(fields='title', omit='body'))
+        assert serializer.get_serializer_key().endswith('FragmentPostSerializer?fields=title')
+        # keyed by rendered fields, regardless of order and unknown names
+        serializer = FragmentPostSerializer([self.post], many=True, context=get_context(fields='comments.text,other,title'))
+        key = serializer.get_serializer_key()
+        assert key.endswith('FragmentPostSerializer?fields=comments.text,title')
+        serializer = FragmentPostSerializer([self.post], many=True, context=get_context(fields='title,comments.text'))
+        assert serializer.get_serializer_key() == key
+        serializer = FragmentPostSerializer([self.post], many=True, context=get_context(omit='id,body,stamp,comments.votes'))
+        assert serializer.get_serializer_key() == key
+
+
+class TestSelectionView(TestCase):
+    def setUp(self):
+        self.post = SelectedPost.objects.create(
+            title='title', body='body text', stamp=1,
+            comments=[SelectedComment(text='comment', votes=1)]
+        )
+
+    def doCleanups(self):
+        SelectedPost.drop_collection()
+
+    def get_queryset(self, **params):
+        view = SelectedPostView()
+        view.request = view.initialize_request(APIRequestFactory().get('/', params))
+        view.format_kwarg = None
+        return view.get_queryset()
+
+    def test_only(self):
+        queryset = self.get_queryset(fields='title,comments.text')
+        assert queryset._loaded_fields.as_dict() == {'title': 1, 'comments.text': 1, 'stamp': 1}
+        post = queryset.get()
+        assert post.body is None
+        assert post.comments[0].votes is None
+
+    def test_exclude(self):
+        queryset = self.get_queryset(omit='body,stamp')
+        assert queryset._loaded_fields.as_dict() == {'body': 0}
+        assert queryset.get().body is None
+
+    def test_unselected(self):
+        assert not self.get_queryset()._loaded_fields
+
+    def test_list(self):
+        response = SelectedPostView.as_view()(APIRequestFactory().get('/', {'fields': 'title,comments.votes'}))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == [{'title': 'title', 'comments': [{'votes': 1}]}]
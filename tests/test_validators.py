@@ -1,14 +1,22 @@
 from __future__ import unicode_literals
 
+import pytest
 from django.test import TestCase
 from mongoengine import Document, fields
+from mock import patch
+from mongoengine.errors import NotUniqueError
+from mongoengine.queryset import QuerySet
+from pymongo.errors import DuplicateKeyError
 from rest_framework import serializers
 
-from rest_framework_mongoengine.serializers import DocumentSerializer
+from rest_framework_mongoengine.serializers import (
+    DocumentListSerializer, DocumentSerializer
+)
 from rest_framework_mongoengine.validators import (
-    UniqueTogetherValidator, UniqueValidator
+    UniqueTogetherValidator, UniqueValidator, collation_key,
+    get_duplicate_key_fields
 )
-from .utils import dedent
+from .utils import assert_num_queries, dedent
 
 
 class NonValidatingModel(Document):
@@ -73,6 +81,18 @@ class TestUniqueValidation(TestCase):
         assert serializer.is_valid(), serializer.errors
         assert serializer.validated_data == {'name': 'existing'}
 
+    def test_existence_probe(self):
+        data = {'name': 'existing'}
+        serializer = UniqueValidatorSerializer(data=data)
+        with patch.object(QuerySet, 'first') as first:
+            assert not serializer.is_valid()
+        assert not first.called
+
+    def test_query_count(self):
+        serializer = UniqueValidatorSerializer(data={'name': 'existing'})
+        with assert_num_queries(1):
+            assert not serializer.is_valid()
+
 
 # Tests for implicit `UniqueValidator`
 # ------------------------------------
@@ -195,6 +215,13 @@ class TestUniqueTogetherValidation(TestCase):
             'code': 1
         }
 
+    def test_unique_together_query_count(self):
+        serializer = UniqueTogetherValidatorSerializer(data={'name': 'example', 'code': 2})
+        with patch.object(QuerySet, 'first') as first:
+            with assert_num_queries(1):
+                assert not serializer.is_valid()
+        assert not first.called
+
     def test_unique_together_is_required(self):
         """
         In a unique together validation, all fields are required.
@@ -291,3 +318,264 @@ class TestUniqueTogetherSerializer(TestCase):
                 name = CharField(required=False)
         """)
         assert repr(serializer) == expected
+
+
+# Tests for index-backed uniqueness
+# ---------------------------------
+class IndexValidatingModel(Document):
+    meta = {
+        'indexes': [
+            {'fields': ['name', 'code'], 'unique': True}
+        ]
+    }
+    slug = fields.StringField(unique=True)
+    name = fields.StringField()
+    code = fields.IntField()
+
+
+class IndexValidatingSerializer(DocumentSerializer):
+    class Meta:
+        model = IndexValidatingModel
+        fields = '__all__'
+        unique_validation = 'index'
+
+
+class TestIndexUniqueness(TestCase):
+    def setUp(self):
+        IndexValidatingModel.ensure_indexes()
+        self.instance = IndexValidatingModel.objects.create(slug='existing', name='example', code=1)
+
+    def doCleanups(self):
+        IndexValidatingModel.drop_collection()
+
+    def test_repr(self):
+        serializer = IndexValidatingSerializer()
+        expected = dedent("""
+            IndexValidatingSerializer():
+                id = ObjectIdField(read_only=True)
+                slug = CharField(required=True)
+                name = CharField(required=True)
+                code = IntegerField(required=True)
+        """)
+        assert repr(serializer) == expected
+
+    def test_duplicate_key_fields(self):
+        error = DuplicateKeyError('E11000 duplicate key error', 11000, {'keyPattern': {'slug': 1}})
+        assert get_duplicate_key_fields(IndexValidatingModel, error) == ('slug',)
+
+    def test_duplicate_key_fields_by_name(self):
+        error = DuplicateKeyError('E11000 duplicate key error collection: test.index_validating_model index: name_1_code_1 dup key', 11000)
+        assert get_duplicate_key_fields(IndexValidatingModel, NotUniqueError(str(error))) == ('name', 'code')
+
+    def test_duplicate_key_fields_unknown(self):
+        assert get_duplicate_key_fields(IndexValidatingModel, NotUniqueError('something')) is None
+
+    def test_is_not_unique(self):
+        serializer = IndexValidatingSerializer(data={'slug': 'existing', 'name': 'other', 'code': 1})
+        assert serializer.is_valid(), serializer.errors
+        with pytest.raises(serializers.ValidationError) as exc_info:
+            serializer.save()
+        assert exc_info.value.detail == {'slug': ['This field must be unique.']}
+
+    def test_is_not_unique_together(self):
+        serializer = IndexValidatingSerializer(data={'slug': 'other', 'name': 'example', 'code': 1})
+        assert serializer.is_valid(), serializer.errors
+        with pytest.raises(serializers.ValidationError) as exc_info:
+            serializer.save()
+        assert exc_info.value.detail == {'non_field_errors': ['The fields name, code must make a unique set.']}
+
+    def test_update(self):
+        other = IndexValidatingModel.objects.create(slug='other', name='example', code=2)
+        serializer = IndexValidatingSerializer(other, data={'slug': 'existing', 'name': 'example', 'code': 2})
+        assert serializer.is_valid(), serializer.errors
+        with pytest.raises(serializers.ValidationError) as exc_info:
+            serializer.save()
+        assert exc_info.value.detail == {'slug': ['This field must be unique.']}
+
+
+# Tests for batched uniqueness
+# ----------------------------
+class BatchValidatingModel(Document):
+    meta = {
+        'indexes': [
+            {'fields': ['name', 'code'], 'unique': True}
+        ]
+    }
+    slug = fields.StringField(unique=True)
+    name = fields.StringField()
+    code = fields.IntField()
+
+
+class BatchValidatingSerializer(DocumentSerializer):
+    class Meta:
+        model = BatchValidatingModel
+        fields = '__all__'
+
+
+class TestBatchUniqueness(TestCase):
+    def setUp(self):
+        self.instance = BatchValidatingModel.objects.create(slug='existing', name='example', code=1)
+
+    def doCleanups(self):
+        BatchValidatingModel.drop_collection()
+
+    def test_list_serializer_class(self):
+        serializer = BatchValidatingSerializer(many=True)
+        assert isinstance(serializer, DocumentListSerializer)
+
+    def test_list_serializer_kwargs(self):
+        serializer = BatchValidatingSerializer(many=True, allow_empty=False, partial=True)
+        assert type(serializer) is DocumentListSerializer
+        assert isinstance(serializer.child, BatchValidatingSerializer)
+        assert not serializer.allow_empty
+        assert serializer.partial and serializer.child.partial
+
+    def test_is_unique(self):
+        data = [
+            {'slug': 'a', 'name': 'example', 'code': 2},
+            {'slug': 'b', 'name': 'other', 'code': 1},
+        ]
+        serializer = BatchValidatingSerializer(data=data, many=True)
+        assert serializer.is_valid(), serializer.errors
+
+    def test_existing(self):
+        data = [
+            {'slug': 'a', 'name': 'other', 'code': 1},
+            {'slug': 'existing', 'name': 'other', 'code': 2},
+            {'slug': 'b', 'name': 'example', 'code': 1},
+        ]
+        serializer = BatchValidatingSerializer(data=data, many=True)
+        assert not serializer.is_valid()
+        assert serializer.errors == [
+            {},
+            {'slug': ['This field must be unique.']},
+            {'non_field_errors': ['The fields name, code must make a unique set.']},
+        ]
+
+    def test_repeated(self):
+        data = [
+            {'slug': 'a', 'name': 'other', 'code': 1},
+            {'slug': 'a', 'name': 'other', 'code': 2},
+            {'slug': 'b', 'name': 'other', 'code': 1},
+        ]
+        serializer = BatchValidatingSerializer(data=data, many=True)
+        assert not serializer.is_valid()
+        assert serializer.errors == [
+            {},
+            {'slug': ['This field must be unique.']},
+            {'non_field_errors': ['The fields name, code must make a unique set.']},
+        ]
+
+    def test_no_query_per_item(self):
+        data = [{'slug': str(i), 'name': 'other', 'code': i} for i in range(10)]
+        serializer = BatchValidatingSerializer(data=data, many=True)
+        with patch.object(QuerySet, 'count') as count:
+            assert serializer.is_valid(), serializer.errors
+        assert not count.called
+
+    def test_query_count(self):
+        data = [{'slug': str(i), 'name': 'other', 'code': i} for i in range(10)]
+        serializer = BatchValidatingSerializer(data=data, many=True)
+        with assert_num_queries(2):
+            assert serializer.is_valid(), serializer.errors
+
+    def test_custom_lookup(self):
+        class LookupSerializer(DocumentSerializer):
+            class Meta:
+                model = NonValidatingModel
+                fields = '__all__'
+
+            name = serializers.CharField(validators=[UniqueValidator(queryset=NonValidatingModel.objects, lookup='iexact')])
+
+        NonValidatingModel.objects.create(name='existing')
+        self.addCleanup(NonValidatingModel.drop_collection)
+        serializer = LookupSerializer(data=[{'name': 'other'}, {'name': 'Existing'}], many=True)
+        assert not serializer.is_valid()
+        assert serializer.errors == [{}, {'name': ['This field must be unique.']}]
+
+    def test_update_list(self):
+        serializer = BatchValidatingSerializer([self.instance], data=[{'slug': 'existing', 'name': 'example', 'code': 1}], many=True)
+        assert not serializer.validates_uniqueness_in_batch
+
+
+# Tests for collation-aware uniqueness
+# ------------------------------------
+CASE_INSENSITIVE = {'locale': 'en', 'strength': 2}
+
+
+class CollatedModel(Document):
+    meta = {
+        'indexes': [
+            {'fields': ['slug'], 'unique': True, 'collation': CASE_INSENSITIVE},
+            {'fields': ['name', 'code'], 'unique': True, 'collation': CASE_INSENSITIVE}
+        ]
+    }
+    slug = fields.StringField()
+    name = fields.StringField()
+    code = fields.IntField()
+
+
+class CollatedSerializer(DocumentSerializer):
+    class Meta:
+        model = CollatedModel
+        fields = '__all__'
+
+
+class TestCollatedUniqueness(TestCase):
+    def setUp(self):
+        CollatedModel.ensure_indexes()
+        CollatedModel.objects.create(slug='Existing', name='Example', code=1)
+
+    def doCleanups(self):
+        CollatedModel.drop_collection()
+
+    def test_repr(self):
+        serializer = CollatedSerializer()
+        expected = dedent("""
+            CollatedSerializer():
+                id = ObjectIdField(read_only=True)
+                slug = CharField(required=True, validators=[<UniqueValidator(queryset=CollatedModel.objects, collation={'locale': 'en', 'strength': 2})>])
+                name = CharField(required=True)
+                code = IntegerField(required=True)
+                class Meta:
+                    validators = [<UniqueTogetherValidator(queryset=CollatedModel.objects, fields=('name', 'code'), collation={'locale': 'en', 'strength': 2})>]
+        """)
+        assert repr(serializer) == expected
+
+    def test_collation_key(self):
+        assert collation_key('Straße', CASE_INSENSITIVE) == collation_key('STRASSE', CASE_INSENSITIVE)
+        assert collation_key('Café', CASE_INSENSITIVE) != collation_key('cafe', CASE_INSENSITIVE)
+        assert collation_key('Café', {'locale': 'en', 'strength': 1}) == collation_key('cafe', {'locale': 'en', 'strength': 1})
+        assert collation_key('Foo', None) == 'Foo'
+        assert collation_key(('Foo', 1), CASE_INSENSITIVE) == ('foo', 1)
+
+    def test_is_not_unique(self):
+        serializer = CollatedSerializer(data={'slug': 'EXISTING', 'name': 'other', 'code': 1})
+        assert not serializer.is_valid()
+        assert serializer.errors == {'slug': ['This field must be unique.']}
+
+    def test_is_not_unique_together(self):
+        serializer = CollatedSerializer(data={'slug': 'other', 'name': 'EXAMPLE', 'code': 1})
+        assert not serializer.is_valid()
+        assert serializer.errors == {'non_field_errors': ['The fields name, code must make a unique set.']}
+
+    def test_batch(self):
+        data = [
+            {'slug': 'a', 'name': 'other', 'code': 1},
+            {'slug': 'A', 'name': 'other', 'code': 2},
+            {'slug': 'existing', 'name': 'OTHER', 'code': 1},
+        ]
+        serializer = CollatedSerializer(data=data, many=True)
+        assert not serializer.is_valid()
+        assert serializer.errors == [
+            {},
+            {'slug': ['This field must be unique.']},
+            {'slug': ['This field must be unique.'], 'non_field_errors': ['The fields name, code must make a unique set.']},
+        ]
+
+    def test_probe_uses_index(self):
+        validator = next(v for v in CollatedSerializer().fields['slug'].validators if isinstance(v, UniqueValidator))
+        queryset = validator.filter_queryset('EXISTING', validator.get_queryset(), 'slug')
+        plan = str(queryset.explain()['queryPlanner']['winningPlan'])
+        assert 'IXSCAN' in plan
+        assert 'COLLSCAN' not in plan
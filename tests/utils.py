@@ -1,4 +1,7 @@
+from contextlib import contextmanager
+
 import pytest
+from mongoengine.context_managers import query_counter
 from rest_framework.exceptions import ValidationError
 
 
@@ -6,6 +9,17 @@ def dedent(blocktext):
     return '\n'.join([line[12:] for line in blocktext.splitlines()[1:-1]])
 
 
+@contextmanager
+def assert_num_queries(num):
+    """
+    Assert number of queries, issued within the block.
+    Requires mongodb profiling, enabled by mongoengine query_counter.
+    """
+    with query_counter() as counter:
+        yield
+        assert counter == num, "%d queries executed, %d expected" % (counter._get_count(), num)
+
+
 def get_items(mapping_or_list_of_two_tuples):
     # Tests accept either lists of two tuples, or dictionaries.
     if isinstance(mapping_or_list_of_two_tuples, dict):